@@ -1,5 +1,7 @@
 import logging
-from typing import List
+from typing import Iterable, List
+
+import numpy as np
 
 LOGGER = logging.getLogger(__name__)
 
@@ -39,3 +41,15 @@ def get_int_from_bitstring(a_str: str, littleEndian=False) -> int:
 
 def get_int_from_bitarray(a_arr: List[int], littleEndian=False) -> int:
     return get_int_from_bitstring(''.join(str(e) for e in a_arr))
+
+
+def get_bitarrays_from_bitstrings(bitstrings: Iterable[str]) -> np.ndarray:
+    """Stack bitstrings of the same length in a (n_bitstrings, length) uint8
+    array of 0 and 1, with a single conversion of their concatenation."""
+    bitstrings = list(bitstrings)
+    if not bitstrings:
+        return np.zeros((0, 0), dtype=np.uint8)
+    joined = np.frombuffer(''.join(bitstrings).encode(), dtype=np.uint8)
+    if len(joined) != len(bitstrings) * len(bitstrings[0]):
+        raise ValueError("The bitstrings have different lengths")
+    return (joined - ord('0')).reshape(len(bitstrings), -1)
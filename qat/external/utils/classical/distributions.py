@@ -0,0 +1,131 @@
+"""
+Exact output distributions of the Dicke state preparation and of the
+reversible logic applied after it, without any quantum simulation.
+
+The Dicke state D(n, k) is the uniform superposition of the C(n, k) strings
+of weight k. A reversible circuit maps distinct basis states to distinct
+basis states, so after it the state is still uniform, over the images of
+those strings: its distribution is obtained pushing the whole support
+through the circuit with the bit-sliced simulator of
+:mod:`~qat.external.utils.simulation.bitsliced`, one chunk at a time. This is
+the case of the ISD circuit, where the Dicke state selecting the columns is
+followed by the sorting network, the RREF and the weight check.
+
+The memory required only depends on the size of a chunk, and the counts are
+exact integers, so distributions can be compared exactly for sizes far
+beyond the reach of a statevector simulation.
+"""
+import itertools
+import logging
+from collections import Counter
+from math import comb
+from typing import TYPE_CHECKING, Dict, Iterator, Optional, Sequence
+
+import numpy as np
+from qat.external.utils.simulation import bitsliced, reversible
+
+if TYPE_CHECKING:
+    from qat.core import Circuit
+
+LOGGER = logging.getLogger(__name__)
+
+CHUNK_SIZE = 2**16
+
+
+def get_dicke_support(n: int, k: int,
+                      chunk_size: int = CHUNK_SIZE) -> Iterator[np.ndarray]:
+    """The strings of weight k of D(n, k), in lexicographic order of the
+    positions of their ones, as (chunk_size, n) arrays of 0/1: column i is
+    qubit i. The last chunk may be shorter."""
+    combinations = itertools.combinations(range(n), k)
+    while True:
+        chunk = list(itertools.islice(combinations, chunk_size))
+        if not chunk:
+            return
+        ones = np.array(chunk, dtype=np.intp).reshape(len(chunk), k)
+        bits = np.zeros((len(chunk), n), dtype=np.uint8)
+        bits[np.arange(len(chunk))[:, None], ones] = 1
+        yield bits
+
+
+def get_dicke_probabilities(n: int, k: int,
+                            little_endian: bool) -> Dict[int, float]:
+    """Distribution of the integer stored on the n qubits of D(n, k), in the
+    format of
+    :meth:`~qat.external.utils.simulation.sparse.SparseState.get_probabilities`.
+    """
+    if n > bitsliced.WORD_BITS:
+        raise ValueError(f"Cannot read more than {bitsliced.WORD_BITS} qubits")
+    prob = 1 / comb(n, k)
+    values = {}
+    for ones in itertools.combinations(range(n), k):
+        value = sum(1 << (qb if little_endian else n - 1 - qb)
+                    for qb in ones)
+        values[value] = prob
+    return values
+
+
+def iterate_ints(circuit: 'Circuit',
+                 dicke_qubits: Sequence[int],
+                 k: int,
+                 qubits: Sequence[int],
+                 little_endian: bool,
+                 bits: Optional[Sequence[int]] = None,
+                 chunk_size: int = CHUNK_SIZE) -> Iterator[np.ndarray]:
+    """Push the support of D(len(dicke_qubits), k), prepared on dicke_qubits,
+    through the circuit and yield, one chunk at a time, the integers stored
+    on the given qubits by the outputs. Each output has probability
+    1 / C(len(dicke_qubits), k).
+
+    :param circuit: The circuit applied after the Dicke state, made only of
+    reversible gates
+    :param bits: The basis state of the other qubits, as in
+    :func:`~qat.external.utils.simulation.reversible.simulate_circuit`
+    :raises ValueError: if the circuit is not reversible or more than 64
+    qubits are read
+
+    """
+    if len(qubits) > bitsliced.WORD_BITS:
+        raise ValueError(f"Cannot read more than {bitsliced.WORD_BITS} qubits")
+    rev_ops = reversible.get_reversible_ops(circuit)
+    ones = [] if bits is None else [qb for qb, bit in enumerate(bits) if bit]
+    for support in get_dicke_support(len(dicke_qubits), k, chunk_size):
+        planes = bitsliced.new_planes(circuit.nbqbits, len(support))
+        planes[ones] = np.iinfo(np.uint64).max
+        bitsliced.set_bits(planes, dicke_qubits, support)
+        bitsliced.run(rev_ops, planes)
+        yield bitsliced.get_ints(planes, qubits, len(support), little_endian)
+
+
+def get_counts(circuit: 'Circuit',
+               dicke_qubits: Sequence[int],
+               k: int,
+               qubits: Sequence[int],
+               little_endian: bool,
+               bits: Optional[Sequence[int]] = None,
+               chunk_size: int = CHUNK_SIZE) -> Counter:
+    """For each integer stored on the given qubits, the number of strings of
+    the Dicke support giving it, see :func:`iterate_ints`. The counts sum to
+    C(len(dicke_qubits), k)."""
+    counts: Counter = Counter()
+    for values in iterate_ints(circuit, dicke_qubits, k, qubits,
+                               little_endian, bits, chunk_size):
+        unique, chunk_counts = np.unique(values, return_counts=True)
+        counts.update(dict(zip(unique.tolist(), chunk_counts.tolist())))
+    return counts
+
+
+def get_probabilities(circuit: 'Circuit',
+                      dicke_qubits: Sequence[int],
+                      k: int,
+                      qubits: Sequence[int],
+                      little_endian: bool,
+                      bits: Optional[Sequence[int]] = None,
+                      chunk_size: int = CHUNK_SIZE) -> Dict[int, float]:
+    """The distribution given by :func:`get_counts`, in the format of
+    :meth:`~qat.external.utils.simulation.sparse.SparseState.get_probabilities`.
+    """
+    total = comb(len(dicke_qubits), k)
+    counts = get_counts(circuit, dicke_qubits, k, qubits, little_endian, bits,
+                        chunk_size)
+    return {value: count / total for value, count in counts.items()}
@@ -0,0 +1,184 @@
+"""
+Linear algebra over GF(2) on bit-packed NumPy arrays, to check the results
+of the quantum routines of
+:mod:`~qat.external.utils.qroutines.linalg.rref` and to estimate the cost
+of their classical counterparts on large matrices.
+
+The rows of a matrix are packed in uint64 words, little endian: bit c % 64
+of word c // 64 is column c, as in
+:mod:`~qat.external.utils.simulation.bitsliced`. Adding a row to another one
+is then a XOR of ncols / 64 words, and a set of rows can be updated at once
+with a single vectorised operation.
+
+:func:`rref` uses the method of the Four Russians (M4RI): the pivots are
+searched k columns at a time and all the other rows are reduced by them with
+one lookup in a table of the 2^k combinations of the k pivot rows, instead of
+k row additions. :func:`get_rref_diagonal` instead follows step by step the
+quantum RREF, including its ancillae, over a batch of matrices.
+"""
+import logging
+from typing import List, Tuple
+
+import numpy as np
+
+LOGGER = logging.getLogger(__name__)
+
+WORD_BITS = 64
+
+_ONES = np.iinfo(np.uint64).max
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def get_nwords(ncols: int) -> int:
+    return -(-ncols // WORD_BITS)
+
+
+def pack(matrix: np.ndarray) -> np.ndarray:
+    """Pack the last axis of an array of 0/1, f.e. the rows of a matrix, in
+    uint64 words."""
+    matrix = np.asarray(matrix, dtype=np.uint8)
+    ncols = matrix.shape[-1]
+    padded = np.zeros(matrix.shape[:-1] + (get_nwords(ncols) * WORD_BITS, ),
+                      dtype=np.uint8)
+    padded[..., :ncols] = matrix
+    packed = np.packbits(padded, axis=-1, bitorder='little')
+    return packed.view('<u8').astype(np.uint64)
+
+
+def unpack(packed: np.ndarray, ncols: int) -> np.ndarray:
+    """Inverse of :func:`pack`"""
+    as_bytes = np.ascontiguousarray(packed, dtype='<u8').view(np.uint8)
+    return np.unpackbits(as_bytes, axis=-1, bitorder='little')[..., :ncols]
+
+
+def get_column(packed: np.ndarray, col: int) -> np.ndarray:
+    """Bits of the column col of packed rows, as uint8"""
+    shift = np.uint64(col % WORD_BITS)
+    return ((packed[..., col // WORD_BITS] >> shift) & np.uint64(1)).astype(
+        np.uint8)
+
+
+def get_weights(packed: np.ndarray) -> np.ndarray:
+    """Hamming weights of packed rows"""
+    as_bytes = np.ascontiguousarray(packed, dtype='<u8').view(np.uint8)
+    return _POPCOUNT[as_bytes].sum(axis=-1, dtype=np.int64)
+
+
+def _get_table(pivot_rows: np.ndarray) -> np.ndarray:
+    """The XOR of each subset of the rows: entry i combines the rows whose
+    bit is set in i."""
+    table = np.zeros((1, pivot_rows.shape[1]), dtype=np.uint64)
+    for row in pivot_rows:
+        table = np.concatenate([table, table ^ row])
+    return table
+
+
+def _find_block_pivots(rows: np.ndarray, start: int, col: int, ncols: int,
+                       k: int) -> Tuple[List[Tuple[int, int]], int]:
+    """Find up to k pivots from column col, moving them to the rows from
+    start on. The pivot rows are reduced among themselves, but not the
+    others: the bit of a candidate row is the one it would have after being
+    reduced by the pivot rows found so far. Return the (row, column) of the
+    pivots and the next column to look at."""
+    nrows = rows.shape[0]
+    block: List[Tuple[int, int]] = []
+    # The bits of the rows from start on the pivot columns of the block
+    pivot_bits = np.zeros((nrows - start, 0), dtype=np.uint8)
+    while len(block) < k and col < ncols and start + len(block) < nrows:
+        row_idx = start + len(block)
+        bits = get_column(rows[row_idx:], col)
+        coeffs = get_column(rows[start:row_idx], col)
+        bits ^= (pivot_bits[len(block):] @ coeffs).astype(np.uint8) & 1
+        candidates = np.flatnonzero(bits)
+        if len(candidates):
+            found = candidates[0] + len(block)
+            rows[[row_idx, start + found]] = rows[[start + found, row_idx]]
+            pivot_bits[[len(block), found]] = pivot_bits[[found, len(block)]]
+            reducing = pivot_bits[len(block)].astype(bool)
+            if reducing.any():
+                rows[row_idx] ^= np.bitwise_xor.reduce(
+                    rows[start:row_idx][reducing])
+            rows[start + np.flatnonzero(coeffs)] ^= rows[row_idx]
+            pivot_bits = np.column_stack(
+                [pivot_bits, get_column(rows[start:], col)])
+            block.append((row_idx, col))
+        col += 1
+    return block, col
+
+
+def rref_packed(rows: np.ndarray, ncols: int, k: int = 8) -> List[int]:
+    """Reduce in place the packed rows to their RREF, with the method of the
+    Four Russians using blocks of k pivots, and return the pivot columns."""
+    nrows = rows.shape[0]
+    pivots: List[int] = []
+    col = 0
+    while col < ncols and len(pivots) < nrows:
+        block, col = _find_block_pivots(rows, len(pivots), col, ncols, k)
+        if not block:
+            continue
+        pivot_idxs = [pivot_row for pivot_row, _ in block]
+        table = _get_table(rows[pivot_idxs])
+        idxs = np.zeros(nrows, dtype=np.intp)
+        for bit, (_, pivot_col) in enumerate(block):
+            idxs |= get_column(rows, pivot_col).astype(np.intp) << bit
+        # The pivot rows are already reduced
+        idxs[pivot_idxs] = 0
+        rows ^= table[idxs]
+        pivots += [pivot_col for _, pivot_col in block]
+    return pivots
+
+
+def rref(matrix: np.ndarray, k: int = 8) -> Tuple[np.ndarray, List[int]]:
+    """The RREF over GF(2) of a matrix of 0/1 and its pivot columns, see
+    :func:`rref_packed`."""
+    matrix = np.asarray(matrix)
+    rows = pack(matrix)
+    pivots = rref_packed(rows, matrix.shape[1], k)
+    return unpack(rows, matrix.shape[1]), pivots
+
+
+def rank(matrix: np.ndarray) -> int:
+    return len(rref(matrix)[1])
+
+
+def get_rref_diagonal(
+        matrices: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """The result of :func:`~qat.external.utils.qroutines.linalg.rref.get_rref`
+    on a (n_matrices, nrows, ncols) batch of matrices, nrows <= ncols: the
+    matrices and the swap and add ancillae, in the order of the routine.
+
+    As the routine, the pivot of row i is on column i: if it is 0, all the
+    rows below are added to row i up to the first one with a 1 on column i,
+    then row i is added to the rows with a 1 on column i. So the result is
+    the RREF only if the left square block of the matrix is invertible.
+
+    """
+    matrices = np.asarray(matrices, dtype=np.uint8)
+    n_matrices, nrows, ncols = matrices.shape
+    nsquare = min(nrows, ncols)
+    rows = pack(matrices)
+    swaps = []
+    adds = []
+    for i in range(nsquare):
+        # The columns before the pivot one are left untouched
+        right = pack(np.arange(ncols) >= i)
+        if i != nrows - 1:
+            col = get_column(rows, i)
+            below = col[:, i + 1:]
+            # The rows before the first one with a 1, that one included
+            before_one = (np.cumsum(below, axis=1) - below) == 0
+            added = before_one & (col[:, i, None] == 0)
+            added_rows = rows[:, i + 1:] & (added.astype(np.uint64) *
+                                            _ONES)[..., None]
+            rows[:, i] ^= np.bitwise_xor.reduce(added_rows, axis=1) & right
+            swaps.append(added.astype(np.uint8))
+        col = get_column(rows, i)
+        col[:, i] = 0
+        rows ^= (col.astype(np.uint64) *
+                 _ONES)[..., None] & (rows[:, i, None] & right)
+        adds.append(np.delete(col, i, axis=1))
+    swaps = np.concatenate(swaps, axis=1) if swaps else np.zeros(
+        (n_matrices, 0), dtype=np.uint8)
+    adds = np.concatenate(adds, axis=1) if adds else np.zeros(
+        (n_matrices, 0), dtype=np.uint8)
+    return unpack(rows, ncols), swaps, adds
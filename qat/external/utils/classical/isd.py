@@ -0,0 +1,137 @@
+"""
+Classical Information Set Decoding (ISD): given a (r, n) parity-check matrix
+H, a syndrome s and a weight w, find an error e of weight w with H e = s.
+
+Each iteration follows the steps of the quantum routines:
+
+#. a selection of n - r columns, the information set, is moved to the end
+   by the sorting network of
+   :func:`~qat.external.utils.qroutines.linalg.matrix.move_columns_end_gate`,
+   see :func:`get_columns_permutation`;
+#. the RREF of [H | s] is computed, see :mod:`~.gf2`: if the left (r, r)
+   block is invertible, it becomes the identity, H = [I | V] and s = s';
+#. the weight of s' is checked to be equal to w, as done by
+   :func:`~qat.external.utils.qroutines.hamming_weight_compute.fpc.get_qroutine_for_qubits_weight_check`.
+
+With Prange the error is [s', 0]. With Lee-Brickell, p columns of V are
+also added to s', and the weight of the sum is checked to be w - p.
+"""
+import logging
+from math import comb
+from typing import NamedTuple, Optional, Sequence
+
+import numpy as np
+from qat.external.utils.classical import gf2
+from qat.external.utils.qroutines import sorting_network as sn
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ISDResult(NamedTuple):
+    # None if no error has been found
+    error: Optional[np.ndarray]
+    iterations: int
+
+
+def get_columns_permutation(selection: Sequence[int],
+                            network: str = 'bitonic') -> np.ndarray:
+    """The columns, in their new order, after moving the selected ones to the
+    end with the given sorting network, as
+    :func:`~qat.external.utils.qroutines.linalg.matrix.move_columns_end_gate`.
+    If the network pads the columns, the padding ones are selected, so that
+    they are moved to the end as well, and then dropped.
+
+    """
+    ncols = len(selection)
+    net_data = sn.get_pattern_sorter(ncols, network)
+    lines = list(selection) + [1] * (net_data.n_lines - ncols)
+    perm = list(range(net_data.n_lines))
+    for _, a_idx, b_idx in net_data.swaps_pattern:
+        # The comparator swaps the lines when a > b
+        if lines[a_idx] > lines[b_idx]:
+            lines[a_idx], lines[b_idx] = lines[b_idx], lines[a_idx]
+            perm[a_idx], perm[b_idx] = perm[b_idx], perm[a_idx]
+    return np.array([col for col in perm if col < ncols])
+
+
+def _find_sum(columns: np.ndarray, target: np.ndarray, p: int,
+              weight: int) -> Optional[Sequence[int]]:
+    """Indexes of p packed columns whose sum with target has the given
+    weight; the last column is searched over all the candidates at once."""
+    if p == 0:
+        return () if gf2.get_weights(target) == weight else None
+    if p == 1:
+        found = np.flatnonzero(gf2.get_weights(columns ^ target) == weight)
+        return (found[0], ) if len(found) else None
+    for first in range(len(columns) - p + 1):
+        rest = _find_sum(columns[first + 1:], target ^ columns[first], p - 1,
+                         weight)
+        if rest is not None:
+            return (first, ) + tuple(first + 1 + idx for idx in rest)
+    return None
+
+
+def isd(h: np.ndarray,
+        syndrome: Sequence[int],
+        weight: int,
+        p: int = 0,
+        max_iterations: int = 1000,
+        network: str = 'bitonic',
+        seed: Optional[int] = None) -> ISDResult:
+    """Look for an error of the given weight with Lee-Brickell, adding p
+    columns of the information set; p = 0 is Prange. The information sets
+    are drawn at random, at most max_iterations times.
+
+    """
+    h = np.asarray(h, dtype=np.uint8)
+    syndrome = np.asarray(syndrome, dtype=np.uint8)
+    nrows, ncols = h.shape
+    rng = np.random.default_rng(seed)
+    for iteration in range(1, max_iterations + 1):
+        selection = np.zeros(ncols, dtype=np.uint8)
+        selection[rng.choice(ncols, ncols - nrows, replace=False)] = 1
+        perm = get_columns_permutation(selection, network)
+        rows = gf2.pack(np.column_stack([h[:, perm], syndrome]))
+        pivots = gf2.rref_packed(rows, ncols + 1)
+        if pivots[:nrows] != list(range(nrows)):
+            continue
+        reduced = gf2.unpack(rows, ncols + 1)
+        s_reduced = gf2.pack(reduced[:, ncols])
+        v_columns = gf2.pack(reduced[:, nrows:ncols].T)
+        found = _find_sum(v_columns, s_reduced, p, weight - p)
+        if found is None:
+            continue
+        error_perm = np.zeros(ncols, dtype=np.uint8)
+        error_perm[:nrows] = gf2.unpack(
+            s_reduced ^ np.bitwise_xor.reduce(v_columns[list(found)], axis=0),
+            nrows)
+        error_perm[[nrows + idx for idx in found]] = 1
+        error = np.zeros(ncols, dtype=np.uint8)
+        error[perm] = error_perm
+        LOGGER.debug("error found after %d iterations", iteration)
+        return ISDResult(error, iteration)
+    return ISDResult(None, max_iterations)
+
+
+def prange(h: np.ndarray, syndrome: Sequence[int], weight: int,
+           **kwargs) -> ISDResult:
+    """:func:`isd` with p = 0"""
+    return isd(h, syndrome, weight, 0, **kwargs)
+
+
+def lee_brickell(h: np.ndarray, syndrome: Sequence[int], weight: int,
+                 p: int = 2, **kwargs) -> ISDResult:
+    """:func:`isd` with p columns of the information set"""
+    return isd(h, syndrome, weight, p, **kwargs)
+
+
+def get_success_probability(nrows: int, ncols: int, weight: int,
+                            p: int = 0) -> float:
+    """Probability that an iteration of :func:`isd` finds a given error,
+    i.e. that the error has weight - p ones on the pivot columns, assuming
+    that the left block is invertible; its inverse is the expected number of
+    iterations."""
+    if p > weight:
+        return 0.
+    return (comb(nrows, weight - p) * comb(ncols - nrows, p) /
+            comb(ncols, weight))
@@ -10,6 +10,8 @@ from qat.lang.AQASM.gates import CCNOT, CNOT, X
 from qat.lang.AQASM.routines import QRoutine
 from qat.lang.AQASM.misc import build_gate
 
+from qat.external.utils.qroutines import adder_cla, resources
+
 # from .fake import fake
 
 LOGGER = logging.getLogger(__name__)
@@ -76,22 +78,20 @@ def _common(qfun, a, b, cin, cout, b_is_bigger, bits, overflow_qbit,
 
 def _maj_chain(qfun, a, b, cin, mrange):
     LOGGER.debug("MAJ %d, %d, %d", cin[0], b[0], a[0])
-    qfun.apply(_majority(f"cin, b{0}, a{0}"), cin[0], b[0], a[0])
+    qfun.apply(_majority(), cin[0], b[0], a[0])
     for j in mrange:
         LOGGER.debug("j is %d", j)
         LOGGER.debug("MAJ %d, %d, %d", a[j], b[j + 1], a[j + 1])
-        qfun.apply(_majority(f"a{j}, b{j+1}, a{j+1}"), a[j], b[j + 1],
-                   a[j + 1])
+        qfun.apply(_majority(), a[j], b[j + 1], a[j + 1])
 
 
 def _maj_chain_dag(qfun, a, b, cin, mrange):
     for j in reversed(mrange):
         LOGGER.debug("j is %d", j)
         LOGGER.debug("MAJD %d, %d, %d", a[j], b[j + 1], a[j + 1])
-        qfun.apply(
-            _majority(f"a{j}, b{j+1}, a{j+1}").dag(), a[j], b[j + 1], a[j + 1])
+        qfun.apply(_majority().dag(), a[j], b[j + 1], a[j + 1])
     LOGGER.debug("MAJD %d, %d, %d", cin[0], b[0], a[0])
-    qfun.apply(_majority(f"cin, b{0}, a{0}").dag(), cin[0], b[0], a[0])
+    qfun.apply(_majority().dag(), cin[0], b[0], a[0])
 
 
 def _middle_logic(qfun, a, b, cin, cout, end, ends, little_endian,
@@ -118,21 +118,16 @@ def _middle_logic(qfun, a, b, cin, cout, end, ends, little_endian,
         # present in Cuccaro
         outbit = cout[0] if overflow_qbit else b[-1]
         LOGGER.debug("b is bigger")
-        nslice = b[end + 2:b_l:1]
+        nslice = b[end + 1:b_l:1]
         LOGGER.debug("nslice %s", nslice)
-        chain = itertools.chain(nslice, cout) if overflow_qbit else nslice
-        LOGGER.debug("CNOT %d, %d", a[end], b[end + 1])
-        qfun.apply(CNOT, a[ends], b[end + 1])
-        prv_tgt_1 = a[ends]
-        prv_tgt = b[end + 1]
-        for cur_tgt in chain:
-            LOGGER.debug("X %s", prv_tgt)
-            qfun.apply(X, prv_tgt)
-            LOGGER.debug("CCNOT %s %s %s", prv_tgt_1, prv_tgt, cur_tgt)
-            qfun.apply(CCNOT, prv_tgt_1, prv_tgt, cur_tgt)
-            LOGGER.debug("X %s", prv_tgt)
-            qfun.apply(X, prv_tgt)
-            prv_tgt = cur_tgt
+        chain = list(itertools.chain(nslice, cout) if overflow_qbit else nslice)
+        # The carry in a[ends] is added to the remaining bits of b starting
+        # from the most significant one, so that the less significant bits
+        # used as controls still hold their original value
+        for i in reversed(range(len(chain))):
+            ctrls = [a[ends]] + chain[:i]
+            LOGGER.debug("C^%dX %s %s", len(ctrls), ctrls, chain[i])
+            qfun.apply(X.ctrl(len(ctrls)), ctrls, chain[i])
 
 
 def _unmaj_chain(qfun, a, b, cin, mrange):
@@ -140,10 +135,9 @@ def _unmaj_chain(qfun, a, b, cin, mrange):
     for j in reversed(mrange):
         LOGGER.debug("j is %d", j)
         LOGGER.debug("UNM %d, %d, %d", a[j], b[j + 1], a[j + 1])
-        qfun.apply(_unmajority(f"a{j}, b{j+1}, a{j+1}"), a[j], b[j + 1],
-                   a[j + 1])
+        qfun.apply(_unmajority(), a[j], b[j + 1], a[j + 1])
     LOGGER.debug("UNM %d, %d, %d", cin[0], b[0], a[0])
-    qfun.apply(_unmajority(f"cin, b{0}, a{0}"), cin[0], b[0], a[0])
+    qfun.apply(_unmajority(), cin[0], b[0], a[0])
 
 
 @build_gate("MCOMP", [int, int, bool])
@@ -206,8 +200,227 @@ def adder(a_l: int, b_l: int, overflow_qbit=False, little_endian=True):
     return qfun
 
 
-@build_gate("MAJ", [str])
-def _majority(name):
+def _get_const_bits(n: int, k: int):
+    """The bits of the constant k, and the position t of the first set one.
+    In x + k, the carries into the bits up to t are 0, and the carry into
+    t + 1 is x_t itself."""
+    k_bits = [(k >> i) & 1 for i in range(n)]
+    return k_bits, k_bits.index(1)
+
+
+def _const_carry(qfun: QRoutine, x_i, k_i: int, c_in, c_out):
+    """c_out = maj(x_i, k_i, c_in), ie x_i AND c_in if k_i is 0 and
+    x_i OR c_in if k_i is 1."""
+    if k_i:
+        qfun.apply(X, x_i)
+        qfun.apply(X, c_in)
+    qfun.apply(CCNOT, x_i, c_in, c_out)
+    if k_i:
+        qfun.apply(X, c_out)
+        qfun.apply(X, x_i)
+        qfun.apply(X, c_in)
+
+
+def _get_const_carry_resources(k_bits, positions, res: dict):
+    resources.add_gates(res, "CCNOT", len(positions))
+    resources.add_gates(res, "X", 5 * sum(k_bits[i] for i in positions))
+
+
+@build_gate("MCOMP_CONST", [int, int, bool])
+def comparator_const(n: int, value: int, little_endian=True):
+    """Comparator with a classical constant: the additional qubit is flipped
+    if x < value. The carry out of x + (2^n - value) is computed with a
+    chain of AND (or OR, depending on the bits of the constant) gates,
+    copied, and uncomputed, so no register holding value is needed."""
+    qfun = QRoutine()
+    x = qfun.new_wires(n)
+    out = qfun.new_wires(1)[0]
+    if not little_endian:
+        x.reverse()
+    if value <= 0:
+        return qfun
+    if value >= 2**n:
+        qfun.apply(X, out)
+        return qfun
+    k_bits, first = _get_const_bits(n, 2**n - value)
+    positions = range(first + 1, n)
+    carries = [x[first]]
+    if len(positions) > 1:
+        anc = qfun.new_wires(len(positions) - 1)
+        qfun.set_ancillae(anc)
+        carries.extend(anc)
+    carries.append(out)
+
+    if len(positions) == 0:
+        qfun.apply(CNOT, carries[0], out)
+    for j, i in enumerate(positions):
+        _const_carry(qfun, x[i], k_bits[i], carries[j], carries[j + 1])
+    for j, i in reversed(list(enumerate(positions))[:-1]):
+        _const_carry(qfun, x[i], k_bits[i], carries[j], carries[j + 1])
+    # The carry out is set if x >= value
+    qfun.apply(X, out)
+    return qfun
+
+
+def get_comparator_const_resources(n: int, value: int):
+    """Resources required by :func:`comparator_const`, see
+    :mod:`~qat.external.utils.qroutines.resources`."""
+    if value <= 0 or value >= 2**n:
+        res = resources.new_resources(n + 1)
+        resources.add_gates(res, "X", int(value > 0))
+        return res
+    k_bits, first = _get_const_bits(n, 2**n - value)
+    positions = list(range(first + 1, n))
+    res = resources.new_resources(n + 1, max(len(positions) - 1, 0))
+    if len(positions) == 0:
+        resources.add_gates(res, "CNOT")
+    _get_const_carry_resources(k_bits, positions + positions[:-1], res)
+    resources.add_gates(res, "X")
+    return res
+
+
+@build_gate("MADD_CONST", [int, int, bool, bool])
+def adder_const(n: int, value: int, overflow_qbit=False, little_endian=True):
+    """Adder of a classical constant: x = x + value, with the carry out in
+    the additional qubit if overflow_qbit, else modulo 2^n (so a negative
+    value is subtracted). The carries are computed with the chain of
+    :func:`comparator_const`, added to x, and uncomputed using the fact that
+    they are also the carries of value + not(x + value), as in
+    :mod:`~qat.external.utils.qroutines.adder_cla`."""
+    if overflow_qbit and not 0 <= value < 2**n:
+        raise ValueError(f"{value} does not fit in {n} bits")
+    value %= 2**n
+    qfun = QRoutine()
+    x = qfun.new_wires(n)
+    if not little_endian:
+        x.reverse()
+    cout = qfun.new_wires(1)[0] if overflow_qbit else None
+    if value == 0:
+        return qfun
+    k_bits, first = _get_const_bits(n, value)
+    # carries[i] is the carry into bit first + 1 + i
+    carries = [x[first]]
+    if n - first - 2 > 0:
+        anc = qfun.new_wires(n - first - 2)
+        qfun.set_ancillae(anc)
+        carries.extend(anc)
+    if overflow_qbit:
+        carries.append(cout)
+        if first == n - 1:
+            qfun.apply(CNOT, x[first], cout)
+    computed = range(first + 1, n if overflow_qbit else n - 1)
+    for i in computed:
+        _const_carry(qfun, x[i], k_bits[i], carries[i - first - 1],
+                     carries[i - first])
+    # From the most significant bit, so that x[first] is still the carry
+    for i in reversed(range(n)):
+        if i > first:
+            qfun.apply(CNOT, carries[i - first - 1], x[i])
+        if k_bits[i]:
+            qfun.apply(X, x[i])
+    uncomputed = range(first + 1, n - 1)
+    if len(uncomputed) > 0:
+        for qb in x[first:n - 1]:
+            qfun.apply(X, qb)
+        for i in reversed(uncomputed):
+            _const_carry(qfun, x[i], k_bits[i], carries[i - first - 1],
+                         carries[i - first])
+        for qb in x[first:n - 1]:
+            qfun.apply(X, qb)
+    return qfun
+
+
+def get_adder_const_resources(n: int, value: int, overflow_qbit=False):
+    """Resources required by :func:`adder_const`, see
+    :mod:`~qat.external.utils.qroutines.resources`."""
+    value %= 2**n
+    res = resources.new_resources(n + int(overflow_qbit))
+    if value == 0:
+        return res
+    k_bits, first = _get_const_bits(n, value)
+    res['ancillae'] = max(n - first - 2, 0)
+    if overflow_qbit and first == n - 1:
+        resources.add_gates(res, "CNOT")
+    _get_const_carry_resources(
+        k_bits, range(first + 1, n if overflow_qbit else n - 1), res)
+    resources.add_gates(res, "CNOT", n - first - 1)
+    resources.add_gates(res, "X", sum(k_bits))
+    uncomputed = range(first + 1, n - 1)
+    if len(uncomputed) > 0:
+        resources.add_gates(res, "X", 2 * (n - 1 - first))
+        _get_const_carry_resources(k_bits, uncomputed, res)
+    return res
+
+
+# Depth of the MAJ and UMA gates
+_MAJ_DEPTH = 3
+_UMA_DEPTH = 5
+
+
+def _get_common_resources(a_l: int, b_l: int, overflow_qbit: bool,
+                          uncompute_with_uma: bool):
+    """Resources of the gates applied by :func:`_common`,
+    :func:`_middle_logic` and by the MAJ chain and its uncomputation."""
+    res = resources.new_resources(a_l + b_l + int(overflow_qbit),
+                                  int(b_l > 1))
+    if b_l == 1:
+        resources.add_gates(res, "CNOT")
+        if overflow_qbit:
+            resources.add_gates(res, "X", 2)
+            resources.add_gates(res, "CCNOT")
+            if a_l > 1:
+                resources.add_gates(res, "CNOT")
+        return res
+
+    bits = min(a_l, b_l)
+    sub = 0 if (overflow_qbit or b_l > a_l) else 1
+    n_maj = 1 + max(bits - 1 - sub, 0)
+    # MAJ
+    resources.add_gates(res, "CNOT", 2 * n_maj, 0)
+    resources.add_gates(res, "CCNOT", n_maj, _MAJ_DEPTH * n_maj)
+    if b_l <= a_l:
+        resources.add_gates(res, "CNOT")
+        if (not overflow_qbit and a_l == b_l) or a_l > b_l:
+            resources.add_gates(res, "CNOT")
+    else:
+        for nctrls in range(1, b_l - bits + int(overflow_qbit) + 1):
+            resources.add_gates(res, resources.get_gate_key(nctrls, "X"))
+    if uncompute_with_uma:
+        resources.add_gates(res, "X", 2 * n_maj, 0)
+        resources.add_gates(res, "CNOT", 3 * n_maj, 0)
+        resources.add_gates(res, "CCNOT", n_maj, _UMA_DEPTH * n_maj)
+    else:
+        resources.add_gates(res, "CNOT", 2 * n_maj, 0)
+        resources.add_gates(res, "CCNOT", n_maj, _MAJ_DEPTH * n_maj)
+    return res
+
+
+def get_comparator_resources(a_l: int, b_l: int):
+    """Resources required by :func:`comparator`, see
+    :mod:`~qat.external.utils.qroutines.resources`."""
+    res = _get_common_resources(a_l, b_l, True, False)
+    resources.add_gates(res, "X", 2 * a_l, 2)
+    return res
+
+
+def get_subtractor_resources(a_l: int, b_l: int, overflow_qbit=False):
+    """Resources required by :func:`subtractor`, see
+    :mod:`~qat.external.utils.qroutines.resources`."""
+    res = _get_common_resources(a_l, b_l, overflow_qbit, True)
+    resources.add_gates(res, "X", 2 * a_l + b_l, 2)
+    return res
+
+
+def get_adder_resources(a_l: int, b_l: int, overflow_qbit=False):
+    """Resources required by :func:`adder`, see
+    :mod:`~qat.external.utils.qroutines.resources`."""
+    return _get_common_resources(a_l, b_l, overflow_qbit, True)
+
+
+# The MAJ and UMA gates take no parameter, so that all their applications
+# share a single definition in the compiled circuit
+@build_gate("MAJ", [])
+def _majority():
     """Majority gate."""
     qfun = QRoutine()
     c = qfun.new_wires(1)[0]
@@ -219,8 +432,8 @@ def _majority(name):
     return qfun
 
 
-@build_gate("UMA", [str])
-def _unmajority(name):
+@build_gate("UMA", [])
+def _unmajority():
     """Unmajority gate."""
     qfun = QRoutine()
     c = qfun.new_wires(1)[0]
@@ -235,6 +448,26 @@ def _unmajority(name):
     return qfun
 
 
+# Available implementations, with the same signature, by name: the ripple
+# adder of this module, with a linear depth and a single ancilla, and the
+# carry-lookahead one, with a logarithmic depth and about 2n ancillae
+ADDERS = {'ripple': adder, 'cla': adder_cla.adder}
+SUBTRACTORS = {'ripple': subtractor, 'cla': adder_cla.subtractor}
+COMPARATORS = {'ripple': comparator, 'cla': adder_cla.comparator}
+ADDERS_RESOURCES = {
+    'ripple': get_adder_resources,
+    'cla': adder_cla.get_adder_resources
+}
+
+
+def get_adder(name: str = 'ripple'):
+    """The adder gate with the given name, one of ADDERS"""
+    if name not in ADDERS:
+        raise ValueError(
+            f"Unknown adder {name}, choose among {list(ADDERS)}")
+    return ADDERS[name]
+
+
 # TODO
 @build_gate("HIGH_BIT", [])
 def high_bit_only():
@@ -259,9 +492,9 @@ def high_bit_only():
 
 #     # b must be negated since we want to have a + (-b)
 #     qrout.apply(X, b)
-#     qrout.apply(_majority(""), c, b, a)
+#     qrout.apply(_majority(), c, b, a)
 #     qrout.apply(CNOT, a, out)
-#     qrout.apply(_majority("").dag(), c, b, a)
+#     qrout.apply(_majority().dag(), c, b, a)
 #     qrout.apply(X, b)
 
 #     return qrout
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+In-place carry-lookahead adder based on Draper, Kutin, Rains and Svore,
+quant-ph/0406142.
+
+It has the same interface of the ripple adder of
+:mod:`~qat.external.utils.qroutines.adder`, but a depth logarithmic in the
+size of the registers, at the price of about 2n ancillae (the carries and the
+propagate bits of the blocks of the carry network), which are restored. The
+ancillae of the resource estimators are an upper bound: the compiler may
+reuse the wires of the propagate bits once they are uncomputed.
+"""
+import logging
+from typing import List, Tuple
+
+from qat.lang.AQASM.gates import CCNOT, CNOT, X
+from qat.lang.AQASM.misc import build_gate
+from qat.lang.AQASM.routines import QRoutine
+
+from qat.external.utils.qroutines import resources
+
+LOGGER = logging.getLogger(__name__)
+
+# A bit of the carry network: ('z', i) is the carry into bit i, ('p', t, x)
+# the propagate bit of the block [2^t x, 2^t (x + 1)), stored in b for t = 0
+_Bit = Tuple
+_Toffoli = Tuple[_Bit, _Bit, _Bit]
+
+
+def _log2_floor(n: int) -> int:
+    return n.bit_length() - 1
+
+
+def get_propagate_ancillae(n: int) -> int:
+    """Number of ancillae storing the propagate bits of the carry network on
+    n bits."""
+    return sum(n // 2**t - 1 for t in range(1, _log2_floor(n)))
+
+
+def _get_carry_network_rounds(n: int) -> List[List[_Toffoli]]:
+    """The Toffoli gates of the carry network on n bits, grouped in rounds of
+    gates acting on different bits. Given the generate bits in ('z', i + 1)
+    and the propagate bits in ('p', 0, i), it computes the carries ('z', i)
+    for 1 <= i <= n.
+
+    """
+    if n < 2:
+        return []
+    log_n = _log2_floor(n)
+    p_rounds = []
+    for t in range(1, log_n):
+        p_rounds.append([(('p', t - 1, 2 * x), ('p', t - 1, 2 * x + 1),
+                          ('p', t, x)) for x in range(1, n // 2**t)])
+    g_rounds = []
+    for t in range(1, log_n + 1):
+        g_rounds.append([(('z', 2**t * m + 2**(t - 1)), ('p', t - 1, 2 * m + 1),
+                          ('z', 2**t * m + 2**t)) for m in range(n // 2**t)])
+    # Largest t such that 2^t <= 2n / 3
+    log_c = 0
+    while 3 * 2**(log_c + 1) <= 2 * n:
+        log_c += 1
+    c_rounds = []
+    for t in range(log_c, 0, -1):
+        c_rounds.append([
+            (('z', 2**t * m), ('p', t - 1, 2 * m), ('z', 2**t * m + 2**(t - 1)))
+            for m in range(1, (n - 2**(t - 1)) // 2**t + 1)
+        ])
+    rounds = p_rounds + g_rounds + c_rounds + p_rounds[::-1]
+    return [r for r in rounds if len(r) > 0]
+
+
+def _apply_carry_network(qfun: QRoutine, n: int, b, z, p_anc, dag=False):
+    # Offsets of the propagate bits of each level in p_anc
+    offsets = {}
+    offset = 0
+    for t in range(1, _log2_floor(n) if n > 0 else 0):
+        offsets[t] = offset
+        offset += n // 2**t - 1
+
+    def wire(bit):
+        if bit[0] == 'z':
+            return z[bit[1]]
+        if bit[1] == 0:
+            return b[bit[2]]
+        return p_anc[offsets[bit[1]] + bit[2] - 1]
+
+    rounds = _get_carry_network_rounds(n)
+    # The gates of a round commute, so it is enough to reverse the rounds
+    for toffolis in (reversed(rounds) if dag else rounds):
+        for ctrl_1, ctrl_2, target in toffolis:
+            qfun.apply(CCNOT, wire(ctrl_1), wire(ctrl_2), wire(target))
+
+
+def _init(a_l: int, b_l: int, overflow_qbit: bool, little_endian: bool,
+          extend_b: bool = False):
+    """Allocate the wires. a (and b if extend_b) is extended with ancillae
+    set to 0 up to the length of the other register."""
+    if a_l > b_l and not extend_b:
+        raise ValueError(
+            f"a ({a_l} qubits) can't be longer than b ({b_l} qubits)")
+    n = max(a_l, b_l)
+    qfun = QRoutine()
+    a = list(qfun.new_wires(a_l))
+    b = list(qfun.new_wires(b_l))
+    if not little_endian:
+        a.reverse()
+        b.reverse()
+    cout = qfun.new_wires(1)[0] if overflow_qbit else None
+    for reg in (a, b):
+        if len(reg) < n:
+            ext = qfun.new_wires(n - len(reg))
+            qfun.set_ancillae(ext)
+            reg.extend(ext)
+    # Carries into bits 1..n-1, the one into bit n is the cout
+    z = [None]
+    if n > 1:
+        z_anc = qfun.new_wires(n - 1)
+        qfun.set_ancillae(z_anc)
+        z.extend(z_anc)
+    if cout is not None:
+        z.append(cout)
+    n_p = get_propagate_ancillae(n)
+    p_anc = None
+    if n_p > 0:
+        p_anc = qfun.new_wires(n_p)
+        qfun.set_ancillae(p_anc)
+    LOGGER.debug("a %s, b %s, z %s, p %s", a, b, z, p_anc)
+    return qfun, a, b, z, p_anc
+
+
+def _add(qfun: QRoutine, a, b, z, p_anc, overflow_qbit: bool):
+    """b = a + b, the carry out is added to z[n] if overflow_qbit."""
+    n = len(b)
+    # Number of bits whose carry out is computed
+    n_g = n if overflow_qbit else n - 1
+    for i in range(n_g):
+        qfun.apply(CCNOT, a[i], b[i], z[i + 1])
+    for i in range(n):
+        qfun.apply(CNOT, a[i], b[i])
+    _apply_carry_network(qfun, n_g, b, z, p_anc)
+    for i in range(1, n):
+        qfun.apply(CNOT, z[i], b[i])
+    # Now b = s = a + b. The carries into bits 1..n-1 are uncomputed using
+    # the fact that they are equal to the ones of a + not(s)
+    for i in range(n - 1):
+        qfun.apply(X, b[i])
+        qfun.apply(CNOT, a[i], b[i])
+    _apply_carry_network(qfun, n - 1, b, z, p_anc, dag=True)
+    for i in range(n - 1):
+        qfun.apply(CNOT, a[i], b[i])
+        qfun.apply(CCNOT, a[i], b[i], z[i + 1])
+        qfun.apply(X, b[i])
+
+
+@build_gate("CLA_ADD", [int, int, bool, bool])
+def adder(a_l: int, b_l: int, overflow_qbit=False, little_endian=True):
+    """Carry-lookahead version of
+    :func:`~qat.external.utils.qroutines.adder.adder`: b = a + b, with the
+    carry out in the additional qubit if overflow_qbit. a can't be longer
+    than b."""
+    qfun, a, b, z, p_anc = _init(a_l, b_l, overflow_qbit, little_endian)
+    _add(qfun, a, b, z, p_anc, overflow_qbit)
+    return qfun
+
+
+@build_gate("CLA_SUB", [int, int, bool, bool])
+def subtractor(a_l: int, b_l: int, overflow_qbit=False, little_endian=True):
+    """Carry-lookahead version of
+    :func:`~qat.external.utils.qroutines.adder.subtractor`."""
+    qfun, a, b, z, p_anc = _init(a_l, b_l, overflow_qbit, little_endian)
+    for qb in a:
+        qfun.apply(X, qb)
+    _add(qfun, a, b, z, p_anc, overflow_qbit)
+    for qb in a + b:
+        qfun.apply(X, qb)
+    return qfun
+
+
+def _compute_carry_out(qfun: QRoutine, a, b, z, p_anc, dag: bool):
+    """Compute the carry out of not(a) + b in z[n] (or uncompute it if
+    dag), as in the first half of :func:`_add`."""
+    n = len(b)
+    if dag:
+        _apply_carry_network(qfun, n, b, z, p_anc, dag=True)
+    else:
+        for qb in a:
+            qfun.apply(X, qb)
+        for i in range(n):
+            qfun.apply(CCNOT, a[i], b[i], z[i + 1])
+    for i in range(n):
+        qfun.apply(CNOT, a[i], b[i])
+    if dag:
+        for i in range(n):
+            qfun.apply(CCNOT, a[i], b[i], z[i + 1])
+        for qb in a:
+            qfun.apply(X, qb)
+    else:
+        _apply_carry_network(qfun, n, b, z, p_anc)
+
+
+@build_gate("CLA_COMP", [int, int, bool])
+def comparator(a_l: int, b_l: int, little_endian=True):
+    """Carry-lookahead version of
+    :func:`~qat.external.utils.qroutines.adder.comparator`: the additional
+    qubit is flipped if a < b. The carry out of not(a) + b is computed,
+    copied and uncomputed, so a and b can have different lengths."""
+    qfun, a, b, z, p_anc = _init(a_l, b_l, False, little_endian, True)
+    cout = qfun.new_wires(1)[0]
+    z_n = qfun.new_wires(1)
+    qfun.set_ancillae(z_n)
+    z.append(z_n[0])
+    _compute_carry_out(qfun, a, b, z, p_anc, False)
+    qfun.apply(CNOT, z[-1], cout)
+    _compute_carry_out(qfun, a, b, z, p_anc, True)
+    return qfun
+
+
+def _get_network_resources(n: int, res: dict):
+    rounds = _get_carry_network_rounds(n)
+    resources.add_gates(res, "CCNOT", sum(len(r) for r in rounds),
+                        len(rounds))
+
+
+def _get_add_resources(n: int, overflow_qbit: bool, res: dict):
+    n_g = n if overflow_qbit else n - 1
+    resources.add_gates(res, "CCNOT", n_g, 1)
+    resources.add_gates(res, "CNOT", n, 1)
+    _get_network_resources(n_g, res)
+    resources.add_gates(res, "CNOT", n - 1, 1)
+    resources.add_gates(res, "X", n - 1, 1)
+    resources.add_gates(res, "CNOT", n - 1, 1)
+    _get_network_resources(n - 1, res)
+    resources.add_gates(res, "CNOT", n - 1, 1)
+    resources.add_gates(res, "CCNOT", n - 1, 1)
+    resources.add_gates(res, "X", n - 1, 1)
+    return res
+
+
+def get_adder_resources(a_l: int, b_l: int, overflow_qbit=False):
+    """Resources required by :func:`adder`, see
+    :mod:`~qat.external.utils.qroutines.resources`."""
+    res = resources.new_resources(
+        a_l + b_l + int(overflow_qbit),
+        b_l - a_l + b_l - 1 + get_propagate_ancillae(b_l))
+    return _get_add_resources(b_l, overflow_qbit, res)
+
+
+def get_subtractor_resources(a_l: int, b_l: int, overflow_qbit=False):
+    """Resources required by :func:`subtractor`, see
+    :mod:`~qat.external.utils.qroutines.resources`."""
+    res = get_adder_resources(a_l, b_l, overflow_qbit)
+    # a is extended to the length of b
+    return resources.add_gates(res, "X", 3 * b_l, 2)
+
+
+def get_comparator_resources(a_l: int, b_l: int):
+    """Resources required by :func:`comparator`, see
+    :mod:`~qat.external.utils.qroutines.resources`."""
+    n = max(a_l, b_l)
+    res = resources.new_resources(a_l + b_l + 1,
+                                  2 * n - a_l - b_l + n +
+                                  get_propagate_ancillae(n))
+    resources.add_gates(res, "X", 2 * n, 2)
+    resources.add_gates(res, "CCNOT", 2 * n, 2)
+    resources.add_gates(res, "CNOT", 2 * n + 1, 3)
+    _get_network_resources(n, res)
+    _get_network_resources(n, res)
+    return res
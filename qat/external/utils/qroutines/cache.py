@@ -0,0 +1,225 @@
+"""
+Cache of the patterns and of the circuits built by the routines of this
+package.
+
+The entries are keyed by the qualified name of the routine, by a fingerprint
+of its code and by its arguments, which must be hashable (see
+:mod:`~qat.external.utils.qroutines.patterns`). The fingerprint hashes the
+version of the package and the source of the module defining the routine, so
+that the files written by another version of the code are not loaded. They are
+kept in a bounded in-process LRU cache and, if a directory is set with
+:func:`set_cache_dir` or with the environment variable
+``QAT_UTILS_CACHE_DIR``, also on disk, so that they survive across processes:
+the patterns are pickled, the circuits are stored as ``.circ`` files.
+
+The pattern generators of this package, f.e.
+:func:`~qat.external.utils.qroutines.sorting_network.get_pattern_sorter`, are
+decorated with :func:`memoize`, while the circuits are retrieved with
+:func:`get_circuit`. The cached objects are shared: the circuits must not be
+modified.
+"""
+import functools
+import hashlib
+import importlib.metadata
+import inspect
+import logging
+import os
+import pickle
+import sys
+import tempfile
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Callable, Hashable, Optional, Tuple
+
+from qat.external.utils.simulation import reversible
+
+if TYPE_CHECKING:
+    from qat.core import Circuit
+
+LOGGER = logging.getLogger(__name__)
+
+CACHE_DIR_ENV = "QAT_UTILS_CACHE_DIR"
+
+_MISSING = object()
+
+
+def _get_version() -> str:
+    try:
+        return importlib.metadata.version("qat-utils")
+    except importlib.metadata.PackageNotFoundError:
+        return "unknown"
+
+
+_VERSION = _get_version()
+
+
+class LRUCache:
+    """In-process cache of at most maxsize entries, evicting the least
+    recently used one."""
+    def __init__(self, maxsize: int):
+        if maxsize < 1:
+            raise ValueError(f"maxsize must be positive, got {maxsize}")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: 'OrderedDict[Hashable, Any]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            evicted, _ = self._data.popitem(last=False)
+            LOGGER.debug("evicted %s", evicted)
+
+    def clear(self):
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+PATTERNS = LRUCache(256)
+CIRCUITS = LRUCache(32)
+_cache_dir: Optional[str] = os.environ.get(CACHE_DIR_ENV) or None
+
+
+def set_cache_dir(path: Optional[str]):
+    """Directory of the disk cache, created if missing; None disables it."""
+    global _cache_dir
+    if path is not None:
+        os.makedirs(path, exist_ok=True)
+    _cache_dir = path
+
+
+def get_cache_dir() -> Optional[str]:
+    return _cache_dir
+
+
+def clear(disk: bool = False):
+    """Empty the in-process caches and, if disk, the files of the disk
+    cache."""
+    PATTERNS.clear()
+    CIRCUITS.clear()
+    if disk and _cache_dir is not None:
+        for fname in os.listdir(_cache_dir):
+            if fname.endswith((".pkl", ".circ")):
+                os.remove(os.path.join(_cache_dir, fname))
+
+
+@functools.lru_cache(maxsize=None)
+def _get_fingerprint(module_name: str) -> str:
+    """Hash of the version of the package and of the source of the module"""
+    try:
+        source = inspect.getsource(sys.modules[module_name])
+    except (KeyError, OSError, TypeError):
+        source = ""
+    return hashlib.sha1(f"{_VERSION}\n{source}".encode()).hexdigest()
+
+
+def _get_path(key: Tuple[str, str, tuple], ext: str) -> Optional[str]:
+    if _cache_dir is None:
+        return None
+    # The patterns are named tuples of ints, strs and tuples, so their repr
+    # is stable across processes, unlike their hash
+    digest = hashlib.sha1(repr(key).encode()).hexdigest()
+    return os.path.join(_cache_dir, f"{key[0]}-{digest}{ext}")
+
+
+def _write(path: str, dump: Callable[[str], None]):
+    # Write and rename, so that concurrent jobs never read a partial file. The
+    # extension is kept, since Circuit.dump adds it if missing
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path),
+                                    suffix=os.path.splitext(path)[1])
+    os.close(fd)
+    try:
+        dump(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _dump_pickle(value: Any) -> Callable[[str], None]:
+    def dump(path: str):
+        with open(path, "wb") as f:
+            pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+
+    return dump
+
+
+def _load_pickle(path: str) -> Any:
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def _get_or_build(cache: LRUCache, key: Tuple[str, str, tuple], ext: str,
+                  build: Callable[[], Any], load: Callable[[str], Any],
+                  dump: Callable[[Any], Callable[[str], None]]) -> Any:
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        return value
+    path = _get_path(key, ext)
+    if path is not None and os.path.exists(path):
+        LOGGER.debug("loading %s from %s", key[0], path)
+        value = load(path)
+    else:
+        value = build()
+        if path is not None:
+            _write(path, dump(value))
+    cache.put(key, value)
+    return value
+
+
+def get_pattern(name: str, func: Callable[..., Any], *args) -> Any:
+    """func(\\*args), cached under the given name, the fingerprint of the
+    module of func and the arguments, which must be hashable."""
+    key = (name, _get_fingerprint(func.__module__), args)
+    return _get_or_build(PATTERNS, key, ".pkl", lambda: func(*args),
+                         _load_pickle, _dump_pickle)
+
+
+def memoize(func: Callable[..., Any]) -> Callable[..., Any]:
+    """Decorator caching the results of a pattern generator with
+    :func:`get_pattern`, under the name of the function. The default values
+    are filled in, so that f(8) and f(8, 'bitonic') share the same entry."""
+    signature = inspect.signature(func)
+    name = f"{func.__module__}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        return get_pattern(name, func, *bound.args)
+
+    wrapper.uncached = func
+    return wrapper
+
+
+def get_circuit(gate, *args) -> 'Circuit':
+    """Circuit of the routine gate(\\*args), built by
+    :func:`~qat.external.utils.simulation.reversible.routine_to_circ`. gate
+    must be a function decorated by build_gate, whose qualified name is used
+    as key together with the fingerprint of its module and the arguments: the
+    names of the gates are not unique."""
+    from qat.core import Circuit
+
+    key = (f"{gate.__module__}.{gate.__qualname__}",
+           _get_fingerprint(gate.__module__), args)
+    return _get_or_build(CIRCUITS, key, ".circ",
+                         lambda: reversible.routine_to_circ(gate(*args)),
+                         Circuit.load, lambda circ: circ.dump)
@@ -0,0 +1,158 @@
+"""
+Hamming weight computed with a Wallace tree of carry-save full adders.
+
+The input bits are reduced, layer by layer, with 3:2 compressors (full adders
+returning the sum in place and the carry on a new line) until each weight has
+at most two bits, which are added with a single adder. The layers have a
+constant depth and their number is logarithmic in n, so the depth is lower
+than the one of the adder tree of
+:mod:`~qat.external.utils.qroutines.hamming_weight_compute.fpc`.
+
+The patterns use the same conventions as the ones of fpc, so the functions of
+:mod:`~qat.external.utils.qroutines.hamming_weight_compute.fpc` reading a
+pattern, as get_to_measure_qubits and get_qroutine_for_qubits_weight_check,
+accept them too.
+"""
+import logging
+from typing import List
+
+from qat.lang.AQASM import CCNOT, CNOT, QRoutine
+from qat.lang.AQASM.misc import build_gate
+
+from qat.external.utils.qroutines import adder, cache, patterns, resources
+
+LOGGER = logging.getLogger(__name__)
+
+# Depth of the full adder
+_FA_DEPTH = 4
+
+
+@build_gate("FA", [])
+def _full_adder():
+    """Full adder on x, y, z, c: z is set to x ^ y ^ z and c, set to 0, to
+    the majority of x, y, z. y is left to x ^ y."""
+    qfun = QRoutine()
+    x, y, z, c = (qfun.new_wires(1)[0] for _ in range(4))
+    qfun.apply(CCNOT, x, y, c)
+    qfun.apply(CNOT, x, y)
+    qfun.apply(CCNOT, y, z, c)
+    qfun.apply(CNOT, y, z)
+    return qfun
+
+
+@cache.memoize
+def get_qroutine_for_qubits_weight_get_pattern(n, adder_name='ripple'):
+    """Given n bits, it returns the
+    :class:`~qat.external.utils.qroutines.patterns.CarrySavePattern` to
+    compute the weight of these n bits, ie:
+
+    #. engine, 'csa'
+    #. n_lines: required qubits, n
+    #. n_couts, the number of lines, set to 0, storing the carries of the full
+       adders and the missing bits of the final adder
+    #. compressors, the layers of full adders (x, y, z, c), see
+       :func:`_full_adder`
+    #. final_adder, the registers (a, b) of the final adder, or None
+    #. results, the bits containing the final results
+    #. adder, the name of the final adder, one of
+       :data:`~qat.external.utils.qroutines.adder.ADDERS`
+    """
+    adder.get_adder(adder_name)
+    n_results = n.bit_length()
+    n_couts = 0
+
+    def new_line():
+        nonlocal n_couts
+        n_couts += 1
+        return n + n_couts - 1
+
+    # The bits of weight 2^j. As sum_j len(columns[j]) 2^j = n, the last
+    # column never has more than one bit, so the carries always fit
+    columns: List[List[int]] = [[] for _ in range(n_results)]
+    columns[0] = list(range(n))
+    compressors = []
+    while any(len(column) > 2 for column in columns):
+        layer = []
+        next_columns: List[List[int]] = [[] for _ in range(n_results)]
+        for j, column in enumerate(columns):
+            n_fa = len(column) // 3
+            for k in range(n_fa):
+                x, y, z = column[3 * k:3 * k + 3]
+                c = new_line()
+                layer.append((x, y, z, c))
+                next_columns[j].append(z)
+                next_columns[j + 1].append(c)
+            next_columns[j].extend(column[3 * n_fa:])
+        LOGGER.debug("layer %s", layer)
+        compressors.append(tuple(layer))
+        columns = next_columns
+
+    doubles = [j for j, column in enumerate(columns) if len(column) == 2]
+    start = doubles[0] if doubles else n_results
+    results = [
+        column[0] if column else new_line() for column in columns[:start]
+    ]
+    final_adder = None
+    if doubles:
+        b_bits = [
+            column[0] if column else new_line() for column in columns[start:]
+        ]
+        a_bits = [
+            column[1] if len(column) == 2 else new_line()
+            for column in columns[start:doubles[-1] + 1]
+        ]
+        final_adder = (tuple(a_bits), tuple(b_bits))
+        results += b_bits
+    LOGGER.debug("final adder %s", final_adder)
+    LOGGER.debug("results %s", results)
+
+    return patterns.CarrySavePattern(engine='csa',
+                                     adder=adder_name,
+                                     n_lines=n,
+                                     n_couts=n_couts,
+                                     compressors=tuple(compressors),
+                                     final_adder=final_adder,
+                                     results=tuple(results))
+
+
+@build_gate("CSA_WCOM", [int, int, patterns.CarrySavePattern])
+def get_qroutine_for_qubits_weight(a_len: int, cout_len: int,
+                                   patterns_dict: patterns.CarrySavePattern):
+    """QRoutine to compute the hamming weight of a set of qubits, given the
+    pattern computed by :func:`get_qroutine_for_qubits_weight_get_pattern`."""
+    assert a_len == patterns_dict['n_lines']
+    assert cout_len == patterns_dict['n_couts']
+
+    qfun = QRoutine()
+    a_qs = qfun.new_wires(a_len)
+    cout_qs = qfun.new_wires(cout_len)
+    for layer in patterns_dict['compressors']:
+        for bits in layer:
+            qfun.apply(_full_adder(),
+                       patterns_dict.get_qubits(a_qs, cout_qs, bits))
+    if patterns_dict['final_adder'] is not None:
+        a_bits, b_bits = patterns_dict['final_adder']
+        qfun_add = (~adder.get_adder(patterns_dict['adder']))(len(a_bits),
+                                                              len(b_bits),
+                                                              False, True)
+        qfun.apply(qfun_add, patterns_dict.get_qubits(a_qs, cout_qs, a_bits),
+                   patterns_dict.get_qubits(a_qs, cout_qs, b_bits))
+    return qfun
+
+
+def get_qroutine_for_qubits_weight_resources(
+        patterns_dict: patterns.CarrySavePattern):
+    """Resources required by :func:`get_qroutine_for_qubits_weight`, see
+    :mod:`~qat.external.utils.qroutines.resources`."""
+    res = resources.new_resources(patterns_dict['n_lines'] +
+                                  patterns_dict['n_couts'])
+    # The full adders of a layer act on different qubits
+    for layer in patterns_dict['compressors']:
+        resources.add_gates(res, "CCNOT", 2 * len(layer), 0)
+        resources.add_gates(res, "CNOT", 2 * len(layer), _FA_DEPTH)
+    if patterns_dict['final_adder'] is not None:
+        a_bits, b_bits = patterns_dict['final_adder']
+        get_adder_resources = adder.ADDERS_RESOURCES[patterns_dict['adder']]
+        resources.add_routine(
+            res, get_adder_resources(len(a_bits), len(b_bits), False))
+    return res
@@ -1,4 +1,5 @@
 import logging
+from collections import Counter
 from math import ceil, log
 from typing import TYPE_CHECKING
 
@@ -6,8 +7,11 @@ from qat.lang.AQASM import QRoutine, X
 from qat.lang.AQASM.misc import build_gate
 
 from qat.external.utils.bits import conversion
-from qat.external.utils.qroutines import adder
+from qat.external.utils.qroutines import adder, cache, patterns
 from qat.external.utils.qroutines import qregs_init as qregs
+from qat.external.utils.qroutines import resources
+from qat.external.utils.qroutines.hamming_weight_compute import csa
+from qat.external.utils.synthesis.mctrls import mcx
 
 if TYPE_CHECKING:
     from qat.lang.AQASM.bits import QRegister
@@ -15,10 +19,10 @@ if TYPE_CHECKING:
 LOGGER = logging.getLogger(__name__)
 
 
-@build_gate("FPC_WCOM", [int, int, dict])
+@build_gate("FPC_WCOM", [int, int, patterns.AdderTreePattern])
 def get_qroutine_for_qubits_weight(a_len: int, cout_len: int,
-                                   patterns_dict: dict):
-    """QRoutine to compute the hamming weight of a set of qubits. The patterns_dict
+                                   patterns_dict: patterns.AdderTreePattern):
+    """QRoutine to compute the hamming weight of a set of qubits. The pattern
     must be computed in advance by the :func:
     `~get_qroutine_for_qubits_weight_get_pattern`. This will help to have a
     precise estimate of the number of qbits and gates that will be required.
@@ -32,65 +36,55 @@ def get_qroutine_for_qubits_weight(a_len: int, cout_len: int,
     cout_qs = qfun.new_wires(cout_len)
     LOGGER.debug("a %s", a_qs)
     LOGGER.debug("cout %s", cout_qs)
+    adder_gate = adder.get_adder(patterns_dict.adder)
 
-    for i in patterns_dict['adders_pattern']:
-        cout_idx = int(i[-1][1:])
-        half_bits = int((len(i) - 1) / 2)
-        input_qubits = []
-        for j in i:
-            if j[0] == 'a':
-                input_qubits.append(a_qs[int(j[1:])])
-            elif j[0] == 'c':
-                input_qubits.append(cout_qs[int(j[1:])])
-            else:
-                raise ValueError(
-                    ("Invalid data in patterns_dict, has it been generated"
-                     "using the get_pattern() routine?"))
-        tmp_a = [input_qubits[i] for i in range(half_bits)]
-        tmp_b = [input_qubits[i] for i in range(half_bits, 2 * half_bits)
-                 ] + [cout_qs[cout_idx]]
+    for i, (a_l, b_l, overflow) in zip(patterns_dict.adders_pattern,
+                                       patterns_dict.adders_shape):
+        input_qubits = patterns_dict.get_qubits(a_qs, cout_qs, i)
+        tmp_a = input_qubits[:a_l]
+        tmp_b = input_qubits[a_l:]
         LOGGER.debug("%s", tmp_a)
         LOGGER.debug("%s", tmp_b)
 
-        # tmp_b - 1 bcz we also added the cout in tmp_b
-        qfun_add = (~adder.adder)(len(tmp_a), len(tmp_b) - 1, True, True)
+        qfun_add = (~adder_gate)(a_l, b_l, overflow, True)
         qfun.apply(qfun_add, tmp_a, tmp_b)
     return qfun
 
 
 def get_to_measure_qubits(a_qs: 'QRegister', cout_qs: 'QRegister',
-                          patterns_dict: dict):
+                          patterns_dict: patterns.WeightPattern):
     """It returns the list of qbits containing the final result"""
-    to_measure_qubits = []
-    for j in patterns_dict['results']:
-        if j[0] == 'a':
-            to_measure_qubits.append(a_qs[int(j[1:])])
-        elif j[0] == 'c':
-            to_measure_qubits.append(cout_qs[int(j[1:])])
-        else:
-            raise ValueError(
-                ("Invalid data in patterns_dict, has it been generated"
-                 "using the get_pattern() routine?"))
-    return to_measure_qubits
-
-
-def get_qroutine_for_qubits_weight_get_pattern(n):
-    """Given n bits, it returns a dictionary containing the pattern to compute the
-    weight of this n bits, ie:
+    return patterns_dict.get_qubits(a_qs, cout_qs, patterns_dict.results)
+
+
+@cache.memoize
+def get_qroutine_for_qubits_weight_get_pattern(n, adder_name='ripple'):
+    """Given n bits, it returns the
+    :class:`~qat.external.utils.qroutines.patterns.AdderTreePattern` to
+    compute the weight of this n bits, ie:
 
     #. n_lines: required qubits (>= n, the closest power of 2)
     #. n_couts, the total number of couts required by the adders
-    #. adders_pattern, the pattern of adders
+    #. adders_pattern, the qubits of each adder, a then b (and the cout)
+    #. adders_shape, the (a_l, b_l, overflow) arguments of each adder
     #. results, the bits containing the final results
+    #. engine, 'fpc', see :data:`WEIGHT_ENGINES`
+    #. adder, the name of the adder to use, one of
+       :data:`~qat.external.utils.qroutines.adder.ADDERS`: 'ripple' uses
+       fewer ancillae, 'cla' has a logarithmic depth
+    #. saved_qubits, 0, see
+       :func:`get_qroutine_for_qubits_weight_get_pattern_unpadded`
     """
+    adder.get_adder(adder_name)
     steps = ceil(log(n, 2))
-    # TODO maybe we can use fewer lines
+    # See get_qroutine_for_qubits_weight_get_pattern_unpadded to use only n
+    # lines
     n_lines = 2**steps
     patterns_dict = {}
     patterns_dict['n_lines'] = n_lines
     patterns_dict['n_couts'] = n_lines - 1
-    couts = ["c{0}".format(i) for i in range(patterns_dict['n_couts'])][::-1]
-    inputs = ["a{0}".format(i) for i in range(patterns_dict['n_lines'])][::-1]
+    couts = [n_lines + i for i in range(patterns_dict['n_couts'])][::-1]
+    inputs = list(range(patterns_dict['n_lines']))[::-1]
     LOGGER.debug("inputs %s", inputs)
     LOGGER.debug("couts %s", couts)
     patterns_dict['adders_pattern'] = []
@@ -124,12 +118,117 @@ def get_qroutine_for_qubits_weight_get_pattern(n):
     LOGGER.debug("adders pattern\n%s", patterns_dict['adders_pattern'])
     patterns_dict['results'] = inputs_next_stage[::-1]
     LOGGER.debug("results\n%s", patterns_dict['results'])
-    return patterns_dict
+    return patterns.AdderTreePattern(
+        engine='fpc',
+        adder=adder_name,
+        n_lines=n_lines,
+        n_couts=patterns_dict['n_couts'],
+        adders_pattern=tuple(patterns_dict['adders_pattern']),
+        adders_shape=tuple(((len(i) - 1) // 2, (len(i) - 1) // 2, True)
+                           for i in patterns_dict['adders_pattern']),
+        results=tuple(patterns_dict['results']),
+        saved_qubits=0)
+
+
+@cache.memoize
+def get_qroutine_for_qubits_weight_get_pattern_unpadded(n,
+                                                        adder_name='ripple'):
+    """Same as :func:`get_qroutine_for_qubits_weight_get_pattern`, but with
+    exactly n lines, and a cout only for the adders whose sum can overflow.
+
+    The partial weights are added pairwise, stage by stage, as in the padded
+    version, so the tree has the same number of stages, but the two registers
+    of an adder can have different sizes, with a_l <= b_l in adders_shape.
+    saved_qubits is the number of lines and couts saved with respect to
+    :func:`get_qroutine_for_qubits_weight_get_pattern`.
+    """
+    adder.get_adder(adder_name)
+    adders_pattern = []
+    adders_shape = []
+    # Each group is the weight of some of the inputs: the maximum weight, and
+    # the bits storing it, the less significant first
+    groups = [(1, [i]) for i in range(n)]
+    n_couts = 0
+    while len(groups) > 1:
+        next_groups = []
+        for j in range(0, len(groups) - 1, 2):
+            # b, which receives the result, is the bigger register
+            group_a, group_b = sorted(groups[j:j + 2],
+                                      key=lambda g: len(g[1]))
+            weight = group_a[0] + group_b[0]
+            overflow = weight.bit_length() > len(group_b[1])
+            adder_outputs = list(group_b[1])
+            if overflow:
+                adder_outputs.append(n + n_couts)
+                n_couts += 1
+            adders_pattern.append(tuple(group_a[1]) + tuple(adder_outputs))
+            adders_shape.append((len(group_a[1]), len(group_b[1]), overflow))
+            LOGGER.debug("%s, %s --> %s", group_a[1], group_b[1],
+                         adder_outputs)
+            next_groups.append((weight, adder_outputs))
+        if len(groups) % 2 == 1:
+            next_groups.append(groups[-1])
+        groups = next_groups
+    padded_lines = 2**ceil(log(n, 2))
+    LOGGER.debug("adders pattern\n%s", adders_pattern)
+    LOGGER.debug("results\n%s", groups[0][1])
+    return patterns.AdderTreePattern(
+        engine='fpc',
+        adder=adder_name,
+        n_lines=n,
+        n_couts=n_couts,
+        adders_pattern=tuple(adders_pattern),
+        adders_shape=tuple(adders_shape),
+        results=tuple(groups[0][1]),
+        saved_qubits=2 * padded_lines - 1 - n - n_couts)
+
+
+def get_qroutine_for_qubits_weight_resources(
+        patterns_dict: patterns.AdderTreePattern):
+    """Resources required by :func:`get_qroutine_for_qubits_weight`, see
+    :mod:`~qat.external.utils.qroutines.resources`."""
+    res = resources.new_resources(
+        patterns_dict['n_lines'] + patterns_dict['n_couts'])
+    # The adders of the same stage share the ancillae, so they are applied one
+    # after the other
+    shapes = Counter(patterns_dict.adders_shape)
+    get_adder_resources = adder.ADDERS_RESOURCES[patterns_dict.adder]
+    for shape, count in shapes.items():
+        resources.add_routine(res, get_adder_resources(*shape), count)
+    return res
+
+
+# The routines computing the weight, by the engine of the pattern: the adder
+# tree of this module, or the carry-save tree of
+# :mod:`~qat.external.utils.qroutines.hamming_weight_compute.csa`
+WEIGHT_ENGINES = {
+    'fpc': get_qroutine_for_qubits_weight,
+    'csa': csa.get_qroutine_for_qubits_weight
+}
+WEIGHT_ENGINES_RESOURCES = {
+    'fpc': get_qroutine_for_qubits_weight_resources,
+    'csa': csa.get_qroutine_for_qubits_weight_resources
+}
+
+
+def get_qroutine_for_qubits_weight_check_resources(
+        weight_int: int, patterns_dict: patterns.WeightPattern,
+        compute_eq: bool):
+    """Resources required by :func:`get_qroutine_for_qubits_weight_check`,
+    see :mod:`~qat.external.utils.qroutines.resources`."""
+    res = WEIGHT_ENGINES_RESOURCES[patterns_dict.engine](patterns_dict)
+    res['qubits'] += int(compute_eq)
+    n_results = len(patterns_dict['results'])
+    equal_str = conversion.get_bitstring_from_int(weight_int, n_results, True)
+    resources.add_gates(res, "X", equal_str.count("0"), 1)
+    if compute_eq:
+        resources.add_gates(res, resources.get_gate_key(n_results, "X"))
+    return res
 
 
 # def get_qroutine_for_qubits_weight_check(circuit, a_qs, cin_q, cout_qs, eq_q,
 #                                          anc_q, weight_int, patterns_dict):
-@build_gate("FPC_WCHE", [int, int, int, dict, bool])
+@build_gate("FPC_WCHE", [int, int, int, patterns.WeightPattern, bool])
 def get_qroutine_for_qubits_weight_check(a_l, cout_l, weight_int,
                                          patterns_dict, compute_eq):
     """Circuit to check if a given set of register (a_qs) has weight equal to
@@ -142,6 +241,10 @@ def get_qroutine_for_qubits_weight_check(a_l, cout_l, weight_int,
 
     In this way, all the qubits are restored, except for the eq qubit.
 
+    The patterns_dict can also be computed by the get_pattern function of
+    :mod:`~qat.external.utils.qroutines.hamming_weight_compute.csa`, to use
+    the carry-save engine.
+
     Another possible use case is when we want to use not only the result qubits
     of this function, but also other qubits, as control ones. For example if,
     in addition to the weight being equal to a specific int, we also have to
@@ -156,7 +259,8 @@ def get_qroutine_for_qubits_weight_check(a_l, cout_l, weight_int,
         weight_int, len(patterns_dict['results']), True)
     LOGGER.debug("equal_str %s", equal_str)
 
-    qfun = (~get_qroutine_for_qubits_weight)(a_l, cout_l, patterns_dict)
+    weight_gate = WEIGHT_ENGINES[patterns_dict.engine]
+    qfun = (~weight_gate)(a_l, cout_l, patterns_dict)
     circuit.apply(qfun, a_qs, cout_qs)
     result_qubits = get_to_measure_qubits(a_qs, cout_qs, patterns_dict)
     # We already have the string in little endian, so we don't have to reverse
@@ -170,7 +274,106 @@ def get_qroutine_for_qubits_weight_check(a_l, cout_l, weight_int,
     return circuit
 
 
+@build_gate("FPC_WCLEAN", [int, int, patterns.WeightPattern])
+def get_qroutine_for_qubits_weight_check_clean(a_l, weight_int,
+                                               patterns_dict):
+    """Circuit flipping the eq qubit if the register a_qs has weight equal to
+    weight_int. Unlike :func:`get_qroutine_for_qubits_weight_check`, the
+    weight is uncomputed, so the couts are ancillae and are returned to 0:
+    the wires are only a_qs and eq.
+    """
+    circuit = QRoutine()
+    a_qs = circuit.new_wires(a_l)
+    eq_q = circuit.new_wires(1)
+    cout_l = patterns_dict['n_couts']
+    cout_qs = circuit.new_wires(cout_l)
+    if cout_l > 0:
+        circuit.set_ancillae(cout_qs)
+
+    qfun = get_qroutine_for_qubits_weight_check(a_l, cout_l, weight_int,
+                                                patterns_dict, False)
+    circuit.apply(qfun, a_qs, cout_qs)
+    set_qubit_if_true(a_qs, cout_qs, patterns_dict, eq_q, circuit)
+    circuit.apply(qfun.dag(), a_qs, cout_qs)
+    return circuit
+
+
+def get_qroutine_for_qubits_weight_check_clean_resources(
+        weight_int: int, patterns_dict: patterns.WeightPattern):
+    """Resources required by
+    :func:`get_qroutine_for_qubits_weight_check_clean`, see
+    :mod:`~qat.external.utils.qroutines.resources`."""
+    check = get_qroutine_for_qubits_weight_check_resources(
+        weight_int, patterns_dict, False)
+    res = resources.new_resources(patterns_dict['n_lines'] + 1,
+                                  patterns_dict['n_couts'])
+    resources.add_routine(res, check, 2)
+    res['ancillae'] += check['ancillae']
+    resources.add_gates(
+        res, resources.get_gate_key(len(patterns_dict['results']), "X"))
+    return res
+
+
+def _get_threshold_comparison(weight_int: int, at_most: bool):
+    """The constant c such that weight <= weight_int (or >= if not at_most)
+    iff weight < c (or not)."""
+    return weight_int + 1 if at_most else weight_int
+
+
+@build_gate("FPC_WTHR", [int, int, patterns.WeightPattern, bool])
+def get_qroutine_for_qubits_weight_threshold_check(a_l, weight_int,
+                                                   patterns_dict, at_most):
+    """Circuit flipping the flag qubit if the register a_qs has weight lower
+    or equal (greater or equal if not at_most) to weight_int. The weight is
+    compared with the constant by
+    :func:`~qat.external.utils.qroutines.adder.comparator_const` and then
+    uncomputed, as in :func:`get_qroutine_for_qubits_weight_check_clean`:
+    the wires are only a_qs and flag.
+    """
+    circuit = QRoutine()
+    a_qs = circuit.new_wires(a_l)
+    flag_q = circuit.new_wires(1)
+    cout_l = patterns_dict['n_couts']
+    cout_qs = circuit.new_wires(cout_l)
+    if cout_l > 0:
+        circuit.set_ancillae(cout_qs)
+
+    weight_gate = WEIGHT_ENGINES[patterns_dict.engine]
+    qfun = weight_gate(a_l, cout_l, patterns_dict)
+    circuit.apply(qfun, a_qs, cout_qs)
+    result_qubits = get_to_measure_qubits(a_qs, cout_qs, patterns_dict)
+    circuit.apply(
+        adder.comparator_const(len(result_qubits),
+                               _get_threshold_comparison(weight_int, at_most),
+                               True), result_qubits, flag_q)
+    if not at_most:
+        circuit.apply(X, flag_q)
+    circuit.apply(qfun.dag(), a_qs, cout_qs)
+    return circuit
+
+
+def get_qroutine_for_qubits_weight_threshold_check_resources(
+        weight_int: int, patterns_dict: patterns.WeightPattern,
+        at_most: bool):
+    """Resources required by
+    :func:`get_qroutine_for_qubits_weight_threshold_check`, see
+    :mod:`~qat.external.utils.qroutines.resources`."""
+    weight = WEIGHT_ENGINES_RESOURCES[patterns_dict.engine](
+        patterns_dict)
+    comparator = adder.get_comparator_const_resources(
+        len(patterns_dict['results']),
+        _get_threshold_comparison(weight_int, at_most))
+    res = resources.new_resources(patterns_dict['n_lines'] + 1,
+                                  patterns_dict['n_couts'])
+    resources.add_routine(res, weight, 2)
+    resources.add_routine(res, comparator)
+    res['ancillae'] = patterns_dict['n_couts'] + max(weight['ancillae'],
+                                                     comparator['ancillae'])
+    resources.add_gates(res, "X", int(not at_most))
+    return res
+
+
 def set_qubit_if_true(a_qs, cout_qs, patterns_dict, eq_q, circuit):
     result_qubits = get_to_measure_qubits(a_qs, cout_qs, patterns_dict)
     ctrls = [qb for qb in result_qubits]
-    circuit.apply(X.ctrl(len(ctrls)), ctrls, eq_q[0])
+    circuit.apply(mcx.get_mcx_gate(len(ctrls)), ctrls, eq_q[0])
@@ -1,6 +1,26 @@
+"""
+Preparation of the Dicke state D(n, k), the uniform superposition of the
+n-bit strings of weight k, following Bärtschi and Eidenbenz.
+
+:func:`generate` is the linear-depth construction: a chain of n Split &
+Cyclic Shift (SCS) blocks, each one with k controlled rotations. The chain
+U(n, k) maps the string with l <= k ones on its last wires to D(n, l).
+
+:func:`generate_log_depth` is the divide-and-conquer variant: a weight
+distribution block splits the l ones of the last wires between the two
+halves of the register, with the amplitudes of
+
+    D(n, l) = sum_x sqrt(C(n1, x) C(n2, l - x) / C(n, l)) D(n1, x) D(n2, l - x)
+
+and the two halves are then prepared in parallel, recursively. A block is
+prepared by the linear chain when its weight does not fit in its second half,
+so that the depth is O(k^2 log(n / k)) instead of O(n).
+"""
 import logging
+from math import comb
 
 import numpy as np
+from qat.external.utils.qroutines import resources
 from qat.lang.AQASM.gates import CNOT, RY, X
 from qat.lang.AQASM.routines import QRoutine
 from qat.lang.AQASM.misc import build_gate
@@ -27,6 +47,19 @@ def _iigate(angle: float) -> QRoutine:
     qf.apply(CNOT, wires[0], wires[2])
     return qf
 
+
+@build_gate("DICKE_WDB", [float, int])
+def _wdb_gate(angle: float, nctrls: int) -> QRoutine:
+    """Move the one of wire 1 to wire 0, with amplitude sin(angle / 2), if the
+    nctrls last wires are 1"""
+    qf = QRoutine()
+    wires = qf.new_wires(2 + nctrls)
+    qf.apply(CNOT, wires[0], wires[1])
+    qf.apply(RY(angle).ctrl(1 + nctrls), wires[1], *wires[2:], wires[0])
+    qf.apply(CNOT, wires[0], wires[1])
+    return qf
+
+
 def _scs(n: int, k: int) -> QRoutine:
     qf = QRoutine()
     wires = qf.new_wires(n)
@@ -63,12 +96,189 @@ def generate(n: int, k: int) -> QRoutine:
     for i in range(n - 1, n - localk - 1, -1):
         qf.apply(X, wires[i])
 
-    for i in range(n, localk, -1):
-        qf.apply(_scs(i, localk), wires[:i])
-    for i in range(localk, 1, -1):
+    _apply_scs_chain(qf, wires, localk)
+
+    if localk != k:
+        for qb in wires:
+            qf.apply(X, qb)
+    return qf
+
+
+def _apply_scs_chain(qf: QRoutine, wires, k: int):
+    """Apply U(len(wires), k) to the wires"""
+    n = len(wires)
+    for i in range(n, k, -1):
+        qf.apply(_scs(i, k), wires[:i])
+    for i in range(k, 1, -1):
         qf.apply(_scs(i, i - 1), wires[:i])
 
+
+def _get_wdb_steps(n1: int, n2: int, k: int):
+    """The rotations of the weight distribution block between two halves of
+    n1 and n2 wires, for weights up to k <= n2. The ones are on the last
+    wires of each half: at step j, the last one of the second half, the v-th
+    from its end, moves to the j-th wire from the end of the first half if
+    that one received a one at step j - 1. The probability of the move is the
+    one of x >= j given x >= j - 1, where x is the number of ones of the
+    first half, for a total weight l = v + j - 1. The v are scanned downwards:
+    since the rotations are conjugated by CNOTs, a rotation would move back
+    a one received from a lower wire at the same step.
+
+    :returns: for each rotation, (j, v, angle, whether it is controlled by
+    the (v + 1)-th wire from the end of the second half being 0)
+
+    """
+    steps = []
+    for j in range(1, min(k, n1) + 1):
+        max_v = min(k - j + 1, n2)
+        for v in range(max_v, 0, -1):
+            weight = v + j - 1
+            tails = [
+                sum(
+                    comb(n1, x) * comb(n2, weight - x)
+                    for x in range(start, weight + 1))
+                for start in (j - 1, j)
+            ]
+            if tails[1] == 0:
+                continue
+            angle = 2 * np.arccos(np.sqrt(1 - tails[1] / tails[0]))
+            steps.append((j, v, angle, v < max_v))
+    return steps
+
+
+def _apply_log_depth(qf: QRoutine, wires, k: int):
+    """Map the string with l <= k ones on the last wires to D(len(wires), l)"""
+    n = len(wires)
+    n1 = n // 2
+    n2 = n - n1
+    if k == 0 or n == 1:
+        return
+    if k > n2:
+        _apply_scs_chain(qf, wires, k)
+        return
+    first, second = wires[:n1], wires[n1:]
+    for j, v, angle, negated in _get_wdb_steps(n1, n2, k):
+        ctrls = [] if j == 1 else [first[n1 - j + 1]]
+        if negated:
+            ctrls.append(second[n2 - v - 1])
+            qf.apply(X, second[n2 - v - 1])
+        qf.apply(_wdb_gate(angle, len(ctrls)), first[n1 - j], second[n2 - v],
+                 *ctrls)
+        if negated:
+            qf.apply(X, second[n2 - v - 1])
+    _apply_log_depth(qf, first, min(k, n1))
+    _apply_log_depth(qf, second, k)
+
+
+@build_gate("DICKE_LOG", [int, int])
+def generate_log_depth(n: int, k: int) -> QRoutine:
+    """Same as :func:`generate`, with the divide-and-conquer construction"""
+    qf = QRoutine()
+    wires = qf.new_wires(n)
+    if k <= 0 or n < k:
+        return qf
+    if k == n:
+        for qb in wires:
+            qf.apply(X, qb)
+        return qf
+
+    localk = k if k <= n / 2 else n - k
+    for i in range(n - 1, n - localk - 1, -1):
+        qf.apply(X, wires[i])
+
+    _apply_log_depth(qf, wires, localk)
+
     if localk != k:
         for qb in wires:
             qf.apply(X, qb)
     return qf
+
+
+def _scs_resources(n: int, k: int, res: dict):
+    """Add the resources of :func:`_scs` to res"""
+    resources.add_gates(res, "CNOT", 2 * k, 3 * k)
+    resources.add_gates(res, "CRY", 1, 0)
+    resources.add_gates(res, "CCRY", k - 1, 0)
+
+
+def generate_resources(n: int, k: int):
+    """Resources required by :func:`generate`, see
+    :mod:`~qat.external.utils.qroutines.resources`. The controlled rotations
+    are counted in the gates, but not in the T-count."""
+    res = resources.new_resources(n)
+    if k <= 0 or n < k:
+        return res
+    if k == n:
+        return resources.add_gates(res, "X", n, 1)
+
+    localk = k if k <= n / 2 else n - k
+    resources.add_gates(res, "X", localk, 1)
+    _scs_chain_resources(n, localk, res)
+    if localk != k:
+        resources.add_gates(res, "X", n, 1)
+    return res
+
+
+def _scs_chain_resources(n: int, k: int, res: dict):
+    """Add the resources of :func:`_apply_scs_chain` to res"""
+    for i in range(n, k, -1):
+        _scs_resources(i, k, res)
+    for i in range(k, 1, -1):
+        _scs_resources(i, i - 1, res)
+
+
+def _log_depth_resources(n: int, k: int, res: dict):
+    """Add the resources of :func:`_apply_log_depth` to res"""
+    n1 = n // 2
+    n2 = n - n1
+    if k == 0 or n == 1:
+        return
+    if k > n2:
+        _scs_chain_resources(n, k, res)
+        return
+    for j, _, _, negated in _get_wdb_steps(n1, n2, k):
+        nctrls = (j > 1) + negated
+        resources.add_gates(res, "X", 2 * negated)
+        resources.add_gates(res, "CNOT", 2)
+        resources.add_gates(res, resources.get_gate_key(1 + nctrls, "RY"))
+    # The two halves are prepared in parallel
+    halves = [resources.new_resources(), resources.new_resources()]
+    _log_depth_resources(n1, min(k, n1), halves[0])
+    _log_depth_resources(n2, k, halves[1])
+    for half in halves:
+        resources.add_routine(res, half, depth=0)
+    res['depth'] += max(half['depth'] for half in halves)
+
+
+def generate_log_depth_resources(n: int, k: int):
+    """Resources required by :func:`generate_log_depth`, see
+    :func:`generate_resources`."""
+    res = resources.new_resources(n)
+    if k <= 0 or n < k:
+        return res
+    if k == n:
+        return resources.add_gates(res, "X", n, 1)
+
+    localk = k if k <= n / 2 else n - k
+    resources.add_gates(res, "X", localk, 1)
+    _log_depth_resources(n, localk, res)
+    if localk != k:
+        resources.add_gates(res, "X", n, 1)
+    return res
+
+
+# The constructions of the Dicke states: the gate and its resources
+METHODS = {
+    'linear': (generate, generate_resources),
+    'log': (generate_log_depth, generate_log_depth_resources),
+}
+
+
+def get_dicke(n: int, k: int, method: str = 'linear'):
+    """The DICKE or DICKE_LOG gate preparing D(n, k) from |0>, selected by
+    method, one of :data:`METHODS`"""
+    return METHODS[method][0](n, k)
+
+
+def get_dicke_resources(n: int, k: int, method: str = 'linear'):
+    return METHODS[method][1](n, k)
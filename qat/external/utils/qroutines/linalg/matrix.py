@@ -1,8 +1,9 @@
-from typing import TYPE_CHECKING, List, Set, Tuple
+from typing import TYPE_CHECKING, Iterable, List, Sequence, Set, Tuple
 
 import nptyping
 import numpy as np
-from qat.external.utils.qroutines import qregs_init
+from qat.external.utils.bits import conversion
+from qat.external.utils.qroutines import cache, patterns, qregs_init, resources
 from qat.external.utils.qroutines import sorting_network as sn
 from qat.lang.AQASM.gates import SWAP
 from qat.lang.AQASM.misc import build_gate
@@ -85,6 +86,30 @@ def build_matrix_from_sample(sample: 'Sample', qreg_range: Set[int],
     return matrix
 
 
+def get_bits_from_samples(samples: Iterable['Sample']) -> np.ndarray:
+    """Bits of the states of the samples, f.e. a Result, as a (n_samples,
+    n_bits) array in the order of their bitstrings."""
+    return conversion.get_bitarrays_from_bitstrings(
+        sample.state.bitstring for sample in samples)
+
+
+def build_matrices_from_bits(bits: np.ndarray, qubits: Sequence[int],
+                             shape: Tuple[int, int]) -> np.ndarray:
+    """The matrices stored, row by row, on the given qubits of each row of
+    bits: a (n_samples, nrows, ncols) array."""
+    bits = np.asarray(bits, dtype=np.ubyte)
+    return bits[:, list(qubits)].reshape((len(bits), ) + tuple(shape))
+
+
+def build_matrices_from_samples(samples: Iterable['Sample'],
+                                qreg_range: Set[int],
+                                shape: Tuple[int, int]) -> np.ndarray:
+    """Same as :func:`build_matrix_from_sample` for each sample, stacked in a
+    (n_samples, nrows, ncols) array."""
+    return build_matrices_from_bits(get_bits_from_samples(samples),
+                                    sorted(qreg_range), shape)
+
+
 @build_gate("SWAP_COLS", [int])
 def buildg_swap_columns(nrows: int):
     routine = QRoutine()
@@ -103,16 +128,22 @@ def buildg_swap_rows(ncols: int):
     pass
 
 
-def move_columns_end_data(nrows: int, ncols: int):
-    data = sn.get_pattern_sorter(ncols)
-    data['n_rows'] = nrows
-    data['n_cols'] = data['n_lines']
-    data['n_cols_orig'] = ncols
-    return data
+@cache.memoize
+def move_columns_end_data(nrows: int, ncols: int, network: str = 'bitonic'):
+    """Data for :func:`move_columns_end_gate`, using the sorting network with
+    the given name (see :func:`~qat.external.utils.qroutines.sorting_network.get_pattern_sorter`). With the bitonic
+    network the columns are padded to the closest power of 2.
+
+    """
+    net_data = sn.get_pattern_sorter(ncols, network)
+    return patterns.MoveColumnsPattern(n_rows=nrows,
+                                       n_cols=net_data.n_lines,
+                                       n_cols_orig=ncols,
+                                       network=net_data)
 
 
-@build_gate("MOVE_COLS_END", [dict])
-def move_columns_end_gate(data: dict) -> QRoutine:
+@build_gate("MOVE_COLS_END", [patterns.MoveColumnsPattern])
+def move_columns_end_gate(data: patterns.MoveColumnsPattern) -> QRoutine:
     """Use a sorting network to move the columns of the matrix to the end. The
     matrix must be created with the corresponding method from this class,
     otherwise results are undefined.
@@ -146,11 +177,71 @@ def move_columns_end_gate(data: dict) -> QRoutine:
     comb = routine.new_wires(ncols)
     comp = routine.new_wires(comp_len)
 
-    sort_net = sn.build_gate_sorter(data)
+    sort_net = sn.build_gate_sorter(data.network)
     routine.apply(sort_net, comb, comp)
 
     qrout = buildg_swap_columns(nrows)
-    for pattern in data['swaps_pattern']:
-        routine.apply(qrout.ctrl(), comp[pattern[0]], col_wires[pattern[1]],
-                      col_wires[pattern[2]])
+    for layer in data.network.layers:
+        for pattern in layer:
+            routine.apply(qrout.ctrl(), comp[pattern[0]],
+                          col_wires[pattern[1]], col_wires[pattern[2]])
     return routine
+
+
+@build_gate("MOVE_COLS_END_CLEAN", [patterns.MoveColumnsPattern])
+def move_columns_end_gate_clean(data: patterns.MoveColumnsPattern) -> QRoutine:
+    """Same as :func:`move_columns_end_gate`, but the comparator qubits are
+    uncomputed, undoing the sorting network after the columns have been
+    moved, so they are declared as ancillae and can be reused by the
+    compiler. The price is applying the sorting network twice.
+
+    The returned QRoutine takes as input:
+    #. the original matrix qbits (A), as in :func:`move_columns_end_gate`
+    #. the qreg (COMB) selecting the columns; unlike
+    :func:`move_columns_end_gate`, it is left untouched, so it still tells
+    which columns have been moved
+
+    """
+    ncols: int = data['n_cols']
+    nrows: int = data['n_rows']
+
+    routine = QRoutine()
+    row_wires = []
+    for _ in range(nrows):
+        row_wires.append(routine.new_wires(ncols))
+    col_wires = []
+    for col_idx in range(ncols):
+        col_wires.append(list([qr[col_idx] for qr in row_wires]))
+
+    comb = routine.new_wires(ncols)
+    comp = routine.new_wires(data['n_comps'])
+    routine.set_ancillae(comp)
+    sn.apply_sort_permutation(routine, data.network, comb, comp,
+                              buildg_swap_columns(nrows), col_wires)
+    return routine
+
+
+def move_columns_end_resources(nrows: int, ncols: int,
+                               network: str = 'bitonic'):
+    """Resources required by :func:`move_columns_end_gate` with the data
+    returned by :func:`move_columns_end_data`, see
+    :mod:`~qat.external.utils.qroutines.resources`."""
+    res = sn.get_pattern_sorter_resources(ncols, network)
+    n_comps = res['gates']['CSWAP']
+    n_lines = res['qubits'] - n_comps
+    res['qubits'] += nrows * n_lines
+    # Each controlled column swap is made of nrows CSWAP sharing the control
+    resources.add_gates(res, "CSWAP", nrows * n_comps)
+    return res
+
+
+def move_columns_end_clean_resources(nrows: int, ncols: int,
+                                     network: str = 'bitonic'):
+    """Resources required by :func:`move_columns_end_gate_clean`, see
+    :mod:`~qat.external.utils.qroutines.resources`."""
+    res = move_columns_end_resources(nrows, ncols, network)
+    sorter = sn.get_pattern_sorter_resources(ncols, network)
+    n_comps = sorter['gates']['CSWAP']
+    res['qubits'] -= n_comps
+    res['ancillae'] = max(res['ancillae'], n_comps)
+    return resources.add_routine(res, sorter)
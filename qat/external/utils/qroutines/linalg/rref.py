@@ -1,6 +1,7 @@
 import logging
 
 import numpy as np
+from qat.external.utils.qroutines import resources
 from qat.lang.AQASM.gates import X
 from qat.lang.AQASM.misc import build_gate
 from qat.lang.AQASM.routines import QRoutine
@@ -24,6 +25,155 @@ the RREF.
     return swap_ancilla_n, add_ancilla_n
 
 
+def get_packed_swap_lengths(nrows: int, ncols: int):
+    """Number of qubits storing the swaps of each pivot in
+    :func:`get_rref_packed`: the swaps of :func:`get_row_swap` set its
+    ancillae to 1 up to the last added row, so only the number of added rows
+    is kept, in binary."""
+    return [(nrows - 1 - i).bit_length() for i in range(min(nrows, ncols))
+            if i != nrows - 1]
+
+
+def get_required_ancillae_packed(nrows: int, ncols: int):
+    """Same as :func:`get_required_ancillae`, for :func:`get_rref_packed`"""
+    return (sum(get_packed_swap_lengths(nrows, ncols)),
+            get_required_ancillae(nrows, ncols)[1])
+
+
+def get_rref_resources(nrows: int, ncols: int):
+    """Resources required by :func:`get_rref`, see
+    :mod:`~qat.external.utils.qroutines.resources`. Only nrows <= ncols is
+    supported, as for the routine itself.
+
+    """
+    swap_ancilla_n, add_ancilla_n = get_required_ancillae(nrows, ncols)
+    res = resources.new_resources(nrows * ncols + swap_ancilla_n +
+                                  add_ancilla_n)
+    for i in range(min(nrows, ncols)):
+        tail = ncols - i
+        if i != nrows - 1:
+            # The rows below the pivot one are pipelined, each one starting two
+            # steps after the previous one
+            below = nrows - 1 - i
+            resources.add_gates(res, "X", 2, 0)
+            resources.add_gates(res, "CNOT", below, 0)
+            resources.add_gates(res, "CCNOT", below * tail,
+                                2 * below + tail + 1)
+        resources.add_gates(res, "CNOT", nrows - 1, 0)
+        resources.add_gates(res, "CCNOT", (nrows - 1) * tail,
+                            tail + nrows - 1)
+    return res
+
+
+def get_rref_fanout_resources(nrows: int, ncols: int):
+    """Resources required by :func:`get_rref_fanout`, see
+    :mod:`~qat.external.utils.qroutines.resources`. The ancillae are an upper
+    bound: the fan-out copies are freed after each pivot and the compiler may
+    reuse their wires for the next one.
+
+    """
+    swap_ancilla_n, add_ancilla_n = get_required_ancillae(nrows, ncols)
+    res = resources.new_resources(nrows * ncols + swap_ancilla_n +
+                                  add_ancilla_n)
+    for i in range(min(nrows, ncols)):
+        if i != nrows - 1:
+            resources.add_routine(
+                res, get_row_swap_fanout_resources(nrows, ncols, i))
+        resources.add_routine(
+            res, get_row_addition_fanout_resources(nrows, ncols, i))
+    return res
+
+
+def get_row_swap_fanout_resources(nrows: int, ncols: int, row_src_idx: int):
+    """Resources required by :func:`get_row_swap_fanout`, see
+    :mod:`~qat.external.utils.qroutines.resources`."""
+    below = nrows - 1 - row_src_idx
+    tail = ncols - row_src_idx
+    distances = _get_prefix_distances(below)
+    prefix_ancillae = sum(below - dist for dist in distances[:-1])
+    n_copies = below * (tail - 1)
+    res = resources.new_resources(nrows * ncols + below,
+                                  prefix_ancillae + n_copies + below * tail)
+    # Each level of the prefix network uses each bit twice
+    prefix_depth = 2 + 4 * len(distances) if distances else 3
+    resources.add_gates(res, "X", 2 * below, 0)
+    resources.add_gates(res, "CCNOT",
+                        2 * prefix_ancillae + below - distances[-1]
+                        if distances else 0, 0)
+    resources.add_gates(res, "CNOT",
+                        distances[-1] if distances else 1, prefix_depth)
+    # Fan-out, terms and parity of each column
+    tree_depth = 2 * (below - 1).bit_length() + 1
+    resources.add_gates(res, "CNOT", 2 * n_copies, 2 * (tail - 1).bit_length())
+    resources.add_gates(res, "CCNOT", 2 * below * tail, 2)
+    resources.add_gates(res, "CNOT", tail * (2 * below - 1), tree_depth)
+    return res
+
+
+def get_row_addition_fanout_resources(nrows: int, ncols: int,
+                                      row_src_idx: int):
+    """Resources required by :func:`get_row_addition_fanout`, see
+    :mod:`~qat.external.utils.qroutines.resources`."""
+    others = nrows - 1
+    tail = ncols - row_src_idx
+    n_copies = tail * max(others - 1, 0) + others * (tail - 1)
+    res = resources.new_resources(nrows * ncols + others, n_copies)
+    fan_depth = max(max(others - 1, 0).bit_length(),
+                    (tail - 1).bit_length() + 1)
+    resources.add_gates(res, "CNOT", others + 2 * n_copies, 0)
+    resources.add_gates(res, "CCNOT", others * tail, 2 * fan_depth + 1)
+    return res
+
+
+def get_rref_packed_resources(nrows: int, ncols: int):
+    """Resources required by :func:`get_rref_packed`, see
+    :mod:`~qat.external.utils.qroutines.resources`."""
+    res = get_rref_resources(nrows, ncols)
+    res['qubits'] = nrows * ncols + sum(
+        get_required_ancillae_packed(nrows, ncols))
+    for i in range(len(get_packed_swap_lengths(nrows, ncols))):
+        below = nrows - 1 - i
+        res['ancillae'] = max(res['ancillae'], below)
+        resources.add_routine(res, _get_swap_packing_resources(below))
+    return res
+
+
+def _get_swap_packing_resources(below: int):
+    """Resources of :func:`_get_swap_packing_ops`, the gates are counted
+    without building them."""
+    n_bits = below.bit_length()
+    # Total number of ones in the binary representations of 1 .. below
+    ones = sum((below + 1) // 2**(b + 1) * 2**b +
+               max(0, (below + 1) % 2**(b + 1) - 2**b) for b in range(n_bits))
+    res = resources.new_resources(below + n_bits)
+    resources.add_gates(res, "CNOT", below - 1 + ones)
+    resources.add_gates(res, "X", 2 * (below * n_bits - ones))
+    resources.add_gates(res, resources.get_gate_key(n_bits, "X"), below)
+    return res
+
+
+def get_same_ops_for_vector_resources(nrows: int, ncols: int):
+    """Resources required by :func:`gate_same_ops_for_vector`, see
+    :mod:`~qat.external.utils.qroutines.resources`."""
+    swap_ancilla_n, add_ancilla_n = get_required_ancillae(nrows, ncols)
+    res = resources.new_resources(nrows + swap_ancilla_n + add_ancilla_n)
+    resources.add_gates(res, "CCNOT", nrows * (nrows - 1) // 2)
+    resources.add_gates(res, "CCNOT", nrows * (nrows - 1))
+    return res
+
+
+def get_same_ops_for_vector_packed_resources(nrows: int, ncols: int):
+    """Resources required by :func:`gate_same_ops_for_vector_packed`, see
+    :mod:`~qat.external.utils.qroutines.resources`."""
+    res = get_same_ops_for_vector_resources(nrows, ncols)
+    res['qubits'] = nrows + sum(get_required_ancillae_packed(nrows, ncols))
+    for i in range(len(get_packed_swap_lengths(nrows, ncols))):
+        below = nrows - 1 - i
+        res['ancillae'] = max(res['ancillae'], below)
+        resources.add_routine(res, _get_swap_packing_resources(below), 2)
+    return res
+
+
 def build_u_matrix_from_sample(sample, nsquare):
     """Build the matrix of transformations applied to obtain the RREF. I.e., if
     original matrix was A and its RREF is B, we have U * B = A.
@@ -67,6 +217,82 @@ def build_u_matrix_from_bitstrings(swaps: str, adds: str, nsquare):
     return u
 
 
+def build_u_matrices_from_samples(samples, nsquare) -> np.ndarray:
+    """Same as :func:`build_u_matrix_from_sample` for each sample, stacked
+    in a (n_samples, nsquare, nsquare) array."""
+    swaps = []
+    adds = []
+    for sample in samples:
+        if len(sample.intermediate_measurements) != 2:
+            raise ValueError("The sample has no measures of the ancillae")
+        sample_swaps, sample_adds = sample.intermediate_measurements
+        swaps.append(sample_swaps.cbits)
+        adds.append(sample_adds.cbits)
+    return build_u_matrices_from_bits(swaps, adds, nsquare)
+
+
+def build_u_matrices_from_bits(swaps, adds, nsquare) -> np.ndarray:
+    """Same as :func:`build_u_matrix_from_bitstrings` for a batch: swaps and
+    adds have a row for each sample, the result is a (n_samples, nsquare,
+    nsquare) array.
+
+    The rows of the matrices are packed in uint64 words, so each row
+    operation is applied to the whole batch with a single NumPy call.
+
+    """
+    ones = np.iinfo(np.uint64).max
+    swaps = np.asarray(swaps, dtype=np.uint64) * ones
+    adds = np.asarray(adds, dtype=np.uint64) * ones
+    batch = len(swaps)
+    nwords = -(-nsquare // 64)
+    u = np.zeros((batch, nsquare, nwords), dtype=np.uint64)
+    for i in range(nsquare):
+        u[:, i, i // 64] = np.uint64(1) << np.uint64(i % 64)
+    swap_idx = 0
+    add_idx = 0
+    for i in range(nsquare):
+        for j in range(i + 1, nsquare):
+            u[:, i] ^= u[:, j] & swaps[:, swap_idx, None]
+            swap_idx += 1
+        for j in range(nsquare):
+            if j == i:
+                continue
+            u[:, j] ^= u[:, i] & adds[:, add_idx, None]
+            add_idx += 1
+    as_bytes = u.astype('<u8').view(np.uint8)
+    return np.unpackbits(as_bytes, axis=-1, bitorder='little')[..., :nsquare]
+
+
+def unpack_swap_bits(swaps, nrows: int, ncols: int):
+    """Swaps of :func:`get_rref` from the packed ones of
+    :func:`get_rref_packed`, f.e. to call
+    :func:`build_u_matrix_from_bitstrings`."""
+    unpacked = []
+    start = 0
+    for i, length in enumerate(get_packed_swap_lengths(nrows, ncols)):
+        n_added = sum(
+            int(bit) << b for b, bit in enumerate(swaps[start:start + length]))
+        start += length
+        below = nrows - 1 - i
+        unpacked += [1] * n_added + [0] * (below - n_added)
+    return unpacked
+
+
+def unpack_swap_bits_batch(swaps, nrows: int, ncols: int) -> np.ndarray:
+    """Same as :func:`unpack_swap_bits`, swaps having a row for each sample.
+    """
+    swaps = np.asarray(swaps, dtype=np.int64)
+    unpacked = []
+    start = 0
+    for i, length in enumerate(get_packed_swap_lengths(nrows, ncols)):
+        n_added = swaps[:, start:start + length] @ (1 << np.arange(length))
+        start += length
+        below = nrows - 1 - i
+        unpacked.append(np.arange(below) < n_added[:, None])
+    return np.concatenate(unpacked, axis=1).astype(np.uint8) if unpacked \
+        else np.zeros((len(swaps), 0), dtype=np.uint8)
+
+
 @build_gate('RREF_OPS', [int, int])
 def gate_same_ops_for_vector(nrows: int, ncols: int):
     """Apply the same operations applied to obtain the matrix RREF to a vector. The
@@ -86,19 +312,63 @@ def gate_same_ops_for_vector(nrows: int, ncols: int):
     swap_wires = qfun.new_wires(swap_ancilla_n)
     add_wires = qfun.new_wires(add_ancilla_n)
 
-    idx = 0
+    # The operations of each pivot are applied in the same order of get_rref
+    swap_idx = 0
+    add_idx = 0
     for i in range(nrows):
         for j in range(i + 1, nrows):
-            qfun.apply(X.ctrl(2), swap_wires[idx], vec_wires[j], vec_wires[i])
-            idx += 1
+            qfun.apply(X.ctrl(2), swap_wires[swap_idx], vec_wires[j],
+                       vec_wires[i])
+            swap_idx += 1
+        for j in range(nrows):
+            if i != j:
+                qfun.apply(X.ctrl(2), add_wires[add_idx], vec_wires[i],
+                           vec_wires[j])
+                add_idx += 1
+
+    return qfun
 
-    idx = 0
+
+@build_gate('RREF_OPS_PACKED', [int, int])
+def gate_same_ops_for_vector_packed(nrows: int, ncols: int):
+    """Same as :func:`gate_same_ops_for_vector`, with the swap ancillae
+    packed by :func:`get_rref_packed`. They are unpacked one pivot at a time
+    on clean ancillae.
+
+    :returns: A qroutine taking as input (in this order)
+       - vector_qreg
+       - packed swap_qreg
+       - add_qreg
+    """
+    qfun = QRoutine()
+    vec_wires = qfun.new_wires(nrows)
+    swap_ancilla_n, add_ancilla_n = get_required_ancillae_packed(nrows, ncols)
+    swap_wires = qfun.new_wires(swap_ancilla_n)
+    add_wires = qfun.new_wires(add_ancilla_n)
+    unpacked = qfun.new_wires(nrows - 1) if nrows > 1 else []
+    if nrows > 1:
+        qfun.set_ancillae(unpacked)
+
+    swap_lengths = get_packed_swap_lengths(nrows, ncols)
+    swap_idx = 0
+    add_idx = 0
     for i in range(nrows):
+        if i < len(swap_lengths):
+            below = nrows - 1 - i
+            packed = swap_wires[swap_idx:swap_idx + swap_lengths[i]]
+            swap_idx += swap_lengths[i]
+            ops = _get_swap_packing_ops(below)
+            wires = list(unpacked[:below]) + list(packed)
+            _apply_ops(qfun, wires, reversed(ops))
+            for j in range(i + 1, nrows):
+                qfun.apply(X.ctrl(2), unpacked[j - i - 1], vec_wires[j],
+                           vec_wires[i])
+            _apply_ops(qfun, wires, ops)
         for j in range(nrows):
             if i != j:
-                qfun.apply(X.ctrl(2), add_wires[idx], vec_wires[i],
+                qfun.apply(X.ctrl(2), add_wires[add_idx], vec_wires[i],
                            vec_wires[j])
-                idx += 1
+                add_idx += 1
 
     return qfun
 
@@ -118,6 +388,46 @@ def get_rref(nrows, ncols):
     get_ancillae function.
 
     """
+    return _get_rref(nrows, ncols, get_row_swap, get_row_addition)
+
+
+@build_gate('RREF_FANOUT', [int, int])
+def get_rref_fanout(nrows, ncols):
+    """Same as :func:`get_rref`, with the same inputs and results, but using
+    :func:`get_row_swap_fanout` and :func:`get_row_addition_fanout`: the
+    row operations of a pivot are applied in parallel, at the price of
+    O(nrows * ncols) clean ancillae.
+
+    The depth of each pivot is logarithmic in nrows and ncols, instead of
+    linear. Since the pivots of :func:`get_rref` partially overlap, the
+    gain is only for matrices with many columns or many rows, f.e. the
+    depth is halved for a 4 x 200 matrix, while it's larger for a 12 x 24
+    one.
+
+    """
+    return _get_rref(nrows, ncols, get_row_swap_fanout,
+                     get_row_addition_fanout)
+
+
+@build_gate('RREF_PACKED', [int, int])
+def get_rref_packed(nrows, ncols):
+    """Same as :func:`get_rref`, but the swap ancillae of each pivot are
+    packed by :func:`get_row_swap_packed`, so only
+    :func:`get_required_ancillae_packed` ancillae are taken as input. The
+    add ancillae are the same; both can be passed to
+    :func:`gate_same_ops_for_vector_packed`.
+
+    """
+    return _get_rref(nrows, ncols, get_row_swap_packed, get_row_addition,
+                     get_packed_swap_lengths(nrows, ncols))
+
+
+def _get_rref(nrows, ncols, get_swap, get_addition, swap_lengths=None):
+    """The RREF made by the given gates; swap_lengths are the number of swap
+    ancillae of each pivot, by default the number of rows below it."""
+    if swap_lengths is None:
+        swap_lengths = [nrows - 1 - i for i in range(min(nrows, ncols))]
+
     qrout = QRoutine()
 
     qregs_rows = []
@@ -127,8 +437,8 @@ def get_rref(nrows, ncols):
         qregs_rows.append(qreg)
 
     nsquare = min(nrows, ncols)
-    swap_ancilla_n, add_ancilla_n = get_required_ancillae(nrows, ncols)
-    swap_ancillae = qrout.new_wires(swap_ancilla_n)
+    _, add_ancilla_n = get_required_ancillae(nrows, ncols)
+    swap_ancillae = qrout.new_wires(sum(swap_lengths))
     add_ancillae = qrout.new_wires(add_ancilla_n)
     add_ancilla_idx = 0
     swap_ancilla_idx = 0
@@ -136,9 +446,9 @@ def get_rref(nrows, ncols):
     for i in range(nsquare):
         if i != nrows - 1:
             # we don't apply swap gates for the last row
-            swap_gate = get_row_swap(nrows, ncols, i)
+            swap_gate = get_swap(nrows, ncols, i)
             # swap_ancilla = qrout.new_wires(swap_ancillan)
-            swap_len = len(range(i + 1, nrows))
+            swap_len = swap_lengths[i]
             # print(f"Row {i}")
             # print(f"qregs {[j for j in qregs_rows[i]]}")
             qrout.apply(
@@ -147,7 +457,7 @@ def get_rref(nrows, ncols):
             swap_ancilla_idx += swap_len
 
         add_len = nrows - 1
-        bgate = get_row_addition(nrows, ncols, i)
+        bgate = get_addition(nrows, ncols, i)
         qrout.apply(bgate, *qregs_rows,
                     add_ancillae[add_ancilla_idx:add_ancilla_idx + add_len])
         add_ancilla_idx += add_len
@@ -221,6 +531,54 @@ def get_row_swap(nrows, ncols, row_src_idx: int):
     return qfun
 
 
+def _get_swap_packing_ops(below: int):
+    """Gates packing the swap ancillae of a pivot with below rows under it,
+    as tuples of qubits (the controls, then the target): the qubits 0 ..
+    below - 1 are the ancillae, set to 1 up to the last added row, and they
+    are reset; the following ones receive the number of added rows, little
+    endian. The gates in reverse order unpack them.
+
+    """
+    n_bits = below.bit_length()
+    packed = [below + b for b in range(n_bits)]
+    # Only the last added row is left to 1
+    ops = [(j + 1, j) for j in range(below - 1)]
+    for j in range(below):
+        ops += [(j, packed[b]) for b in range(n_bits) if (j + 1) >> b & 1]
+    for j in range(below):
+        zeros = [(packed[b], ) for b in range(n_bits) if not (j + 1) >> b & 1]
+        ops += zeros + [tuple(packed) + (j, )] + zeros
+    return ops
+
+
+def _apply_ops(qfun: QRoutine, wires, ops):
+    for op in ops:
+        gate = X.ctrl(len(op) - 1) if len(op) > 1 else X
+        qfun.apply(gate, *[wires[idx] for idx in op])
+
+
+@build_gate('ROWSWAP_PACKED', [int, int, int])
+def get_row_swap_packed(nrows, ncols, row_src_idx: int):
+    """Same as :func:`get_row_swap`, but the ancillae are clean: only the
+    number of rows added to the source one is stored, on the
+    (nrows - 1 - row_src_idx).bit_length() qubits following the rows.
+
+    """
+    qfun = QRoutine()
+    row_wires = []
+    for _ in range(nrows):
+        row_wires.append(qfun.new_wires(ncols))
+    below = nrows - 1 - row_src_idx
+    packed = qfun.new_wires(below.bit_length())
+    ancs = qfun.new_wires(below)
+    qfun.set_ancillae(ancs)
+
+    qfun.apply(get_row_swap(nrows, ncols, row_src_idx), *row_wires, ancs)
+    _apply_ops(qfun,
+               list(ancs) + list(packed), _get_swap_packing_ops(below))
+    return qfun
+
+
 @build_gate('ROWADD', [int, int, int])
 def get_row_addition(nrows, ncols, row_src_idx: int):
     qfun = QRoutine()
@@ -271,3 +629,185 @@ def get_row_addition(nrows, ncols, row_src_idx: int):
 
     LOGGER.debug("----")
     return qfun
+
+
+def _get_fan_out_pairs(wire, copies):
+    """(ctrl, target) of the CNOTs copying wire to the clean copies, in
+    len(copies).bit_length() layers: each layer doubles the copies."""
+    pairs = []
+    sources = [wire]
+    copies = list(copies)
+    while copies:
+        layer = list(zip(sources, copies))
+        copies = copies[len(layer):]
+        sources += [target for _, target in layer]
+        pairs += layer
+    return pairs
+
+
+def _apply_cnots(qfun: QRoutine, pairs):
+    for ctrl, target in pairs:
+        qfun.apply(X.ctrl(), ctrl, target)
+
+
+def _get_prefix_distances(n: int):
+    """Distances of the levels of a prefix network on n bits"""
+    return [2**level for level in range((n - 1).bit_length())]
+
+
+def _get_xor_tree_pairs(wires):
+    """(ctrl, target) of the CNOTs accumulating the parity of the wires on
+    the first one, in (len(wires) - 1).bit_length() layers."""
+    pairs = []
+    dist = 1
+    while dist < len(wires):
+        pairs += [(wires[k + dist], wires[k])
+                  for k in range(0, len(wires) - dist, 2 * dist)]
+        dist *= 2
+    return pairs
+
+
+@build_gate('ROWSWAP_FANOUT', [int, int, int])
+def get_row_swap_fanout(nrows, ncols, row_src_idx: int):
+    """Same as :func:`get_row_swap`, with the same values of the ancillae,
+    in logarithmic depth. The k-th ancilla is set if the pivot of the source
+    row and of the k-1 rows below it are 0; these ANDs are computed with a
+    prefix network. The ancillae are then copied to clean ancillae, one per
+    column, and the additions to each column of the source row are
+    accumulated with a tree of CNOTs.
+
+    """
+    qfun = QRoutine()
+    row_wires = []
+    for _ in range(nrows):
+        row_wires.append(qfun.new_wires(ncols))
+
+    col_src_idx = row_src_idx
+    row_src = row_wires[row_src_idx]
+    rows_oth = row_wires[row_src_idx + 1:]
+    below = len(rows_oth)
+    tail = ncols - col_src_idx
+    ancs = qfun.new_wires(below)
+
+    # Prefix AND of the negated pivots (Hillis-Steele), the last level is
+    # written on ancs
+    pivots = [row_src[col_src_idx]
+              ] + [row[col_src_idx] for row in rows_oth[:-1]]
+    for pivot in pivots:
+        qfun.apply(X, pivot)
+    distances = _get_prefix_distances(below)
+    prefix = list(pivots)
+    uncompute = []
+    for level, dist in enumerate(distances):
+        last = level == len(distances) - 1
+        if last:
+            targets = ancs
+        else:
+            targets = [None] * dist + list(qfun.new_wires(below - dist))
+            qfun.set_ancillae(targets[dist:])
+        # prefix[k] is a control of the gates k and k + dist, so they are
+        # split in two layers
+        for k in sorted(range(dist, below), key=lambda k: (k // dist) % 2):
+            qfun.apply(X.ctrl(2), prefix[k], prefix[k - dist], targets[k])
+            if not last:
+                uncompute.append((prefix[k], prefix[k - dist], targets[k]))
+        if last:
+            for k in range(dist):
+                qfun.apply(X.ctrl(), prefix[k], ancs[k])
+        prefix = prefix[:dist] + targets[dist:]
+    if not distances:
+        qfun.apply(X.ctrl(), prefix[0], ancs[0])
+    for ctrls_target in reversed(uncompute):
+        qfun.apply(X.ctrl(2), *ctrls_target)
+    for pivot in pivots:
+        qfun.apply(X, pivot)
+
+    # copies[k][j] and terms[k][j] are used for the column col_src_idx + j
+    # of the k-th row below the source one
+    pairs = []
+    copies = []
+    for anc in ancs:
+        anc_wires = []
+        if tail > 1:
+            anc_wires = qfun.new_wires(tail - 1)
+            qfun.set_ancillae(anc_wires)
+            pairs += _get_fan_out_pairs(anc, anc_wires)
+        copies.append([anc] + list(anc_wires))
+    terms = []
+    for _ in ancs:
+        row_terms = qfun.new_wires(tail)
+        qfun.set_ancillae(row_terms)
+        terms.append(row_terms)
+    terms_ops = [(copies[k][j], row[col_src_idx + j], terms[k][j])
+                 for k, row in enumerate(rows_oth) for j in range(tail)]
+    tree_pairs = []
+    for j in range(tail):
+        tree_pairs += _get_xor_tree_pairs(
+            [row_terms[j] for row_terms in terms])
+
+    _apply_cnots(qfun, pairs)
+    for ctrls_target in terms_ops:
+        qfun.apply(X.ctrl(2), *ctrls_target)
+    _apply_cnots(qfun, tree_pairs)
+    for j in range(tail):
+        qfun.apply(X.ctrl(), terms[0][j], row_src[col_src_idx + j])
+    _apply_cnots(qfun, reversed(tree_pairs))
+    for ctrls_target in terms_ops:
+        qfun.apply(X.ctrl(2), *ctrls_target)
+    _apply_cnots(qfun, reversed(pairs))
+    return qfun
+
+
+@build_gate('ROWADD_FANOUT', [int, int, int])
+def get_row_addition_fanout(nrows, ncols, row_src_idx: int):
+    """Same as :func:`get_row_addition`, but the source row and the ancillae
+    are copied to clean ancillae, so that all the additions are applied in a
+    single layer.
+
+    """
+    qfun = QRoutine()
+    row_wires = []
+    for _ in range(nrows):
+        row_wires.append(qfun.new_wires(ncols))
+
+    col_src_idx = row_src_idx
+    row_src = row_wires[row_src_idx]
+    cols = range(col_src_idx, ncols)
+    tail = len(cols)
+    row_oth_idxs = [i for i in range(nrows) if i != row_src_idx]
+    ancs = [qfun.new_wires(1)[0] for _ in row_oth_idxs]
+
+    # src_copies[k][col] and anc_copies[k][col] control the addition of the
+    # column col to the k-th other row
+    pairs = []
+    src_copies = [[row_src[col_idx] for col_idx in cols]]
+    if len(row_oth_idxs) > 1:
+        copies = qfun.new_wires(tail * (len(row_oth_idxs) - 1))
+        qfun.set_ancillae(copies)
+        for j, col_idx in enumerate(cols):
+            col_copies = copies[j::tail]
+            pairs += _get_fan_out_pairs(row_src[col_idx], col_copies)
+        src_copies += [copies[k * tail:(k + 1) * tail]
+                       for k in range(len(row_oth_idxs) - 1)]
+    _apply_cnots(qfun, pairs)
+
+    anc_copies = []
+    for anc, row_oth_idx in zip(ancs, row_oth_idxs):
+        qfun.apply(X.ctrl(), row_wires[row_oth_idx][col_src_idx], anc)
+        anc_wires = []
+        if tail > 1:
+            anc_wires = qfun.new_wires(tail - 1)
+            qfun.set_ancillae(anc_wires)
+            anc_pairs = _get_fan_out_pairs(anc, anc_wires)
+            _apply_cnots(qfun, anc_pairs)
+            pairs += anc_pairs
+        anc_copies.append([anc] + list(anc_wires))
+
+    for k, row_oth_idx in enumerate(row_oth_idxs):
+        row_oth = row_wires[row_oth_idx]
+        for j, col_idx in enumerate(cols):
+            qfun.apply(X.ctrl(2), anc_copies[k][j], src_copies[k][j],
+                       row_oth[col_idx])
+
+    _apply_cnots(qfun, reversed(pairs))
+    return qfun
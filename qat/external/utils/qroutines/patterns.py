@@ -0,0 +1,127 @@
+"""
+Immutable patterns describing the routines built by the modules of this
+package.
+
+The patterns are named tuples of ints and tuples, so they are hashable and
+compare by value: the gates built by ``build_gate`` from equal patterns share
+a single definition in the compiled circuit. For the code written for the
+former dict patterns, the fields can also be read as ``pattern['n_lines']``
+or ``pattern.get('n_lines')``.
+
+The qubits of the Hamming weight patterns are numbered as the concatenation
+of the input lines and of the couts: qubit i < n_lines is line i, the others
+are cout i - n_lines, see :meth:`WeightPattern.get_qubits`.
+"""
+from typing import Any, NamedTuple, Optional, Sequence, Tuple
+
+# (comparator index, first line, second line)
+Comparator = Tuple[int, int, int]
+# (x, y, z, c) qubits of a full adder
+FullAdder = Tuple[int, int, int, int]
+
+
+class _Pattern:
+    """Read-only dict-like access to the fields of a pattern: the keys are
+    the names of the fields, the methods of the tuples are not keys"""
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if not isinstance(key, str):
+            return tuple.__getitem__(self, key)
+        if key not in self:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key) -> bool:
+        return key in self._fields
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+class _NetworkPattern(NamedTuple):
+    n_lines: int
+    n_comps: int
+    swaps_pattern: Tuple[Comparator, ...]
+    layers: Tuple[Tuple[Comparator, ...], ...]
+    depth: int
+
+
+class NetworkPattern(_Pattern, _NetworkPattern):
+    """A sorting network, see
+    :func:`~qat.external.utils.qroutines.sorting_network.get_pattern_bitonic_sorter`
+    for the meaning of the fields."""
+    __slots__ = ()
+
+
+class _MoveColumnsPattern(NamedTuple):
+    n_rows: int
+    n_cols: int
+    n_cols_orig: int
+    network: NetworkPattern
+
+
+class MoveColumnsPattern(_Pattern, _MoveColumnsPattern):
+    """The sorting network moving the columns of a matrix, see
+    :func:`~qat.external.utils.qroutines.linalg.matrix.move_columns_end_data`.
+    The fields of the network can be read directly, as in
+    ``pattern['n_comps']``."""
+    __slots__ = ()
+
+    def __getattr__(self, key: str):
+        # Only called for the attributes that are not fields
+        if key.startswith('_'):
+            raise AttributeError(key)
+        return getattr(self.network, key)
+
+    def __contains__(self, key) -> bool:
+        return key in self._fields or key in self.network
+
+
+class WeightPattern(_Pattern):
+    """Base of the patterns computing a Hamming weight"""
+    __slots__ = ()
+
+    def get_qubits(self, a_qs: Sequence, cout_qs: Sequence,
+                   qubits: Sequence[int]) -> list:
+        """The qubits of a_qs or cout_qs with the given indexes"""
+        n_lines = self.n_lines
+        return [
+            a_qs[i] if i < n_lines else cout_qs[i - n_lines] for i in qubits
+        ]
+
+
+class _AdderTreePattern(NamedTuple):
+    engine: str
+    adder: str
+    n_lines: int
+    n_couts: int
+    adders_pattern: Tuple[Tuple[int, ...], ...]
+    adders_shape: Tuple[Tuple[int, int, bool], ...]
+    results: Tuple[int, ...]
+    saved_qubits: int
+
+
+class AdderTreePattern(WeightPattern, _AdderTreePattern):
+    """A tree of adders, see
+    :func:`~qat.external.utils.qroutines.hamming_weight_compute.fpc.get_qroutine_for_qubits_weight_get_pattern`."""
+    __slots__ = ()
+
+
+class _CarrySavePattern(NamedTuple):
+    engine: str
+    adder: str
+    n_lines: int
+    n_couts: int
+    compressors: Tuple[Tuple[FullAdder, ...], ...]
+    final_adder: Optional[Tuple[Tuple[int, ...], Tuple[int, ...]]]
+    results: Tuple[int, ...]
+
+
+class CarrySavePattern(WeightPattern, _CarrySavePattern):
+    """A Wallace tree of full adders, see
+    :func:`~qat.external.utils.qroutines.hamming_weight_compute.csa.get_qroutine_for_qubits_weight_get_pattern`."""
+    __slots__ = ()
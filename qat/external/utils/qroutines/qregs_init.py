@@ -4,7 +4,7 @@ import logging
 from typing import TYPE_CHECKING, Sequence, Union, List
 
 from qat.external.utils.bits import conversion
-from qat.lang.AQASM.gates import X
+from qat.external.utils.synthesis.mctrls import mcx
 from qat.lang.AQASM.misc import build_gate
 from qat.lang.AQASM.routines import QRoutine
 
@@ -27,10 +27,7 @@ def _conditionally_initialize_qureg_given_bitarray(
     bits = qr.new_wires(len(a_arr))
     cbits = qr.new_wires(ncontrols) if ncontrols > 0 else None
 
-    gate = X
-    if ncontrols > 0:
-        # for _ in range(len(qcontrols)):
-        gate = gate.ctrl(ncontrols)
+    gate = mcx.get_mcx_gate(ncontrols)
     part = functools.partial(qr.apply, gate)
     if ncontrols > 0:
         part = functools.partial(part, *cbits)
@@ -0,0 +1,154 @@
+"""
+Analytic resource estimation.
+
+Each routine of this package comes with a function computing, without building
+any circuit, a dictionary with:
+
+#. qubits, the number of wires taken as input by the routine
+#. ancillae, the number of additional qubits allocated by the compiler (they
+   are reused across sub-routines, so this is the maximum number required at
+   the same time). For the routines whose estimators say so, f.e. the
+   carry-lookahead adders, it is an upper bound: the compiler may also reuse
+   the wires of a routine whose lifetimes do not overlap
+#. gates, the number of gates by type, with the keys returned by
+   :func:`get_gate_key`
+#. t_count, the T-count of the gates of the X family (see
+   :func:`get_t_count`)
+#. depth, an upper bound on the depth of the circuit, obtained composing the
+   depths of the sub-blocks of the routine
+
+The functions of this module combine such dictionaries; the estimators are
+validated against :func:`get_circuit_resources` on the built circuits.
+"""
+import logging
+from collections import Counter
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Optional
+
+from qat.external.utils.simulation import reversible
+
+if TYPE_CHECKING:
+    from qat.core import Circuit
+
+LOGGER = logging.getLogger(__name__)
+
+# T-count of the Clifford+T decomposition of the gates whose number of
+# controls is fixed
+_T_COUNTS = {"CCNOT": 7, "CSWAP": 7}
+
+
+def get_gate_key(nctrls: int, base: str) -> str:
+    """Name used to count a gate: X, CNOT, CCNOT and C{k}X for the X family,
+    the base name preceded by one C for each control otherwise (f.e. CSWAP or
+    CCRY), or by C{k} if there are more than 2 controls.
+
+    """
+    if base == "X":
+        if nctrls <= 2:
+            return ("X", "CNOT", "CCNOT")[nctrls]
+        return f"C{nctrls}X"
+    if nctrls <= 2:
+        return "C" * nctrls + base
+    return f"C{nctrls}{base}"
+
+
+def get_t_count(gates: Dict[str, int]) -> int:
+    """T-count of the gates: 7 for a CCNOT or a CSWAP and 7(2k-3) for a C{k}X,
+    decomposed with k-2 clean ancillae. Rotations are not taken into account,
+    since their cost depends on the precision of their synthesis.
+
+    """
+    t_count = 0
+    for key, count in gates.items():
+        if key in _T_COUNTS:
+            t_count += _T_COUNTS[key] * count
+        elif key.startswith("C") and key.endswith("X") and key[1:-1].isdigit():
+            t_count += 7 * (2 * int(key[1:-1]) - 3) * count
+    return t_count
+
+
+def new_resources(qubits: int = 0, ancillae: int = 0) -> Dict[str, Any]:
+    """Resources of an empty routine"""
+    return {
+        'qubits': qubits,
+        'ancillae': ancillae,
+        'gates': Counter(),
+        't_count': 0,
+        'depth': 0
+    }
+
+
+def add_gates(resources: Dict[str, Any], key: str, count: int = 1,
+              depth: Optional[int] = None) -> Dict[str, Any]:
+    """Add count gates to the resources, applied one after the other unless a
+    different depth is given. The resources are modified in place and
+    returned.
+
+    """
+    if count == 0:
+        return resources
+    resources['gates'][key] += count
+    resources['t_count'] = get_t_count(resources['gates'])
+    resources['depth'] += count if depth is None else depth
+    return resources
+
+
+def add_routine(resources: Dict[str, Any], routine: Dict[str, Any],
+                times: int = 1, depth: Optional[int] = None) -> Dict[str, Any]:
+    """Add times applications of a sub-routine, applied one after the other
+    unless a different depth is given. The resources are modified in place
+    and returned.
+
+    """
+    if times == 0:
+        return resources
+    for key, count in routine['gates'].items():
+        resources['gates'][key] += count * times
+    resources['t_count'] = get_t_count(resources['gates'])
+    resources['ancillae'] = max(resources['ancillae'], routine['ancillae'])
+    resources['depth'] += routine['depth'] * times if depth is None else depth
+    return resources
+
+
+def get_circuit_depth(circuit: 'Circuit') -> int:
+    """Depth of the circuit, scheduling each gate as soon as all its qubits are
+    free.
+
+    """
+    return get_ops_resources(reversible.get_ops(circuit), 0,
+                             circuit.nbqbits)['depth']
+
+
+def get_circuit_resources(circuit: 'Circuit', qubits: int) -> Dict[str, Any]:
+    """Resources of a built circuit, in the same format of the analytic
+    estimators.
+
+    :param circuit: The circuit
+    :param qubits: The number of qubits which are not ancillae, i.e. the arity
+    of the routine the circuit has been built from
+
+    """
+    return get_ops_resources(reversible.get_ops(circuit), qubits,
+                             circuit.nbqbits)
+
+
+def get_ops_resources(ops: Iterable[reversible.Op], qubits: int,
+                      nbqbits: int) -> Dict[str, Any]:
+    """Same as :func:`get_circuit_resources`, for gates on nbqbits qubits
+    given one at a time, f.e. by the generators of
+    :mod:`~qat.external.utils.stream.emitters`: only the gate counts and the
+    last layer of each qubit are kept in memory.
+
+    """
+    resources = new_resources(qubits, nbqbits - qubits)
+    last = [0] * nbqbits
+    depth = 0
+    for op in ops:
+        resources['gates'][get_gate_key(len(op.ctrls), op.name)] += 1
+        qbits = op.ctrls + op.targets
+        step = max(last[qb] for qb in qbits) + 1
+        for qb in qbits:
+            last[qb] = step
+        depth = max(depth, step)
+    resources['t_count'] = get_t_count(resources['gates'])
+    resources['depth'] = depth
+    return resources
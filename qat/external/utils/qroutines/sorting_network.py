@@ -9,9 +9,10 @@ Introduction to algorithms, second edition.
 The MIT Press and McGraw-Hill Book Company, 2001.
 """
 import logging
-from typing import Any, Dict
+from typing import Any, Dict, List, Tuple
 
 import numpy as np
+from qat.external.utils.qroutines import cache, patterns, resources
 from qat.external.utils.qroutines.adder import two_bit_comparator
 from qat.lang.AQASM.gates import SWAP
 from qat.lang.AQASM.misc import build_gate
@@ -20,35 +21,123 @@ from qat.lang.AQASM.routines import QRoutine
 _LOGGER = logging.getLogger(__name__)
 
 
-def _build_gate_common(net_data: Dict[str, Any]) -> QRoutine:
+def get_layers(
+        swaps_pattern: List[Tuple[int, int, int]]
+) -> List[List[Tuple[int, int, int]]]:
+    """Group the comparators of a swaps_pattern in layers, i.e. sets of
+    comparators acting on disjoint lines, which can be applied in parallel.
+    Each comparator is put in the first layer after the ones of the previous
+    comparators sharing one of its lines, so the network is not changed.
+
+    """
+    layers = []
+    next_layer = {}
+    for swap_pattern in swaps_pattern:
+        layer_idx = max(next_layer.get(swap_pattern[1], 0),
+                        next_layer.get(swap_pattern[2], 0))
+        if layer_idx == len(layers):
+            layers.append([])
+        layers[layer_idx].append(swap_pattern)
+        next_layer[swap_pattern[1]] = layer_idx + 1
+        next_layer[swap_pattern[2]] = layer_idx + 1
+    return layers
+
+
+def _set_layers(net_data: Dict[str, Any]) -> patterns.NetworkPattern:
+    """The immutable pattern of the network built in net_data"""
+    swaps_pattern = tuple(net_data['swaps_pattern'])
+    layers = tuple(tuple(layer) for layer in get_layers(swaps_pattern))
+    return patterns.NetworkPattern(n_lines=net_data['n_lines'],
+                                   n_comps=net_data['n_comps'],
+                                   swaps_pattern=swaps_pattern,
+                                   layers=layers,
+                                   depth=len(layers))
+
+
+def get_layers_from_net_data(net_data) -> List[List[Tuple[int, int, int]]]:
+    """The layers of the network, computed from the swaps_pattern if net_data
+    has been built without them."""
+    layers = net_data.get('layers')
+    if layers is not None:
+        return layers
+    return get_layers(net_data['swaps_pattern'])
+
+
+def _apply_network(routine: QRoutine, net_data: patterns.NetworkPattern,
+                   a_wires, comp_wires):
+    for layer in get_layers_from_net_data(net_data):
+        for swap_pattern in layer:
+            a_qb = a_wires[swap_pattern[1]]
+            b_qb = a_wires[swap_pattern[2]]
+            ctrl_qb = comp_wires[swap_pattern[0]]
+            # Compare qubits 1 and 2 and put the output in pattern 0
+            routine.apply(two_bit_comparator(), a_qb, b_qb, ctrl_qb)
+            routine.apply(SWAP.ctrl(), ctrl_qb, a_qb, b_qb)
+
+
+def _apply_network_dag(routine: QRoutine, net_data: patterns.NetworkPattern,
+                       a_wires, comp_wires):
+    # Both the comparator and the controlled swap are self-inverse
+    for layer in reversed(get_layers_from_net_data(net_data)):
+        for swap_pattern in reversed(layer):
+            a_qb = a_wires[swap_pattern[1]]
+            b_qb = a_wires[swap_pattern[2]]
+            ctrl_qb = comp_wires[swap_pattern[0]]
+            routine.apply(SWAP.ctrl(), ctrl_qb, a_qb, b_qb)
+            routine.apply(two_bit_comparator(), a_qb, b_qb, ctrl_qb)
+
+
+def apply_sort_permutation(routine: QRoutine,
+                           net_data: patterns.NetworkPattern, a_wires,
+                           comp_wires, swap_gate: QRoutine, groups: List[Any]):
+    """Permute the groups of wires as the lines would be permuted by sorting
+    them, leaving the lines and the comparator wires untouched.
+
+    Sorting is not reversible, so the comparator wires can't be cleaned one at
+    a time; instead the lines are sorted, the recorded swaps are applied to
+    the groups and the network is then undone, so that the lines get back
+    their value and the comparator wires are back to 0 and can be declared as
+    ancillae.
+
+    :param routine: The routine the gates are applied to
+    :param net_data: The pattern of the network
+    :param a_wires: The lines to sort
+    :param comp_wires: The comparator wires, one per comparator, set to 0
+    :param swap_gate: The gate swapping two groups
+    :param groups: One group of wires for each line
+
+    """
+    _apply_network(routine, net_data, a_wires, comp_wires)
+    for layer in get_layers_from_net_data(net_data):
+        for swap_pattern in layer:
+            routine.apply(swap_gate.ctrl(), comp_wires[swap_pattern[0]],
+                          groups[swap_pattern[1]], groups[swap_pattern[2]])
+    _apply_network_dag(routine, net_data, a_wires, comp_wires)
+
+
+def _build_gate_common(net_data: patterns.NetworkPattern) -> QRoutine:
     a_len: int = net_data['n_lines']
     comp_len: int = net_data['n_comps']
     routine = QRoutine()
     a_wires = routine.new_wires(a_len)
     comp_wires = routine.new_wires(comp_len)
-
-    for swap_pattern in net_data['swaps_pattern']:
-        a_qb = a_wires[swap_pattern[1]]
-        b_qb = a_wires[swap_pattern[2]]
-        ctrl_qb = comp_wires[swap_pattern[0]]
-        # Compare qubits 1 and 2 and put the output in pattern 0
-        routine.apply(two_bit_comparator(), a_qb, b_qb, ctrl_qb)
-        routine.apply(SWAP.ctrl(), ctrl_qb, a_qb, b_qb)
+    _apply_network(routine, net_data, a_wires, comp_wires)
     return routine
 
 
-@build_gate("BITONIC_SORTER", [dict])
-def build_gate_bitonic_sorter(net_data: Dict[str, Any]) -> QRoutine:
+@build_gate("BITONIC_SORTER", [patterns.NetworkPattern])
+def build_gate_bitonic_sorter(net_data: patterns.NetworkPattern) -> QRoutine:
     return _build_gate_common(net_data)
 
 
-def get_pattern_bitonic_sorter(n) -> Dict[str, Any]:
+def get_pattern_bitonic_sorter(n) -> patterns.NetworkPattern:
     """Given how it's built, n should be a power of 2 and, if not, it returns the
     combination rounding up to the top power of 2. If the original n is not a
     power of 2, you may want to adapt the circuit avoiding the use of the last
     bits.
 
-    Returns a dictionary containing the:
+    Returns a :class:`~qat.external.utils.qroutines.patterns.NetworkPattern`
+    containing the:
     1. n_lines, the number of lines required; it is the rounding up of n to the
     closest power of 2
 
@@ -59,6 +148,11 @@ def get_pattern_bitonic_sorter(n) -> Dict[str, Any]:
     - an integer signalling which comparator output bit to use
     - the first line involved in the swap
     - the second line involved in the swap
+
+    4. layers, the swaps_pattern tuples grouped in layers of comparators
+    acting on disjoint lines (see :func:`get_layers`)
+
+    5. depth, the number of layers
     """
     net_data = {}
     steps = int(np.ceil(np.log2(n)))
@@ -69,7 +163,7 @@ def get_pattern_bitonic_sorter(n) -> Dict[str, Any]:
     _get_pattern_bitonic_sorter(0, initial_swaps, int(net_data['n_lines'] / 2),
                                 0, net_data)
     net_data['n_comps'] = len(net_data['swaps_pattern'])
-    return net_data
+    return _set_layers(net_data)
 
 
 def _get_pattern_bitonic_sorter(start, end, swap_step, comp_q_idx, net_data):
@@ -102,8 +196,8 @@ def _get_pattern_bitonic_sorter(start, end, swap_step, comp_q_idx, net_data):
     return comp_q_idx
 
 
-@build_gate("MERGER", [dict])
-def build_gate_merger(net_data: dict):
+@build_gate("MERGER", [patterns.NetworkPattern])
+def build_gate_merger(net_data: patterns.NetworkPattern):
     return _build_gate_common(net_data)
 
 
@@ -112,7 +206,7 @@ def get_pattern_merger(n):
     comp_q_idx = _get_pattern_merger_support(n, net_data, 0)
 
     net_data['n_comps'] = len(net_data['swaps_pattern'])
-    return net_data
+    return _set_layers(net_data)
 
 
 def _get_pattern_merger_support(n, net_data, comp_q_idx, start_shift=0):
@@ -138,12 +232,66 @@ def _get_pattern_merger_support(n, net_data, comp_q_idx, start_shift=0):
     return comp_q_idx
 
 
-@build_gate("SORTER", [dict])
-def build_gate_sorter(net_data):
+@build_gate("SORTER", [patterns.NetworkPattern])
+def build_gate_sorter(net_data: patterns.NetworkPattern):
     return _build_gate_common(net_data)
 
 
-def get_pattern_sorter(n):
+@build_gate("SORT_PERMUTE", [patterns.NetworkPattern, int])
+def build_gate_sort_permute(net_data: patterns.NetworkPattern,
+                            width: int) -> QRoutine:
+    """Permute n_lines groups of width wires each as the lines would be
+    permuted by the sorter, see :func:`apply_sort_permutation`. The lines are
+    left untouched and the comparator wires are ancillae.
+
+    The returned QRoutine takes as input the n_lines lines and then the
+    groups, one after the other.
+
+    """
+    routine = QRoutine()
+    a_wires = routine.new_wires(net_data['n_lines'])
+    groups = [routine.new_wires(width) for _ in range(net_data['n_lines'])]
+    comp_wires = routine.new_wires(net_data['n_comps'])
+    routine.set_ancillae(comp_wires)
+    apply_sort_permutation(routine, net_data, a_wires, comp_wires,
+                           _swap_groups(width), groups)
+    return routine
+
+
+@build_gate("SWAP_GROUPS", [int])
+def _swap_groups(width: int) -> QRoutine:
+    routine = QRoutine()
+    group_1 = routine.new_wires(width)
+    group_2 = routine.new_wires(width)
+    for wire_1, wire_2 in zip(group_1, group_2):
+        routine.apply(SWAP, wire_1, wire_2)
+    return routine
+
+
+@cache.memoize
+def get_pattern_sorter(n,
+                       network: str = 'bitonic') -> patterns.NetworkPattern:
+    """Pattern of a network sorting n lines, in the format described in
+    :func:`get_pattern_bitonic_sorter`.
+
+    :param n: The number of lines to sort
+    :param network: The name of the network, one of SORTING_NETWORKS:
+
+    - bitonic, the merge sort built with the merger of this module; n is
+      padded to the closest power of 2
+    - oddeven, Batcher's odd-even merge exchange, see
+      :func:`get_pattern_oddeven_sorter`; no padding is required
+    - optimal, the networks with the minimum number of comparators, only for
+      n <= 8, see :func:`get_pattern_optimal_sorter`
+
+    """
+    if network not in SORTING_NETWORKS:
+        raise ValueError(f"Unknown sorting network {network}, choose among "
+                         f"{list(SORTING_NETWORKS)}")
+    return SORTING_NETWORKS[network](n)
+
+
+def _get_pattern_bitonic_merge_sorter(n):
     net_data = {}
     lis = []
 
@@ -157,7 +305,7 @@ def get_pattern_sorter(n):
         comp_q_idx = _get_pattern_merger_support(n, net_data, comp_q_idx,
                                                  start)
         net_data['n_comps'] = len(net_data['swaps_pattern'])
-    return net_data
+    return _set_layers(net_data)
 
 
 def _get_pattern_sorter_support(start, end, acc, depth=0):
@@ -176,3 +324,139 @@ def _get_pattern_sorter_support(start, end, acc, depth=0):
     # print(f"{rec_string}before recursion 2")
     _get_pattern_sorter_support(mid, end, acc, depth + 1)
     return
+
+
+def get_pattern_from_comparators(
+        n: int, comparators: List[Tuple[int, int]]) -> patterns.NetworkPattern:
+    """Pattern of the network made by the given comparators, each one moving
+    the greater value of the lines (i, j), i < j, to line j.
+
+    """
+    net_data = {}
+    net_data['n_lines'] = n
+    net_data['swaps_pattern'] = [
+        (comp_q_idx, i, j) for comp_q_idx, (i, j) in enumerate(comparators)
+    ]
+    net_data['n_comps'] = len(net_data['swaps_pattern'])
+    return _set_layers(net_data)
+
+
+def get_pattern_oddeven_sorter(n: int) -> patterns.NetworkPattern:
+    """Batcher's odd-even merge exchange sorting network, as described by
+    Knuth in The Art of Computer Programming, vol. 3, Algorithm 5.2.2M. It
+    works for any n, without padding, and uses O(n log^2 n) comparators in
+    O(log^2 n) layers.
+
+    """
+    comparators = []
+    steps = int(np.ceil(np.log2(n))) if n > 1 else 0
+    p = 2**(steps - 1) if steps > 0 else 0
+    while p > 0:
+        q = 2**(steps - 1)
+        r = 0
+        d = p
+        while d > 0:
+            for i in range(n - d):
+                if i & p == r:
+                    comparators.append((i, i + d))
+            d = q - p
+            q = q // 2
+            r = p
+        p = p // 2
+    return get_pattern_from_comparators(n, comparators)
+
+
+# Networks with the minimum known number of comparators, see The Art of
+# Computer Programming, vol. 3, Section 5.3.4
+_OPTIMAL_NETWORKS = {
+    1: [],
+    2: [(0, 1)],
+    3: [(0, 2), (0, 1), (1, 2)],
+    4: [(0, 1), (2, 3), (0, 2), (1, 3), (1, 2)],
+    5: [(0, 1), (3, 4), (2, 4), (2, 3), (0, 3), (0, 2), (1, 4), (1, 3),
+        (1, 2)],
+    6: [(1, 2), (4, 5), (0, 2), (3, 5), (0, 1), (3, 4), (2, 5), (0, 3),
+        (1, 4), (2, 4), (1, 3), (2, 3)],
+    7: [(1, 2), (3, 4), (5, 6), (0, 2), (3, 5), (4, 6), (0, 1), (4, 5),
+        (2, 6), (0, 4), (1, 5), (0, 3), (2, 5), (1, 3), (2, 4), (2, 3)],
+    8: [(0, 2), (1, 3), (4, 6), (5, 7), (0, 4), (1, 5), (2, 6), (3, 7),
+        (0, 1), (2, 3), (4, 5), (6, 7), (2, 4), (3, 5), (1, 4), (3, 6),
+        (1, 2), (3, 4), (5, 6)],
+}
+
+
+def get_pattern_optimal_sorter(n: int) -> patterns.NetworkPattern:
+    """Sorting network with the minimum number of comparators, available for
+    n <= 8.
+
+    """
+    if n not in _OPTIMAL_NETWORKS:
+        raise ValueError(f"No optimal network available for {n} lines")
+    return get_pattern_from_comparators(n, _OPTIMAL_NETWORKS[n])
+
+
+SORTING_NETWORKS = {
+    'bitonic': _get_pattern_bitonic_merge_sorter,
+    'oddeven': get_pattern_oddeven_sorter,
+    'optimal': get_pattern_optimal_sorter,
+}
+
+
+# Depth of a comparator followed by its controlled swap
+_COMPARATOR_DEPTH = 4
+
+
+def _get_merger_size(n: int):
+    """Number of comparators and of stages of the merger for n lines"""
+    steps = int(np.ceil(np.log2(n))) if n > 1 else 0
+    return 2**steps // 2 * steps, steps
+
+
+def _get_sorter_size(start: int, end: int):
+    """Number of comparators, of stages and last line used by the sorter for
+    lines [start, end), following :func:`_get_pattern_sorter_support`."""
+    n_comps, stages = _get_merger_size(end - start)
+    last_line = start + 2**int(np.ceil(np.log2(end - start)))
+    if start + 2 >= end:
+        return n_comps, stages, last_line
+    mid = int((start + end) / 2)
+    comps_1, stages_1, last_1 = _get_sorter_size(start, mid)
+    comps_2, stages_2, last_2 = _get_sorter_size(mid, end)
+    # The two halves run in parallel only if they act on different lines
+    stages_halves = (max(stages_1, stages_2) if last_1 <= mid else stages_1 +
+                     stages_2)
+    return (n_comps + comps_1 + comps_2, stages + stages_halves,
+            max(last_line, last_1, last_2))
+
+
+def get_network_resources(
+        net_data: patterns.NetworkPattern) -> Dict[str, Any]:
+    """Resources required by the builders of this module for the given
+    pattern, see :mod:`~qat.external.utils.qroutines.resources`."""
+    n_comps = net_data['n_comps']
+    res = resources.new_resources(net_data['n_lines'] + n_comps)
+    resources.add_gates(res, "X", 2 * n_comps, 0)
+    resources.add_gates(res, "CCNOT", n_comps, 0)
+    resources.add_gates(
+        res, "CSWAP", n_comps,
+        _COMPARATOR_DEPTH * len(get_layers_from_net_data(net_data)))
+    return res
+
+
+def get_pattern_sorter_resources(n: int,
+                                 network: str = 'bitonic') -> Dict[str, Any]:
+    """Resources required by :func:`build_gate_sorter` with the pattern
+    returned by :func:`get_pattern_sorter`, see
+    :mod:`~qat.external.utils.qroutines.resources`. For the bitonic network
+    they are computed without building the pattern.
+
+    """
+    if network != 'bitonic':
+        return get_network_resources(get_pattern_sorter(n, network))
+    n_comps, stages, _ = _get_sorter_size(0, n)
+    n_lines = 2**int(np.ceil(np.log2(n)))
+    res = resources.new_resources(n_lines + n_comps)
+    resources.add_gates(res, "X", 2 * n_comps, 0)
+    resources.add_gates(res, "CCNOT", n_comps, 0)
+    resources.add_gates(res, "CSWAP", n_comps, _COMPARATOR_DEPTH * stages)
+    return res
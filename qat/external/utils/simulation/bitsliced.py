@@ -0,0 +1,147 @@
+"""
+Bit-sliced simulation of reversible circuits over a batch of inputs.
+
+The batch is stored as a set of bit-planes, one per qubit: plane q is a NumPy
+array of uint64 words whose bit i is the value of qubit q in the i-th input of
+the batch. In this way, a (multi-controlled) X becomes a vectorised AND/XOR and
+a controlled SWAP three vectorised operations, each one acting on 64 inputs
+per word.
+
+The gates are the ones returned by
+:func:`~qat.external.utils.simulation.reversible.get_reversible_ops`.
+"""
+import logging
+from typing import TYPE_CHECKING, Dict, Sequence, Tuple
+
+import numpy as np
+from qat.external.utils.simulation import reversible
+
+if TYPE_CHECKING:
+    from qat.core import Circuit
+
+LOGGER = logging.getLogger(__name__)
+
+WORD_BITS = 64
+
+
+def new_planes(nbqbits: int, batch_size: int) -> np.ndarray:
+    """Bit-planes for nbqbits qubits, all set to 0 for each one of the
+    batch_size inputs.
+
+    """
+    nwords = -(-batch_size // WORD_BITS)
+    return np.zeros((nbqbits, nwords), dtype=np.uint64)
+
+
+def _pack(bits: np.ndarray, nwords: int) -> np.ndarray:
+    """Pack a vector of 0/1 in a plane of uint64 words"""
+    padded = np.zeros(nwords * WORD_BITS, dtype=np.uint8)
+    padded[:len(bits)] = bits
+    packed = np.packbits(padded, bitorder='little')
+    return packed.view('<u8').astype(np.uint64)
+
+
+def _unpack(plane: np.ndarray, batch_size: int) -> np.ndarray:
+    """Inverse of :func:`_pack`"""
+    as_bytes = plane.astype('<u8').view(np.uint8)
+    return np.unpackbits(as_bytes, bitorder='little')[:batch_size]
+
+
+def set_ints(planes: np.ndarray, qubits: Sequence[int], values: np.ndarray,
+             little_endian: bool) -> np.ndarray:
+    """Write, for each input of the batch, the corresponding integer of values
+    on the given qubits. The planes are modified in place and returned.
+
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    nbits = len(qubits)
+    if len(values) > planes.shape[1] * WORD_BITS:
+        raise ValueError(
+            f"{len(values)} values for a batch of {planes.shape[1]} words")
+    for i, qb in enumerate(qubits):
+        shift = i if little_endian else nbits - 1 - i
+        bits = ((values >> np.uint64(shift)) & np.uint64(1)).astype(np.uint8)
+        planes[qb] = _pack(bits, planes.shape[1])
+    return planes
+
+
+def set_bits(planes: np.ndarray, qubits: Sequence[int],
+             bits: np.ndarray) -> np.ndarray:
+    """Write, for each input of the batch, a row of bits (a (batch_size,
+    len(qubits)) array of 0/1) on the given qubits, column i on qubit
+    qubits[i]. The planes are modified in place and returned.
+
+    """
+    bits = np.asarray(bits, dtype=np.uint8)
+    if len(bits) > planes.shape[1] * WORD_BITS:
+        raise ValueError(
+            f"{len(bits)} rows for a batch of {planes.shape[1]} words")
+    for i, qb in enumerate(qubits):
+        planes[qb] = _pack(bits[:, i], planes.shape[1])
+    return planes
+
+
+def get_ints(planes: np.ndarray, qubits: Sequence[int], batch_size: int,
+             little_endian: bool) -> np.ndarray:
+    """Read, for each input of the batch, the integer stored on the given
+    qubits.
+
+    """
+    nbits = len(qubits)
+    values = np.zeros(batch_size, dtype=np.uint64)
+    for i, qb in enumerate(qubits):
+        shift = i if little_endian else nbits - 1 - i
+        bits = _unpack(planes[qb], batch_size).astype(np.uint64)
+        values |= bits << np.uint64(shift)
+    return values
+
+
+def run(rev_ops: Sequence[Tuple[Tuple[int, ...], Tuple[int, ...]]],
+        planes: np.ndarray) -> np.ndarray:
+    """Apply the reversible ops to each input of the batch. The planes are
+    modified in place and returned.
+
+    """
+    for ctrls, targets in rev_ops:
+        if len(ctrls) == 0:
+            mask = None
+        elif len(ctrls) == 1:
+            mask = planes[ctrls[0]]
+        else:
+            mask = np.bitwise_and.reduce(planes[list(ctrls)], axis=0)
+        if len(targets) == 1:
+            if mask is None:
+                np.invert(planes[targets[0]], out=planes[targets[0]])
+            else:
+                planes[targets[0]] ^= mask
+        else:
+            diff = planes[targets[0]] ^ planes[targets[1]]
+            if mask is not None:
+                diff &= mask
+            planes[targets[0]] ^= diff
+            planes[targets[1]] ^= diff
+    return planes
+
+
+def simulate_circuit(circuit: 'Circuit', inputs: Dict[Tuple[int, ...],
+                                                      np.ndarray],
+                     little_endian: bool) -> np.ndarray:
+    """Run the circuit over a batch of inputs.
+
+    :param circuit: The circuit, made only of reversible gates
+    :param inputs: A dictionary mapping a tuple of qubits (a register) to the
+    array of values it takes in each input of the batch. All the arrays must
+    have the same length, i.e. the batch size. Qubits not appearing in any
+    register start from 0.
+    :param little_endian: The endianness used to write the values
+    :returns: The bit-planes after the circuit, to be read with
+    :func:`get_ints`
+
+    """
+    sizes = set(len(values) for values in inputs.values())
+    if len(sizes) != 1:
+        raise ValueError(f"Inconsistent batch sizes {sizes}")
+    planes = new_planes(circuit.nbqbits, sizes.pop())
+    for qubits, values in inputs.items():
+        set_ints(planes, qubits, values, little_endian)
+    return run(reversible.get_reversible_ops(circuit), planes)
@@ -0,0 +1,192 @@
+"""
+Classical simulation of reversible circuits.
+
+Most of the routines of this package (adders, comparators, sorting networks,
+RREF, ...) only use X, SWAP and their controlled versions, i.e. they map basis
+states to basis states. Their action on a basis state can hence be computed on
+a plain bit vector in O(#gates), without the 2^n statevector required by a
+quantum simulator.
+
+The circuit is inlined through `Circuit.iterate_simple`, so ancillae allocated
+by the compiler are part of the bit vector (after the program qubits).
+"""
+import logging
+from typing import TYPE_CHECKING, List, NamedTuple, Optional, Sequence, Tuple
+
+from qat.lang.AQASM import Program
+
+if TYPE_CHECKING:
+    from qat.core import Circuit
+
+LOGGER = logging.getLogger(__name__)
+
+# Gates whose name already includes some controls
+_IMPLICIT_CTRLS = {
+    "CNOT": (1, "X"),
+    "CCNOT": (2, "X"),
+    "CSIGN": (1, "Z"),
+}
+# Gates which are equal to their dagger
+_SELF_INVERSE = {"I", "X", "Y", "Z", "H", "SWAP"}
+# Gates whose dagger is obtained negating their parameters
+_ROTATIONS = {"RX", "RY", "RZ", "PH"}
+# Not gates, but instructions that may appear in a circuit
+_SKIPPED = {"MEASURE", "BREAK", "LOGIC", "REMAP"}
+
+
+class Op(NamedTuple):
+    """A flattened gate, with its controls separated from its targets."""
+    name: str
+    params: Tuple[float, ...]
+    ctrls: Tuple[int, ...]
+    targets: Tuple[int, ...]
+
+
+def parse_gate_name(name: str) -> Tuple[int, bool, str]:
+    """Split the name of a gate, as returned by `Circuit.iterate_simple`, into
+    its number of controls, its dagger flag and its base gate. F.e., C-C-X
+    returns (2, False, 'X') and C-CCNOT returns (3, False, 'X').
+
+    """
+    nctrls = 0
+    dag = False
+    while True:
+        if name.startswith("C-"):
+            nctrls += 1
+            name = name[2:]
+        elif name.startswith("D-"):
+            dag = not dag
+            name = name[2:]
+        else:
+            break
+    if name in _IMPLICIT_CTRLS:
+        implicit, name = _IMPLICIT_CTRLS[name]
+        nctrls += implicit
+    return nctrls, dag, name
+
+
+def get_ops(circuit: 'Circuit') -> List[Op]:
+    """Flatten the circuit in a list of :class:`Op`. Measures are skipped, since
+    they do not change a basis state.
+
+    """
+    ops = []
+    for name, params, qbits in circuit.iterate_simple():
+        if name in _SKIPPED:
+            LOGGER.debug("skipping %s on %s", name, qbits)
+            continue
+        if name == "RESET":
+            raise ValueError("RESET is not supported")
+        nctrls, dag, base = parse_gate_name(name)
+        params = tuple(params)
+        if dag and base in _ROTATIONS:
+            params = tuple(-p for p in params)
+        elif dag and base not in _SELF_INVERSE:
+            base = "D-" + base
+        ops.append(Op(base, params, tuple(qbits[:nctrls]),
+                      tuple(qbits[nctrls:])))
+    return ops
+
+
+def get_reversible_ops(
+        circuit: 'Circuit') -> List[Tuple[Tuple[int, ...], Tuple[int, ...]]]:
+    """Return the circuit as a list of (controls, targets) tuples. A single
+    target means a (multi-controlled) X gate, two targets a (multi-controlled)
+    SWAP gate.
+
+    :raises ValueError: if the circuit contains a gate which does not map basis
+    states to basis states.
+
+    """
+    rev_ops = []
+    for op in get_ops(circuit):
+        if op.name == "I":
+            continue
+        if op.name not in ("X", "SWAP"):
+            raise ValueError(
+                f"Gate {op.name} on {op.ctrls + op.targets} is not reversible")
+        rev_ops.append((op.ctrls, op.targets))
+    return rev_ops
+
+
+def run(rev_ops: Sequence[Tuple[Tuple[int, ...], Tuple[int, ...]]],
+        bits: List[int]) -> List[int]:
+    """Apply the reversible ops, as returned by :func:`get_reversible_ops`, to
+    the bit vector. The vector is modified in place and returned.
+
+    """
+    for ctrls, targets in rev_ops:
+        if all(bits[c] for c in ctrls):
+            if len(targets) == 1:
+                bits[targets[0]] ^= 1
+            else:
+                bits[targets[0]], bits[targets[1]] = bits[targets[1]], bits[
+                    targets[0]]
+    return bits
+
+
+def simulate_circuit(circuit: 'Circuit',
+                     bits: Optional[Sequence[int]] = None) -> List[int]:
+    """Compute the output basis state of the circuit.
+
+    :param circuit: The circuit, made only of reversible gates
+    :param bits: The input basis state, one int per qubit. If shorter than the
+    number of qubits of the circuit (f.e. bcz of ancillae), it is padded with
+    zeros. If None, all the qubits start from 0.
+    :returns: The output basis state, one int per qubit
+
+    """
+    nbqbits = circuit.nbqbits
+    in_bits = [] if bits is None else [int(b) for b in bits]
+    if len(in_bits) > nbqbits:
+        raise ValueError(
+            f"{len(in_bits)} input bits for a circuit on {nbqbits} qubits")
+    in_bits += [0] * (nbqbits - len(in_bits))
+    return run(get_reversible_ops(circuit), in_bits)
+
+
+def get_routine_arity(routine) -> int:
+    """Arity of a QRoutine or of a gate obtained through build_gate"""
+    if routine.arity is not None:
+        return routine.arity
+    abstract_gate = routine.abstract_gate
+    return abstract_gate.circuit_generator(*routine.parameters).arity
+
+
+def routine_to_circ(routine, **circ_args) -> 'Circuit':
+    """Build the circuit of a routine, applied to freshly allocated qubits. The
+    first qubits of the circuit are the ones of the routine arguments, in the
+    same order; the ancillae follow.
+
+    """
+    program = Program()
+    qbits = program.qalloc(get_routine_arity(routine))
+    program.apply(routine, qbits)
+    return program.to_circ(**circ_args)
+
+
+def simulate_routine(routine,
+                     bits: Optional[Sequence[int]] = None) -> List[int]:
+    """Same as :func:`simulate_circuit`, but starting from a QRoutine"""
+    return simulate_circuit(routine_to_circ(routine), bits)
+
+
+def set_int(bits: List[int], qubits: Sequence[int], value: int,
+            little_endian: bool) -> List[int]:
+    """Write the integer value on the given qubits of the bit vector."""
+    nbits = len(qubits)
+    for i, qb in enumerate(qubits):
+        shift = i if little_endian else nbits - 1 - i
+        bits[qb] = (value >> shift) & 1
+    return bits
+
+
+def get_int(bits: Sequence[int], qubits: Sequence[int],
+            little_endian: bool) -> int:
+    """Read the integer value stored on the given qubits of the bit vector."""
+    nbits = len(qubits)
+    value = 0
+    for i, qb in enumerate(qubits):
+        shift = i if little_endian else nbits - 1 - i
+        value |= bits[qb] << shift
+    return value
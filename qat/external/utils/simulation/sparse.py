@@ -0,0 +1,222 @@
+"""
+Sparse statevector simulation.
+
+Only the basis states with a non-zero amplitude are stored, as a sorted array
+of keys (one row of uint64 words per basis state, bit q of the key being the
+value of qubit q) together with the array of their amplitudes. Permutation
+gates (X, SWAP and their controlled versions) and diagonal gates just update
+the arrays in place, while gates creating superposition (f.e. the controlled
+RY of the Dicke state preparation) double the affected rows, which are then
+merged back.
+
+This is convenient for circuits like the ISD one, where a Dicke state with
+C(n, k) non-zero amplitudes is prepared and then only permutation logic is
+applied: the memory and time required depend on the support of the state,
+not on the number of qubits.
+"""
+import logging
+from typing import TYPE_CHECKING, Dict, Optional, Sequence
+
+import numpy as np
+from qat.external.utils.simulation import reversible
+
+if TYPE_CHECKING:
+    from qat.core import Circuit
+
+LOGGER = logging.getLogger(__name__)
+
+WORD_BITS = 64
+# Amplitudes whose magnitude is below this value are dropped
+EPSILON = 1e-12
+
+_SQRT_2 = np.sqrt(2)
+_CONSTANT_MATRICES = {
+    "I": np.array([[1, 0], [0, 1]], dtype=complex),
+    "X": np.array([[0, 1], [1, 0]], dtype=complex),
+    "Y": np.array([[0, -1j], [1j, 0]], dtype=complex),
+    "Z": np.array([[1, 0], [0, -1]], dtype=complex),
+    "H": np.array([[1, 1], [1, -1]], dtype=complex) / _SQRT_2,
+    "S": np.array([[1, 0], [0, 1j]], dtype=complex),
+    "D-S": np.array([[1, 0], [0, -1j]], dtype=complex),
+    "T": np.array([[1, 0], [0, np.exp(1j * np.pi / 4)]], dtype=complex),
+    "D-T": np.array([[1, 0], [0, np.exp(-1j * np.pi / 4)]], dtype=complex),
+}
+
+
+def get_gate_matrix(name: str, params: Sequence[float]) -> np.ndarray:
+    """Matrix of a single qubit gate, as named by
+    :func:`~qat.external.utils.simulation.reversible.get_ops`.
+
+    """
+    if name in _CONSTANT_MATRICES:
+        return _CONSTANT_MATRICES[name]
+    if name == "RX":
+        cos, sin = np.cos(params[0] / 2), np.sin(params[0] / 2)
+        return np.array([[cos, -1j * sin], [-1j * sin, cos]], dtype=complex)
+    if name == "RY":
+        cos, sin = np.cos(params[0] / 2), np.sin(params[0] / 2)
+        return np.array([[cos, -sin], [sin, cos]], dtype=complex)
+    if name == "RZ":
+        phase = np.exp(1j * params[0] / 2)
+        return np.array([[1 / phase, 0], [0, phase]], dtype=complex)
+    if name == "PH":
+        return np.array([[1, 0], [0, np.exp(1j * params[0])]],
+                        dtype=complex)
+    raise ValueError(f"Gate {name} is not supported")
+
+
+class SparseState:
+    """A quantum state stored through its non-zero amplitudes only"""
+    def __init__(self, nbqbits: int, bits: Optional[Sequence[int]] = None):
+        """Initialize the state to a basis state.
+
+        :param nbqbits: The number of qubits
+        :param bits: The initial basis state, one int per qubit. If shorter
+        than nbqbits it is padded with zeros. If None, it is all zeros.
+
+        """
+        self.nbqbits = nbqbits
+        self.nwords = max(1, -(-nbqbits // WORD_BITS))
+        self.keys = np.zeros((1, self.nwords), dtype=np.uint64)
+        self.amplitudes = np.ones(1, dtype=complex)
+        for qb, bit in enumerate(bits if bits is not None else []):
+            if bit:
+                self.keys[0, qb // WORD_BITS] |= np.uint64(1 <<
+                                                           (qb % WORD_BITS))
+
+    def __len__(self) -> int:
+        """Size of the support, i.e. number of non-zero amplitudes"""
+        return len(self.amplitudes)
+
+    def _get_bits(self, qubit: int) -> np.ndarray:
+        word = self.keys[:, qubit // WORD_BITS]
+        return ((word >> np.uint64(qubit % WORD_BITS)) & np.uint64(1)).astype(
+            bool)
+
+    def _get_ctrl_mask(self, ctrls: Sequence[int]) -> np.ndarray:
+        mask = np.ones(len(self), dtype=bool)
+        for ctrl in ctrls:
+            mask &= self._get_bits(ctrl)
+        return mask
+
+    def _flip(self, qubit: int, mask: np.ndarray):
+        self.keys[mask, qubit // WORD_BITS] ^= np.uint64(1 << (qubit %
+                                                               WORD_BITS))
+
+    def _merge(self):
+        """Sort the keys, summing the amplitudes of the repeated ones and
+        dropping the ones whose amplitude vanished.
+
+        """
+        order = np.lexsort(self.keys.T[::-1])
+        keys = self.keys[order]
+        amplitudes = self.amplitudes[order]
+        is_new = np.ones(len(keys), dtype=bool)
+        is_new[1:] = np.any(keys[1:] != keys[:-1], axis=1)
+        starts = np.flatnonzero(is_new)
+        amplitudes = np.add.reduceat(amplitudes, starts)
+        keys = keys[starts]
+        non_zero = np.abs(amplitudes) > EPSILON
+        self.keys = keys[non_zero]
+        self.amplitudes = amplitudes[non_zero]
+
+    def apply_op(self, op: reversible.Op):
+        """Apply a gate, as returned by
+        :func:`~qat.external.utils.simulation.reversible.get_ops`.
+
+        """
+        if op.name == "I":
+            return
+        mask = self._get_ctrl_mask(op.ctrls)
+        if op.name == "SWAP":
+            diff = mask & (self._get_bits(op.targets[0]) ^ self._get_bits(
+                op.targets[1]))
+            self._flip(op.targets[0], diff)
+            self._flip(op.targets[1], diff)
+            return
+        if len(op.targets) != 1:
+            raise ValueError(f"Gate {op.name} is not supported")
+        target = op.targets[0]
+        if op.name == "X":
+            self._flip(target, mask)
+            return
+        matrix = get_gate_matrix(op.name, op.params)
+        target_bits = self._get_bits(target)
+        if matrix[0, 1] == 0 and matrix[1, 0] == 0:
+            # Diagonal gate, the support does not change
+            self.amplitudes[mask & ~target_bits] *= matrix[0, 0]
+            self.amplitudes[mask & target_bits] *= matrix[1, 1]
+            return
+        # Each affected basis state is split in two: one with the target
+        # qubit at 0 and one with the target qubit at 1
+        bits = target_bits[mask].astype(int)
+        amplitudes = self.amplitudes[mask]
+        keys_0 = self.keys[mask]
+        keys_0[:, target // WORD_BITS] &= ~np.uint64(1 << (target %
+                                                           WORD_BITS))
+        keys_1 = keys_0.copy()
+        keys_1[:, target // WORD_BITS] |= np.uint64(1 << (target %
+                                                          WORD_BITS))
+        self.keys = np.concatenate((self.keys[~mask], keys_0, keys_1))
+        self.amplitudes = np.concatenate(
+            (self.amplitudes[~mask], matrix[0, bits] * amplitudes,
+             matrix[1, bits] * amplitudes))
+        self._merge()
+
+    def apply_circuit(self, circuit: 'Circuit'):
+        """Apply all the gates of the circuit"""
+        if circuit.nbqbits > self.nbqbits:
+            raise ValueError(f"Circuit on {circuit.nbqbits} qubits, state on "
+                             f"{self.nbqbits} qubits")
+        for op in reversible.get_ops(circuit):
+            self.apply_op(op)
+            LOGGER.debug("%s, support %d", op, len(self))
+
+    def get_ints(self, qubits: Sequence[int], little_endian: bool) -> np.ndarray:
+        """For each basis state of the support, the integer stored on the given
+        qubits. At most 64 qubits can be read at once.
+
+        """
+        if len(qubits) > WORD_BITS:
+            raise ValueError(f"Cannot read more than {WORD_BITS} qubits")
+        nbits = len(qubits)
+        values = np.zeros(len(self), dtype=np.uint64)
+        for i, qb in enumerate(qubits):
+            shift = i if little_endian else nbits - 1 - i
+            values |= self._get_bits(qb).astype(np.uint64) << np.uint64(shift)
+        return values
+
+    def get_probabilities(self, qubits: Sequence[int],
+                          little_endian: bool) -> Dict[int, float]:
+        """Marginal probability distribution of the integer stored on the given
+        qubits.
+
+        """
+        values, inverse = np.unique(self.get_ints(qubits, little_endian),
+                                    return_inverse=True)
+        probs = np.bincount(inverse, weights=np.abs(self.amplitudes)**2)
+        return {int(v): float(p) for v, p in zip(values, probs)}
+
+    def to_dict(self) -> Dict[str, complex]:
+        """The non-zero amplitudes, indexed by the bitstring of the basis state.
+        As in qat results, qubit 0 is the leftmost character.
+
+        """
+        res = {}
+        for key, amplitude in zip(self.keys, self.amplitudes):
+            bitstring = ''.join(
+                str((int(key[qb // WORD_BITS]) >> (qb % WORD_BITS)) & 1)
+                for qb in range(self.nbqbits))
+            res[bitstring] = complex(amplitude)
+        return res
+
+
+def simulate_circuit(circuit: 'Circuit',
+                     bits: Optional[Sequence[int]] = None) -> SparseState:
+    """Run the circuit starting from the given basis state (all zeros by
+    default).
+
+    """
+    state = SparseState(circuit.nbqbits, bits)
+    state.apply_circuit(circuit)
+    return state
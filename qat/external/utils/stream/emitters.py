@@ -0,0 +1,195 @@
+"""
+Generators of the flat gates of the largest routines, for sizes whose
+QRoutine objects would not fit in memory.
+
+Each generator yields the gates one at a time, as the
+:class:`~qat.external.utils.simulation.reversible.Op` returned by
+:func:`~qat.external.utils.simulation.reversible.get_ops` on the built
+circuit, in the same order and on the same qubits: the arguments of the
+routine first, then its ancillae. The loops over rows, comparators and
+adders are run lazily, while the small gates they apply (f.e. an adder of a
+few bits) are built once by qat and replayed on the right qubits.
+
+The RREF gates are generated from nrows and ncols only, so their memory does
+not depend on the number of gates. The sorting networks and the adder trees
+are instead read from their patterns, which hold every comparator, resp.
+every adder: the memory is linear in the number of comparators, i.e. in the
+number of gates of a sorter, and in the number of adders of a tree, far less
+than the one of the QRoutine objects but not constant.
+
+The gates can be counted or scheduled by :mod:`~.sinks`, or written to a
+file.
+"""
+import logging
+from functools import lru_cache
+from typing import Iterator, Optional, Sequence, Tuple
+
+from qat.external.utils.qroutines import adder, patterns
+from qat.external.utils.qroutines import sorting_network as sn
+from qat.external.utils.qroutines.linalg import rref
+from qat.external.utils.simulation import reversible
+
+LOGGER = logging.getLogger(__name__)
+
+Op = reversible.Op
+
+
+def _x(*qubits: int) -> Op:
+    """(Multi-controlled) X, the target being the last qubit"""
+    return Op("X", (), tuple(qubits[:-1]), (qubits[-1], ))
+
+
+@lru_cache(maxsize=None)
+def _get_leaf(name: str, *params) -> Tuple[Tuple[Op, ...], int, int]:
+    """The gates of a small routine, its arity and its number of ancillae.
+    The routine is given by name, to be cached: '2BIT_COMP' or an adder,
+    '{ADDER}' or '~{ADDER}' followed by its parameters."""
+    if name == "2BIT_COMP":
+        routine = adder.two_bit_comparator()
+    else:
+        adder_gate = adder.get_adder(name.lstrip("~"))
+        if name.startswith("~"):
+            adder_gate = ~adder_gate
+        routine = adder_gate(*params)
+    circ = reversible.routine_to_circ(routine)
+    arity = reversible.get_routine_arity(routine)
+    return tuple(reversible.get_ops(circ)), arity, circ.nbqbits - arity
+
+
+def _replay(leaf: Tuple[Tuple[Op, ...], int, int], qubits: Sequence[int],
+            ancillae: Sequence[int]) -> Iterator[Op]:
+    ops, arity, _ = leaf
+    wires = list(qubits[:arity]) + list(ancillae)
+    for op in ops:
+        yield op._replace(ctrls=tuple(wires[qb] for qb in op.ctrls),
+                          targets=tuple(wires[qb] for qb in op.targets))
+
+
+def get_row_swap_ops(nrows: int, ncols: int, row_src_idx: int,
+                     qubits: Sequence[int]) -> Iterator[Op]:
+    """Gates of
+    :func:`~qat.external.utils.qroutines.linalg.rref.get_row_swap`, applied
+    to qubits: the rows, then one ancilla per row below the source one."""
+    row_src = row_src_idx * ncols
+    pivot = qubits[row_src + row_src_idx]
+    yield _x(pivot)
+    for row_oth_idx in range(row_src_idx + 1, nrows):
+        anc = qubits[nrows * ncols + row_oth_idx - row_src_idx - 1]
+        row_oth = row_oth_idx * ncols
+        yield _x(pivot, anc)
+        for col_idx in range(row_src_idx, ncols):
+            yield _x(anc, qubits[row_oth + col_idx], qubits[row_src + col_idx])
+    yield _x(pivot)
+
+
+def get_row_addition_ops(nrows: int, ncols: int, row_src_idx: int,
+                         qubits: Sequence[int]) -> Iterator[Op]:
+    """Gates of
+    :func:`~qat.external.utils.qroutines.linalg.rref.get_row_addition`,
+    applied to qubits: the rows, then one ancilla per row but the source
+    one."""
+    row_src = row_src_idx * ncols
+    anc = nrows * ncols
+    for row_oth_idx in range(nrows):
+        if row_oth_idx == row_src_idx:
+            continue
+        row_oth = row_oth_idx * ncols
+        yield _x(qubits[row_oth + row_src_idx], qubits[anc])
+        for col_idx in range(row_src_idx, ncols):
+            yield _x(qubits[anc], qubits[row_src + col_idx],
+                     qubits[row_oth + col_idx])
+        anc += 1
+
+
+def get_rref_ops(nrows: int,
+                 ncols: int,
+                 qubits: Optional[Sequence[int]] = None) -> Iterator[Op]:
+    """Gates of :func:`~qat.external.utils.qroutines.linalg.rref.get_rref`,
+    applied to qubits (by default the first ones): the matrix, the swap
+    ancillae and the add ancillae.
+
+    :raises ValueError: if nrows > ncols, since the ancillae of the routine
+    are then not enough for the row operations
+
+    """
+    if nrows > ncols:
+        raise ValueError(f"A {nrows} x {ncols} matrix has more rows than "
+                         "columns")
+    swap_n, add_n = rref.get_required_ancillae(nrows, ncols)
+    if qubits is None:
+        qubits = range(nrows * ncols + swap_n + add_n)
+    matrix = list(qubits[:nrows * ncols])
+    swap_idx = nrows * ncols
+    add_idx = swap_idx + swap_n
+    for i in range(min(nrows, ncols)):
+        if i != nrows - 1:
+            swap_len = nrows - 1 - i
+            yield from get_row_swap_ops(
+                nrows, ncols, i,
+                matrix + list(qubits[swap_idx:swap_idx + swap_len]))
+            swap_idx += swap_len
+        yield from get_row_addition_ops(
+            nrows, ncols, i,
+            matrix + list(qubits[add_idx:add_idx + nrows - 1]))
+        add_idx += nrows - 1
+
+
+def get_sorter_ops(net_data: patterns.NetworkPattern,
+                   qubits: Optional[Sequence[int]] = None) -> Iterator[Op]:
+    """Gates of
+    :func:`~qat.external.utils.qroutines.sorting_network.build_gate_sorter`,
+    applied to qubits (by default the first ones): the lines, then one
+    comparator qubit per comparator. The gates are streamed, but the layers
+    of net_data hold all the comparators, see the module documentation."""
+    n_lines = net_data['n_lines']
+    if qubits is None:
+        qubits = range(n_lines + net_data['n_comps'])
+    comparator = _get_leaf("2BIT_COMP")
+    for layer in sn.get_layers_from_net_data(net_data):
+        for comp_idx, a_idx, b_idx in layer:
+            a_qb, b_qb = qubits[a_idx], qubits[b_idx]
+            ctrl_qb = qubits[n_lines + comp_idx]
+            yield from _replay(comparator, (a_qb, b_qb, ctrl_qb), ())
+            yield Op("SWAP", (), (ctrl_qb, ), (a_qb, b_qb))
+
+
+def _check_adder_tree(pattern: patterns.WeightPattern):
+    if not isinstance(pattern, patterns.AdderTreePattern):
+        raise ValueError("Only the adder trees can be streamed, got a "
+                         f"{type(pattern).__name__}")
+
+
+def get_weight_ancillae(pattern: patterns.AdderTreePattern) -> int:
+    """Number of ancillae following the qubits in :func:`get_weight_ops`
+
+    :raises ValueError: if pattern is not an adder tree, f.e. a
+    :class:`~qat.external.utils.qroutines.patterns.CarrySavePattern`
+
+    """
+    _check_adder_tree(pattern)
+    return max((_get_leaf("~" + pattern.adder, *shape, True)[2]
+                for shape in set(pattern.adders_shape)),
+               default=0)
+
+
+def get_weight_ops(pattern: patterns.AdderTreePattern,
+                   qubits: Optional[Sequence[int]] = None) -> Iterator[Op]:
+    """Gates of
+    :func:`~qat.external.utils.qroutines.hamming_weight_compute.fpc.get_qroutine_for_qubits_weight`,
+    applied to qubits (by default the first ones): the lines, the couts and
+    the :func:`get_weight_ancillae` ancillae shared by the adders.
+
+    :raises ValueError: if pattern is not an adder tree, f.e. a
+    :class:`~qat.external.utils.qroutines.patterns.CarrySavePattern`
+
+    """
+    _check_adder_tree(pattern)
+    n_qubits = pattern['n_lines'] + pattern['n_couts']
+    if qubits is None:
+        qubits = range(n_qubits + get_weight_ancillae(pattern))
+    ancillae = qubits[n_qubits:]
+    for adder_pattern, shape in zip(pattern.adders_pattern,
+                                    pattern.adders_shape):
+        leaf = _get_leaf("~" + pattern.adder, *shape, True)
+        yield from _replay(leaf, [qubits[qb] for qb in adder_pattern],
+                           ancillae[:leaf[2]])
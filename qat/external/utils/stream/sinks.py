@@ -0,0 +1,166 @@
+"""
+Consumers of the streams of gates of :mod:`~.emitters`, or of any iterable
+of :class:`~qat.external.utils.simulation.reversible.Op`, which only keep
+one gate at a time in memory:
+
+#. :func:`schedule` assigns each gate to its layer, as soon as all its qubits
+   are free; :func:`~qat.external.utils.qroutines.resources.get_ops_resources`
+   counts the gates and the depth in the same way;
+#. :func:`write_qasm` writes the gates as OpenQASM 3;
+#. :func:`write_binary` writes them in a compact binary format, read back by
+   :func:`read_binary`.
+
+The binary format starts with :data:`MAGIC`, followed by a record per gate:
+three unsigned bytes, the code of the gate (its index in :data:`GATES`, plus
+128 for a dagger), the number of controls and the number of targets, then
+its parameters, as little endian doubles, and its qubits, controls first, as
+little endian unsigned 32-bit integers.
+"""
+import logging
+import struct
+from typing import BinaryIO, Iterable, Iterator, TextIO, Tuple
+
+from qat.external.utils.simulation import reversible
+
+LOGGER = logging.getLogger(__name__)
+
+Op = reversible.Op
+
+MAGIC = b"QOPS\x01"
+# The gates of the binary format, with their number of parameters
+GATES = (("I", 0), ("X", 0), ("Y", 0), ("Z", 0), ("H", 0), ("S", 0),
+         ("T", 0), ("SWAP", 0), ("ISWAP", 0), ("SQRTSWAP", 0), ("RX", 1),
+         ("RY", 1), ("RZ", 1), ("PH", 1))
+_CODES = {name: code for code, (name, _) in enumerate(GATES)}
+_DAG_FLAG = 128
+_HEADER = struct.Struct("<BBB")
+
+# The gates of the OpenQASM 3 standard library
+_QASM_GATES = {
+    "I": "id",
+    "X": "x",
+    "Y": "y",
+    "Z": "z",
+    "H": "h",
+    "S": "s",
+    "T": "t",
+    "SWAP": "swap",
+    "RX": "rx",
+    "RY": "ry",
+    "RZ": "rz",
+    "PH": "p",
+}
+_QASM_CTRL_GATES = {("X", 1): "cx", ("X", 2): "ccx", ("SWAP", 1): "cswap"}
+
+
+def schedule(ops: Iterable[Op], nbqbits: int) -> Iterator[Tuple[int, Op]]:
+    """Yield each gate with its layer, starting from 0: the first one after
+    the layers of the previous gates on its qubits."""
+    free = [0] * nbqbits
+    for op in ops:
+        qubits = op.ctrls + op.targets
+        layer = max(free[qb] for qb in qubits)
+        for qb in qubits:
+            free[qb] = layer + 1
+        yield layer, op
+
+
+def _split_name(op: Op) -> Tuple[str, bool]:
+    if op.name.startswith("D-"):
+        return op.name[2:], True
+    return op.name, False
+
+
+def _get_qasm(op: Op) -> str:
+    base, dag = _split_name(op)
+    if base not in _QASM_GATES:
+        raise ValueError(f"Gate {op.name} is not supported by OpenQASM")
+    params = op.params
+    if dag and base in ("S", "T"):
+        name = _QASM_GATES[base] + "dg"
+    elif dag and params:
+        name = _QASM_GATES[base]
+        params = tuple(-param for param in params)
+    else:
+        name = _QASM_GATES[base]
+    if params:
+        name += "(" + ", ".join(repr(float(param))
+                                for param in params) + ")"
+    nctrls = len(op.ctrls)
+    if (base, nctrls) in _QASM_CTRL_GATES:
+        name = _QASM_CTRL_GATES[base, nctrls]
+    elif nctrls == 1:
+        name = "ctrl @ " + name
+    elif nctrls:
+        name = f"ctrl({nctrls}) @ " + name
+    qubits = ", ".join(f"q[{qb}]" for qb in op.ctrls + op.targets)
+    return f"{name} {qubits};\n"
+
+
+def write_qasm(ops: Iterable[Op], file: TextIO, nbqbits: int) -> int:
+    """Write the gates, on nbqbits qubits, as an OpenQASM 3 program and
+    return their number.
+
+    :raises ValueError: if a gate is not in the standard library
+
+    """
+    file.write('OPENQASM 3.0;\ninclude "stdgates.inc";\n')
+    file.write(f"qubit[{nbqbits}] q;\n")
+    count = 0
+    for op in ops:
+        file.write(_get_qasm(op))
+        count += 1
+    LOGGER.debug("%d gates written", count)
+    return count
+
+
+def write_binary(ops: Iterable[Op], file: BinaryIO) -> int:
+    """Write the gates in the binary format of this module and return their
+    number.
+
+    :raises ValueError: if a gate is not in :data:`GATES`
+
+    """
+    file.write(MAGIC)
+    count = 0
+    for op in ops:
+        base, dag = _split_name(op)
+        if base not in _CODES:
+            raise ValueError(f"Gate {op.name} is not supported")
+        qubits = op.ctrls + op.targets
+        file.write(
+            _HEADER.pack(_CODES[base] + dag * _DAG_FLAG, len(op.ctrls),
+                         len(op.targets)) +
+            struct.pack(f"<{len(op.params)}d{len(qubits)}I", *op.params,
+                        *qubits))
+        count += 1
+    LOGGER.debug("%d gates written", count)
+    return count
+
+
+def read_binary(file: BinaryIO) -> Iterator[Op]:
+    """The gates written by :func:`write_binary`
+
+    :raises ValueError: if the file does not start with :data:`MAGIC` or is
+    truncated
+
+    """
+    if file.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a stream of gates")
+    while True:
+        header = file.read(_HEADER.size)
+        if not header:
+            return
+        if len(header) < _HEADER.size:
+            raise ValueError("Truncated gate")
+        code, nctrls, ntargets = _HEADER.unpack(header)
+        base, nparams = GATES[code % _DAG_FLAG]
+        body = struct.Struct(f"<{nparams}d{nctrls + ntargets}I")
+        data = file.read(body.size)
+        if len(data) < body.size:
+            raise ValueError("Truncated gate")
+        values = body.unpack(data)
+        name = "D-" + base if code & _DAG_FLAG else base
+        yield Op(name, tuple(values[:nparams]),
+                 tuple(values[nparams:nparams + nctrls]),
+                 tuple(values[nparams + nctrls:]))
@@ -0,0 +1,335 @@
+"""
+Decompositions of the multi-controlled X gate, C{k}X, into CCNOTs.
+
+#. :func:`mcx_vchain`: a chain of CCNOTs computing the AND of the controls
+   on k - 2 clean ancillae, 2k - 3 CCNOTs in depth 2k - 3
+#. :func:`mcx_log_depth`: the same ANDs, computed by a balanced tree, in
+   depth 2 ceil(log2 k) - 1
+#. :func:`mcx_dirty`: Barenco et al., Lemma 7.2, with k - 2 dirty ancillae,
+   i.e. wires in any state, which are restored; 4(k - 2) CCNOTs
+#. :func:`mcx_one_ancilla`: Barenco et al., Lemma 7.3, splitting the
+   controls in two halves, each one using the other one as dirty ancillae;
+   a single clean ancilla
+
+See A. Barenco et al., Elementary gates for quantum computation, Phys. Rev. A
+52, 3457 (1995).
+
+The wide X.ctrl(k) gates of the package are built through
+:func:`get_mcx_gate`, i.e. as the abstract gate :data:`MCX`, which is lowered
+to a native C{k}X unless a different implementation is linked::
+
+    program.to_circ(link=[mcx.get_link('log')])
+
+:func:`get_mcx_resources` gives the cost of each decomposition, so that
+:func:`get_cheapest_method` can pick one given a budget of ancillae, of
+depth and of wires that can be borrowed as dirty ancillae. The CCNOTs themselves can be lowered to Clifford+T linking
+:data:`ccnot`.
+"""
+import logging
+from math import ceil, log2
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from qat.external.utils.qroutines import resources
+from qat.lang.AQASM import AbstractGate
+from qat.lang.AQASM.gates import CCNOT, CNOT, H, T, X
+from qat.lang.AQASM.misc import build_gate
+from qat.lang.AQASM.routines import QRoutine
+
+LOGGER = logging.getLogger(__name__)
+
+# A gate as a tuple of wire indexes, the controls and then the target
+Op = Tuple[int, ...]
+
+
+def _apply_ops(qfun: QRoutine, wires, ops: Sequence[Op]):
+    for op in ops:
+        gate = (X, CNOT, CCNOT)[len(op) - 1]
+        qfun.apply(gate, *[wires[idx] for idx in op])
+
+
+def _get_dirty_ops(ctrls: Sequence[int], target: int,
+                   dirty: Sequence[int]) -> List[Op]:
+    """Barenco Lemma 7.2: C{k}X with k - 2 dirty ancillae, which are
+    restored. Fewer than 3 controls need no ancilla."""
+    nctrls = len(ctrls)
+    if nctrls < 3:
+        return [tuple(ctrls) + (target, )]
+    assert len(dirty) >= nctrls - 2
+    top = (ctrls[-1], dirty[nctrls - 3], target)
+    ladder = [(ctrls[i], dirty[i - 2], dirty[i - 1])
+              for i in range(nctrls - 2, 1, -1)]
+    base = (ctrls[0], ctrls[1], dirty[0])
+    flip = ladder + [base] + ladder[::-1]
+    return [top] + flip + [top] + flip
+
+
+def _get_dirty_count(nctrls: int) -> int:
+    return 4 * (nctrls - 2) if nctrls >= 3 else 1
+
+
+def _get_vchain_ops(nctrls: int) -> List[Op]:
+    """The wires are the controls, the target and the ancillae"""
+    ancs = list(range(nctrls + 1, 2 * nctrls - 1))
+    compute = [(0, 1, ancs[0])]
+    compute += [(i, ancs[i - 2], ancs[i - 1]) for i in range(2, nctrls - 1)]
+    return compute + [(nctrls - 1, ancs[-1], nctrls)] + compute[::-1]
+
+
+def _get_tree_ops(nctrls: int) -> List[Op]:
+    """Same wires of :func:`_get_vchain_ops`"""
+    ancs = iter(range(nctrls + 1, 2 * nctrls - 1))
+    level = list(range(nctrls))
+    compute = []
+    while len(level) > 2:
+        next_level = []
+        for i in range(0, len(level) - 1, 2):
+            anc = next(ancs)
+            compute.append((level[i], level[i + 1], anc))
+            next_level.append(anc)
+        if len(level) % 2:
+            next_level.append(level[-1])
+        level = next_level
+    return compute + [(level[0], level[1], nctrls)] + compute[::-1]
+
+
+def _get_one_ancilla_halves(nctrls: int) -> Tuple[int, int]:
+    """Controls of the two C{k}X of :func:`_get_one_ancilla_ops`"""
+    half = (nctrls + 1) // 2
+    return half, nctrls - half + 1
+
+
+def _get_one_ancilla_ops(nctrls: int) -> List[Op]:
+    """The wires are the controls, the target and the ancilla"""
+    half, _ = _get_one_ancilla_halves(nctrls)
+    first = list(range(half))
+    second = list(range(half, nctrls))
+    target = nctrls
+    anc = nctrls + 1
+    compute = _get_dirty_ops(first, anc, second + [target])
+    return compute + _get_dirty_ops(second + [anc], target, first) + compute
+
+
+def _build_with_ancillae(nctrls: int, n_ancillae: int,
+                         ops: Sequence[Op]) -> QRoutine:
+    qfun = QRoutine()
+    wires = list(qfun.new_wires(nctrls + 1))
+    if n_ancillae > 0:
+        ancs = qfun.new_wires(n_ancillae)
+        qfun.set_ancillae(ancs)
+        wires += list(ancs)
+    _apply_ops(qfun, wires, ops)
+    return qfun
+
+
+def _build_native(nctrls: int) -> QRoutine:
+    qfun = QRoutine()
+    wires = qfun.new_wires(nctrls + 1)
+    qfun.apply(X.ctrl(nctrls) if nctrls > 0 else X, *wires)
+    return qfun
+
+
+def _build_vchain(nctrls: int) -> QRoutine:
+    if nctrls < 3:
+        return _build_native(nctrls)
+    return _build_with_ancillae(nctrls, nctrls - 2, _get_vchain_ops(nctrls))
+
+
+def _build_log_depth(nctrls: int) -> QRoutine:
+    if nctrls < 3:
+        return _build_native(nctrls)
+    return _build_with_ancillae(nctrls, nctrls - 2, _get_tree_ops(nctrls))
+
+
+def _build_one_ancilla(nctrls: int) -> QRoutine:
+    if nctrls < 3:
+        return _build_native(nctrls)
+    return _build_with_ancillae(nctrls, 1, _get_one_ancilla_ops(nctrls))
+
+
+@build_gate("MCX_VCHAIN", [int])
+def mcx_vchain(nctrls: int) -> QRoutine:
+    """C{nctrls}X on the controls and then the target, with nctrls - 2 clean
+    ancillae."""
+    return _build_vchain(nctrls)
+
+
+@build_gate("MCX_LOG", [int])
+def mcx_log_depth(nctrls: int) -> QRoutine:
+    """Same as :func:`mcx_vchain`, but the ANDs of the controls are computed
+    by a balanced tree."""
+    return _build_log_depth(nctrls)
+
+
+@build_gate("MCX_DIRTY", [int])
+def mcx_dirty(nctrls: int) -> QRoutine:
+    """C{nctrls}X on the controls and then the target, borrowing the
+    max(nctrls - 2, 0) wires that follow: they can be in any state, and they
+    are restored."""
+    qfun = QRoutine()
+    ctrls = list(qfun.new_wires(nctrls)) if nctrls > 0 else []
+    target = qfun.new_wires(1)
+    dirty = list(qfun.new_wires(nctrls - 2)) if nctrls > 2 else []
+    wires = ctrls + [target] + dirty
+    _apply_ops(
+        qfun, wires,
+        _get_dirty_ops(list(range(nctrls)), nctrls,
+                       list(range(nctrls + 1, len(wires)))))
+    return qfun
+
+
+@build_gate("MCX_ONE_ANC", [int])
+def mcx_one_ancilla(nctrls: int) -> QRoutine:
+    """C{nctrls}X on the controls and then the target, with a single clean
+    ancilla, which receives the AND of the first half of the controls."""
+    return _build_one_ancilla(nctrls)
+
+
+def _get_native_resources(nctrls: int) -> Dict[str, Any]:
+    res = resources.new_resources(nctrls + 1)
+    return resources.add_gates(res, resources.get_gate_key(nctrls, "X"))
+
+
+def mcx_vchain_resources(nctrls: int) -> Dict[str, Any]:
+    """Resources required by :func:`mcx_vchain`, see
+    :mod:`~qat.external.utils.qroutines.resources`."""
+    if nctrls < 3:
+        return _get_native_resources(nctrls)
+    res = resources.new_resources(nctrls + 1, nctrls - 2)
+    return resources.add_gates(res, "CCNOT", 2 * nctrls - 3)
+
+
+def mcx_log_depth_resources(nctrls: int) -> Dict[str, Any]:
+    """Resources required by :func:`mcx_log_depth`"""
+    if nctrls < 3:
+        return _get_native_resources(nctrls)
+    res = resources.new_resources(nctrls + 1, nctrls - 2)
+    levels = ceil(log2(nctrls))
+    return resources.add_gates(res, "CCNOT", 2 * nctrls - 3, 2 * levels - 1)
+
+
+def mcx_dirty_resources(nctrls: int) -> Dict[str, Any]:
+    """Resources required by :func:`mcx_dirty`; the dirty wires are part of
+    the qubits."""
+    res = resources.new_resources(nctrls + 1 + max(nctrls - 2, 0))
+    return resources.add_gates(res, resources.get_gate_key(
+        min(nctrls, 2), "X"), _get_dirty_count(nctrls))
+
+
+def mcx_one_ancilla_resources(nctrls: int) -> Dict[str, Any]:
+    """Resources required by :func:`mcx_one_ancilla`"""
+    if nctrls < 3:
+        return _get_native_resources(nctrls)
+    res = resources.new_resources(nctrls + 1, 1)
+    first, second = _get_one_ancilla_halves(nctrls)
+    resources.add_routine(res, mcx_dirty_resources(first), 2)
+    resources.add_routine(res, mcx_dirty_resources(second))
+    res['ancillae'] = 1
+    return res
+
+
+# The generators of the implementations of MCX and their resources; the
+# linker needs plain QRoutines, not the gates built by build_gate
+METHODS = {
+    'native': (_build_native, _get_native_resources),
+    'vchain': (_build_vchain, mcx_vchain_resources),
+    'log': (_build_log_depth, mcx_log_depth_resources),
+    'one_ancilla': (_build_one_ancilla, mcx_one_ancilla_resources),
+}
+
+
+# C{k}X as an abstract gate: the controls and then the target
+MCX = AbstractGate("MCX", [int],
+                   arity=lambda nctrls: nctrls + 1,
+                   circuit_generator=_build_native)
+
+
+def get_mcx_gate(nctrls: int):
+    """X controlled by nctrls qubits; with more than 2 controls, the
+    abstract gate :data:`MCX`, whose lowering can be chosen with
+    :func:`get_link`."""
+    if nctrls < 3:
+        return X.ctrl(nctrls) if nctrls > 0 else X
+    return MCX(nctrls)
+
+
+def get_link(method: str) -> AbstractGate:
+    """The implementation of :data:`MCX` using one of the :data:`METHODS`,
+    to be passed to `to_circ(link=[...])`."""
+    build, _ = METHODS[method]
+    return AbstractGate("MCX", [int],
+                        arity=lambda nctrls: nctrls + 1,
+                        circuit_generator=build)
+
+
+def get_mcx_resources(nctrls: int, method: str) -> Dict[str, Any]:
+    """Resources required by :data:`MCX` lowered with the given method"""
+    _, get_resources = METHODS[method]
+    return get_resources(nctrls)
+
+
+def get_cheapest_method(nctrls: int,
+                        max_ancillae: Optional[int] = None,
+                        max_depth: Optional[int] = None,
+                        borrowable: int = 0) -> str:
+    """The decomposition into CCNOTs with the lowest T-count, then the lowest
+    depth, using at most max_ancillae clean ancillae and with depth at most
+    max_depth.
+
+    Besides the :data:`METHODS` but 'native', which is not a decomposition,
+    'dirty', i.e. :func:`mcx_dirty`, is a candidate if the caller can lend at
+    least nctrls - 2 borrowable wires, idle wires in any state: it needs no
+    clean ancilla. With fewer than 3 controls, 'native' is returned.
+
+    :raises ValueError: if no decomposition fits the budget
+
+    """
+    if nctrls < 3:
+        # Already a native gate
+        return 'native'
+    methods = {
+        method: get_resources
+        for method, (_, get_resources) in METHODS.items()
+        if method != 'native'
+    }
+    if borrowable >= nctrls - 2:
+        methods['dirty'] = mcx_dirty_resources
+    candidates = []
+    for method, get_resources in methods.items():
+        res = get_resources(nctrls)
+        if max_ancillae is not None and res['ancillae'] > max_ancillae:
+            continue
+        if max_depth is not None and res['depth'] > max_depth:
+            continue
+        candidates.append((res['t_count'], res['depth'], method))
+    if not candidates:
+        raise ValueError(f"No decomposition of C{nctrls}X with at most "
+                         f"{max_ancillae} ancillae, depth {max_depth} and "
+                         f"{borrowable} borrowable wires")
+    return min(candidates)[2]
+
+
+def _build_ccnot() -> QRoutine:
+    """The Clifford+T decomposition of the CCNOT, with 7 T gates"""
+    qfun = QRoutine()
+    a_q, b_q, t_q = qfun.new_wires(3)
+    qfun.apply(H, t_q)
+    qfun.apply(CNOT, b_q, t_q)
+    qfun.apply(T.dag(), t_q)
+    qfun.apply(CNOT, a_q, t_q)
+    qfun.apply(T, t_q)
+    qfun.apply(CNOT, b_q, t_q)
+    qfun.apply(T.dag(), t_q)
+    qfun.apply(CNOT, a_q, t_q)
+    qfun.apply(T, b_q)
+    qfun.apply(T, t_q)
+    qfun.apply(H, t_q)
+    qfun.apply(CNOT, a_q, b_q)
+    qfun.apply(T, a_q)
+    qfun.apply(T.dag(), b_q)
+    qfun.apply(CNOT, a_q, b_q)
+    return qfun
+
+
+# Links lowering the CCNOTs to Clifford+T and the wide X gates to CCNOTs
+ccnot = AbstractGate("CCNOT", [], arity=3, circuit_generator=_build_ccnot)
+x = get_link('vchain')
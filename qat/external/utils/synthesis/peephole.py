@@ -0,0 +1,216 @@
+"""
+Peephole optimisation of built circuits.
+
+The routines of this package are composed from self-contained blocks, which
+often leave redundant pairs at their boundaries: f.e.
+:func:`~qat.external.utils.qroutines.adder.comparator` flips the a qubits
+before and after its core, and an initialisation may flip the same qubits
+right before. Once the circuit is flattened, each gate is compared with the
+previous ones acting on its qubits, moving backwards as long as the gates
+commute:
+
+#. a gate followed by its inverse, f.e. two X, two equal CCNOTs or a T and
+   a T dagger, is removed, so that two fans of CNOTs with the same control
+   merge into the CNOTs on the targets of only one of them;
+#. two rotations around the same axis, on the same qubits, are merged into
+   one, which is removed if its angle is 0.
+
+Two gates commute if they act on different qubits, if they are both
+(controlled) X and none of them controls the target of the other one, so an
+X moves through the gates targeting its qubit, or if they are both diagonal.
+A diagonal gate also commutes with a (controlled) X not targeting its
+qubits.
+
+The gates are the :class:`~qat.external.utils.simulation.reversible.Op`
+returned by :func:`~qat.external.utils.simulation.reversible.get_ops`; the
+result can be used as is, f.e. by the simulators, or turned back into a
+circuit by :func:`optimize_circuit`.
+"""
+import heapq
+import logging
+from collections import Counter
+from typing import TYPE_CHECKING, List, Sequence, Tuple
+
+from qat.external.utils.qroutines import resources
+from qat.external.utils.simulation import reversible
+from qat.lang.AQASM import Program
+from qat.lang.AQASM import gates as qat_gates
+
+if TYPE_CHECKING:
+    from qat.core import Circuit
+
+LOGGER = logging.getLogger(__name__)
+
+# Gates equal to their inverse, whatever their controls
+_SELF_INVERSE = {"I", "X", "Y", "Z", "H", "SWAP"}
+# Gates whose inverse is their dagger
+_DAGGER_PAIRS = {"S", "T"}
+_ROTATIONS = {"RX", "RY", "RZ", "PH"}
+_DIAGONAL = {"I", "Z", "S", "T", "D-S", "D-T", "RZ", "PH"}
+_GATES = {
+    name: getattr(qat_gates, name)
+    for name in ("I", "X", "Y", "Z", "H", "S", "T", "SWAP", "ISWAP",
+                 "SQRTSWAP", "RX", "RY", "RZ", "PH")
+}
+_ANGLE_EPS = 1e-12
+# Instructions of a circuit that are not gates
+_NOT_GATES = {"MEASURE", "RESET", "BREAK", "LOGIC", "REMAP"}
+
+
+def _get_key(op: reversible.Op) -> str:
+    return resources.get_gate_key(len(op.ctrls), op.name)
+
+
+def _same_wires(op_1: reversible.Op, op_2: reversible.Op) -> bool:
+    if set(op_1.ctrls) != set(op_2.ctrls):
+        return False
+    if op_1.name == "SWAP":
+        return set(op_1.targets) == set(op_2.targets)
+    return op_1.targets == op_2.targets
+
+
+def _is_inverse(op_1: reversible.Op, op_2: reversible.Op) -> bool:
+    if not _same_wires(op_1, op_2):
+        return False
+    if op_1.name == op_2.name and op_1.name in _SELF_INVERSE:
+        return True
+    return ("D-" + op_1.name == op_2.name and op_1.name in _DAGGER_PAIRS) or (
+        "D-" + op_2.name == op_1.name and op_2.name in _DAGGER_PAIRS)
+
+
+def _is_mergeable(op_1: reversible.Op, op_2: reversible.Op) -> bool:
+    return (op_1.name == op_2.name and op_1.name in _ROTATIONS
+            and _same_wires(op_1, op_2))
+
+
+def _commute_x(x_op: reversible.Op, op: reversible.Op) -> bool:
+    """Whether x_op, a (controlled) X, commutes with op"""
+    target = x_op.targets[0]
+    if op.name == "X":
+        return target not in op.ctrls and op.targets[0] not in x_op.ctrls
+    if op.name in _DIAGONAL:
+        return target not in op.ctrls + op.targets
+    return False
+
+
+def commute(op_1: reversible.Op, op_2: reversible.Op) -> bool:
+    """Whether the two gates commute, with the rules of this module"""
+    if not set(op_1.ctrls + op_1.targets) & set(op_2.ctrls + op_2.targets):
+        return True
+    if op_1.name == "X":
+        return _commute_x(op_1, op_2)
+    if op_2.name == "X":
+        return _commute_x(op_2, op_1)
+    return op_1.name in _DIAGONAL and op_2.name in _DIAGONAL
+
+
+def optimize_ops(ops: Sequence[reversible.Op],
+                 window: int = 256) -> Tuple[List[reversible.Op], Counter]:
+    """Cancel the inverse pairs and merge the rotations of a list of gates.
+    Each gate is compared with at most window previous gates sharing some of
+    its qubits.
+
+    :returns: the optimised gates and the number of removed ones, with the
+    keys of :func:`~qat.external.utils.qroutines.resources.get_gate_key`; a
+    merge of two rotations counts as a removed one.
+
+    """
+    out: List[reversible.Op] = []
+    alive: List[bool] = []
+    # Indexes, in out, of the gates acting on each qubit
+    history = {}
+    removed: Counter = Counter()
+    for op in ops:
+        qubits = op.ctrls + op.targets
+        previous = heapq.merge(*(reversed(history.get(qb, []))
+                                 for qb in qubits),
+                               reverse=True)
+        last_idx = None
+        done = False
+        for steps, idx in enumerate(previous):
+            if steps >= window:
+                break
+            if idx == last_idx or not alive[idx]:
+                continue
+            last_idx = idx
+            prev = out[idx]
+            if _is_inverse(prev, op):
+                alive[idx] = False
+                removed[_get_key(prev)] += 1
+                removed[_get_key(op)] += 1
+                done = True
+                break
+            if _is_mergeable(prev, op):
+                angle = prev.params[0] + op.params[0]
+                removed[_get_key(op)] += 1
+                if abs(angle) < _ANGLE_EPS:
+                    alive[idx] = False
+                    removed[_get_key(prev)] += 1
+                else:
+                    out[idx] = prev._replace(params=(angle, ))
+                done = True
+                break
+            if not commute(prev, op):
+                break
+        if done:
+            continue
+        for qb in qubits:
+            history.setdefault(qb, []).append(len(out))
+        out.append(op)
+        alive.append(True)
+    optimized = [op for op, is_alive in zip(out, alive) if is_alive]
+    LOGGER.debug("removed %d gates out of %d", len(ops) - len(optimized),
+                 len(ops))
+    return optimized, removed
+
+
+def _get_gate(op: reversible.Op):
+    name = op.name
+    dagger = name.startswith("D-")
+    if dagger:
+        name = name[2:]
+    if name not in _GATES:
+        raise ValueError(f"Gate {op.name} is not supported")
+    gate = _GATES[name]
+    if op.params:
+        gate = gate(*op.params)
+    if dagger:
+        gate = gate.dag()
+    if op.ctrls:
+        gate = gate.ctrl(len(op.ctrls))
+    return gate
+
+
+def ops_to_circ(ops: Sequence[reversible.Op], nbqbits: int) -> 'Circuit':
+    """The circuit on nbqbits qubits applying the gates"""
+    program = Program()
+    qbits = program.qalloc(nbqbits)
+    for op in ops:
+        program.apply(_get_gate(op), *[qbits[qb] for qb in op.ctrls],
+                      *[qbits[qb] for qb in op.targets])
+    return program.to_circ()
+
+
+def optimize_circuit(circuit: 'Circuit',
+                     window: int = 256) -> Tuple['Circuit', Counter]:
+    """Same as :func:`optimize_ops` on the gates of the circuit, returned as
+    a new circuit on the same qubits. The ancillae of the circuit are plain
+    qubits of the new one.
+
+    :raises ValueError: if the circuit contains measures or other
+    instructions that are not gates
+
+    """
+    for name, _, qbits in circuit.iterate_simple():
+        if name in _NOT_GATES:
+            raise ValueError(f"{name} on {qbits} is not supported")
+    ops, removed = optimize_ops(reversible.get_ops(circuit), window)
+    return ops_to_circ(ops, circuit.nbqbits), removed
+
+
+def optimize_routine(routine, window: int = 256,
+                     **circ_args) -> Tuple['Circuit', Counter]:
+    """Same as :func:`optimize_circuit` on the circuit of the routine, built
+    by :func:`~qat.external.utils.simulation.reversible.routine_to_circ`"""
+    return optimize_circuit(reversible.routine_to_circ(routine, **circ_args),
+                            window)
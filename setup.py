@@ -8,7 +8,7 @@ install_requirements = [
     "qat-core",
     "qat-lang",
     "typing",
-    "numpy>=1.15",
+    "numpy>=1.17",
 ]
 
 tests_requirements = [
@@ -3,6 +3,8 @@ from test.common import BasicTestCase
 from typing import TYPE_CHECKING, Union
 
 from qat.core.console import display
+from qat.external.utils.qroutines import resources
+from qat.external.utils.simulation import reversible
 
 if TYPE_CHECKING:
     from qat.lang.AQASM import Program
@@ -61,6 +63,31 @@ class CircuitTestCase(BasicTestCase):
         # print("simulation over")
         return res
 
+    @classmethod
+    def simulate_program_reversible(cls, program, circ_args={}, bits=None):
+        """Compute the output basis state of a program made only of reversible
+        gates, without using the qpu. It returns one int per qubit."""
+        cr = program.to_circ(**circ_args)
+        return reversible.simulate_circuit(cr, bits)
+
+    def assertResources(self, routine, estimated, ancillae_bound=False):
+        """Compare the resources estimated for a routine with the ones of its
+        circuit; the depth is an upper bound, and so are the ancillae if
+        ancillae_bound."""
+        circ = reversible.routine_to_circ(routine)
+        actual = resources.get_circuit_resources(circ, estimated['qubits'])
+        self.assertEqual(reversible.get_routine_arity(routine),
+                         estimated['qubits'])
+        if ancillae_bound:
+            self.assertLessEqual(circ.nbqbits,
+                                 estimated['qubits'] + estimated['ancillae'])
+        else:
+            self.assertEqual(circ.nbqbits,
+                             estimated['qubits'] + estimated['ancillae'])
+        self.assertEqual(dict(actual['gates']), dict(estimated['gates']))
+        self.assertEqual(actual['t_count'], estimated['t_count'])
+        self.assertGreaterEqual(estimated['depth'], actual['depth'])
+
     @staticmethod
     def draw_program(program: 'Program', circ_kwargs={}, display_kwargs={}):
         cr = program.to_circ(**circ_kwargs)
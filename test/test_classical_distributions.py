@@ -0,0 +1,101 @@
+import unittest
+from collections import Counter
+from math import comb
+
+import numpy as np
+from parameterized import parameterized
+from qat.external.utils.classical import distributions, isd
+from qat.external.utils.qroutines.hamming_weight_generate import bartschi
+from qat.external.utils.qroutines.linalg import matrix as qmatrix
+from qat.external.utils.simulation import reversible, sparse
+from qat.lang.AQASM import H, Program
+
+
+def _get_move_columns_end(nrows, ncols, matrix):
+    """The circuit moving the columns and its input bits"""
+    data = qmatrix.move_columns_end_data(nrows, ncols)
+    circ = reversible.routine_to_circ(qmatrix.move_columns_end_gate(data))
+    bits = [int(bit) for bit in np.asarray(matrix).flatten()]
+    return circ, bits
+
+
+class DistributionsTestCase(unittest.TestCase):
+    def test_dicke_support(self):
+        chunks = list(distributions.get_dicke_support(9, 4, 50))
+        self.assertEqual([len(chunk) for chunk in chunks], [50, 50, 26])
+        support = np.concatenate(chunks)
+        np.testing.assert_array_equal(support.sum(axis=1), 4)
+        self.assertEqual(len(np.unique(support, axis=0)), comb(9, 4))
+        self.assertEqual([len(chunk) for chunk in
+                          distributions.get_dicke_support(5, 0)], [1])
+
+    @parameterized.expand([
+        ('linear', True),
+        ('linear', False),
+        ('log', False),
+    ])
+    def test_dicke_probabilities(self, method, little_endian):
+        n, k = 9, 4
+        state = sparse.simulate_circuit(
+            reversible.routine_to_circ(bartschi.get_dicke(n, k, method)))
+        expected = state.get_probabilities(range(n), little_endian)
+        probs = distributions.get_dicke_probabilities(n, k, little_endian)
+        self.assertEqual(probs.keys(), expected.keys())
+        for value, prob in expected.items():
+            self.assertAlmostEqual(probs[value], prob)
+
+    def test_same_as_sparse(self):
+        nrows, ncols, k = 2, 8, 3
+        matrix = np.random.default_rng(3).integers(0, 2, (nrows, ncols))
+        circ, bits = _get_move_columns_end(nrows, ncols, matrix)
+        dicke_qubits = range(nrows * ncols, (nrows + 1) * ncols)
+
+        program = Program()
+        qbits = program.qalloc(circ.nbqbits)
+        program.apply(bartschi.generate(ncols, k),
+                      [qbits[qb] for qb in dicke_qubits])
+        state = sparse.simulate_circuit(program.to_circ() + circ, bits)
+        expected = state.get_probabilities(range(nrows * ncols), False)
+
+        probs = distributions.get_probabilities(circ, dicke_qubits, k,
+                                                range(nrows * ncols), False,
+                                                bits)
+        self.assertEqual(probs.keys(), expected.keys())
+        for value, prob in expected.items():
+            self.assertAlmostEqual(probs[value], prob)
+
+    def test_move_columns_end(self):
+        """Hundreds of qubits, with the columns permutations given by the
+        classical simulation of the sorting network"""
+        nrows, ncols, k = 2, 32, 3
+        matrix = np.random.default_rng(5).integers(0, 2, (nrows, ncols))
+        circ, bits = _get_move_columns_end(nrows, ncols, matrix)
+        self.assertGreater(circ.nbqbits, 200)
+        counts = distributions.get_counts(circ,
+                                          range(nrows * ncols,
+                                                (nrows + 1) * ncols),
+                                          k,
+                                          range(nrows * ncols),
+                                          False,
+                                          bits,
+                                          chunk_size=1000)
+        self.assertEqual(sum(counts.values()), comb(ncols, k))
+
+        expected = Counter()
+        weights = 1 << np.arange(nrows * ncols - 1, -1, -1, dtype=object)
+        for support in distributions.get_dicke_support(ncols, k):
+            for selection in support:
+                perm = isd.get_columns_permutation(selection)
+                expected[int(matrix[:, perm].flatten() @ weights)] += 1
+        self.assertEqual(counts, expected)
+
+    def test_errors(self):
+        program = Program()
+        qbits = program.qalloc(2)
+        program.apply(H, qbits[0])
+        with self.assertRaises(ValueError):
+            distributions.get_counts(program.to_circ(), [0, 1], 1, [0, 1],
+                                     False)
+        circ = reversible.routine_to_circ(bartschi.generate(70, 0))
+        with self.assertRaises(ValueError):
+            distributions.get_counts(circ, [0], 1, range(70), False)
@@ -0,0 +1,81 @@
+import unittest
+
+import numpy as np
+from parameterized import parameterized
+from qat.external.utils.classical import gf2
+from qat.external.utils.qroutines.linalg import rref
+from qat.external.utils.simulation import reversible
+
+
+def _rref_reference(matrix):
+    """Textbook Gaussian elimination, one row at a time"""
+    matrix = np.array(matrix, dtype=np.uint8)
+    pivots = []
+    for col in range(matrix.shape[1]):
+        row = len(pivots)
+        if row == matrix.shape[0]:
+            break
+        candidates = np.flatnonzero(matrix[row:, col])
+        if not len(candidates):
+            continue
+        found = row + candidates[0]
+        matrix[[row, found]] = matrix[[found, row]]
+        for other in range(matrix.shape[0]):
+            if other != row and matrix[other, col]:
+                matrix[other] ^= matrix[row]
+        pivots.append(col)
+    return matrix, pivots
+
+
+class GF2TestCase(unittest.TestCase):
+    def test_pack_unpack(self):
+        rng = np.random.default_rng(0)
+        matrices = rng.integers(0, 2, (3, 4, 130))
+        packed = gf2.pack(matrices)
+        self.assertEqual(packed.shape, (3, 4, 3))
+        np.testing.assert_array_equal(gf2.unpack(packed, 130), matrices)
+        np.testing.assert_array_equal(gf2.get_column(packed, 129),
+                                      matrices[..., 129])
+        np.testing.assert_array_equal(gf2.get_weights(packed),
+                                      matrices.sum(axis=-1))
+
+    @parameterized.expand([
+        ("square", (5, 5), 8),
+        ("wide", (20, 70), 8),
+        ("tall", (70, 20), 3),
+        ("one_per_block", (30, 90), 1),
+        ("several_words", (100, 300), 8),
+    ])
+    def test_rref(self, name, shape, k):
+        rng = np.random.default_rng(shape[0] * shape[1])
+        for _ in range(5):
+            # Sparse, so that some columns have no pivot
+            matrix = (rng.random(shape) < 0.2).astype(np.uint8)
+            reduced, pivots = gf2.rref(matrix, k)
+            expected, expected_pivots = _rref_reference(matrix)
+            np.testing.assert_array_equal(reduced, expected)
+            self.assertEqual(pivots, expected_pivots)
+            self.assertEqual(gf2.rank(matrix), len(pivots))
+
+    @parameterized.expand([(3, 3), (3, 5), (4, 6), (5, 5)])
+    def test_rref_diagonal(self, nrows, ncols):
+        """Same matrix and ancillae of the quantum RREF"""
+        swap_n, add_n = rref.get_required_ancillae(nrows, ncols)
+        size = nrows * ncols
+        circ = reversible.routine_to_circ(rref.get_rref(nrows, ncols))
+        rng = np.random.default_rng(size)
+        matrices = rng.integers(0, 2, (30, nrows, ncols))
+        reduced, swaps, adds = gf2.get_rref_diagonal(matrices)
+        for matrix, mat_reduced, mat_swaps, mat_adds in zip(
+                matrices, reduced, swaps, adds):
+            res = reversible.simulate_circuit(
+                circ,
+                list(matrix.ravel()) + [0] * (circ.nbqbits - size))
+            self.assertEqual(list(mat_reduced.ravel()), res[:size])
+            self.assertEqual(list(mat_swaps), res[size:size + swap_n])
+            self.assertEqual(list(mat_adds),
+                             res[size + swap_n:size + swap_n + add_n])
+            # Same as the RREF if the left block is invertible
+            if gf2.rank(matrix[:, :nrows]) == nrows:
+                np.testing.assert_array_equal(mat_reduced,
+                                              gf2.rref(matrix)[0])
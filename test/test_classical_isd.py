@@ -0,0 +1,62 @@
+import unittest
+
+import numpy as np
+from parameterized import parameterized
+from qat.external.utils.classical import isd
+from qat.external.utils.qroutines.linalg import matrix as qmatrix
+from qat.external.utils.simulation import reversible
+
+
+class ISDTestCase(unittest.TestCase):
+    @parameterized.expand([('bitonic', [0, 2, 5]), ('oddeven', [1, 4]),
+                           ('oddeven', [])])
+    def test_columns_permutation(self, network, selected):
+        """Same columns order of move_columns_end_gate"""
+        ncols = 6
+        nrows = 3
+        data = qmatrix.move_columns_end_data(nrows, ncols, network)
+        n_cols = data['n_cols']
+        # Each column holds its index, the padding ones are selected
+        matrix = [[col >> b & 1 for col in range(n_cols)]
+                  for b in range(nrows)]
+        comb = [int(col in selected or col >= ncols) for col in range(n_cols)]
+        res = reversible.simulate_circuit(
+            reversible.routine_to_circ(qmatrix.move_columns_end_gate(data)),
+            sum(matrix, []) + comb + [0] * data['n_comps'])
+        moved = [
+            sum(res[b * n_cols + col] << b for b in range(nrows))
+            for col in range(n_cols)
+        ]
+        selection = [int(col in selected) for col in range(ncols)]
+        perm = isd.get_columns_permutation(selection, network)
+        self.assertEqual(list(perm), [col for col in moved if col < ncols])
+        self.assertEqual(sorted(perm[ncols - len(selected):]), selected)
+
+    @parameterized.expand([
+        ("prange", 60, 30, 5, 0),
+        ("lee_brickell", 60, 30, 6, 2),
+        ("lee_brickell_large", 400, 200, 6, 1),
+    ])
+    def test_isd(self, name, ncols, nrows, weight, p):
+        rng = np.random.default_rng(ncols)
+        h = rng.integers(0, 2, (nrows, ncols))
+        error = np.zeros(ncols, dtype=np.uint8)
+        error[rng.choice(ncols, weight, replace=False)] = 1
+        syndrome = h @ error % 2
+        res = isd.isd(h, syndrome, weight, p, max_iterations=2000, seed=0)
+        self.assertIsNotNone(res.error)
+        self.assertEqual(res.error.sum(), weight)
+        np.testing.assert_array_equal(h @ res.error % 2, syndrome)
+        self.assertLessEqual(res.iterations, 2000)
+
+    def test_not_found(self):
+        h = np.eye(4, 8, dtype=np.uint8)
+        # Weight 1 syndrome, but an error of weight 0 is asked
+        res = isd.prange(h, [1, 0, 0, 0], 0, max_iterations=5, seed=0)
+        self.assertIsNone(res.error)
+        self.assertEqual(res.iterations, 5)
+
+    def test_success_probability(self):
+        self.assertEqual(isd.get_success_probability(4, 8, 2), 6 / 28)
+        self.assertEqual(isd.get_success_probability(4, 8, 2, 1), 16 / 28)
+        self.assertEqual(isd.get_success_probability(4, 8, 6, 1), 0)
@@ -613,3 +613,68 @@ class AdderTestCase(CircuitTestCase):
             # myQLM
             state = res[0].state
             self.assertEqual(state.state, expected)
+
+    @parameterized.expand([
+        (0, 5),
+        (3, 2),
+        (9, 7),
+        (15, 1),
+        (24, 7),
+    ])
+    def test_adder_const(self, a_int, const):
+        """Add the constant const to a_int, without a register holding it"""
+        bits = misc.get_required_bits(a_int, const)
+        for little_endian in (True, False):
+            with self.subTest(little_endian=little_endian):
+                self._prepare_adder_circuit(bits, 0, True)
+                qfun = qregs.initialize_qureg_given_int(
+                    a_int, len(self.a), little_endian)
+                self.qc.apply(qfun, self.a)
+                qfun = adder.adder_const(bits, const, True, little_endian)
+                self.qc.apply(qfun, self.a, self.cout)
+
+                to_measure_qbits = [qbit.index for qbit in self.a]
+                if little_endian:
+                    to_measure_qbits = [self.cout[0].index
+                                        ] + to_measure_qbits[::-1]
+                else:
+                    to_measure_qbits = [self.cout[0].index] + to_measure_qbits
+                res = self.qpu.submit(
+                    self.qc.to_circ().to_job(qubits=to_measure_qbits))
+                self.assertEqual(len(res), 1)
+                self.assertEqual(res[0].state.int, a_int + const)
+
+    @parameterized.expand([
+        (1, 2),
+        (4, 4),
+        (6, 4),
+        (7, 9),
+        (9, 9),
+    ])
+    def test_a_smaller_than_const(self, a_int, const):
+        bits = misc.get_required_bits(a_int, const)
+        for little_endian in (True, False):
+            with self.subTest(little_endian=little_endian):
+                self._prepare_adder_circuit(bits, 0, True)
+                qfun = qregs.initialize_qureg_given_int(
+                    a_int, len(self.a), little_endian)
+                self.qc.apply(qfun, self.a)
+                qfun = adder.comparator_const(bits, const, little_endian)
+                self.qc.apply(qfun, self.a, self.cout)
+
+                res = self.qpu.submit(
+                    self.qc.to_circ().to_job(qubits=[self.cout]))
+                self.assertEqual(len(res), 1)
+                self.assertEqual(res[0].state.int, int(a_int < const))
+
+    def test_shared_definitions(self):
+        """The MAJ and UMA gates have a single definition, whatever the size"""
+        n_definitions = []
+        for bits in (4, 32):
+            self._prepare_adder_circuit(bits, bits, True)
+            self.qc.apply(adder.adder(bits, bits, True, True), self.a, self.b,
+                          self.cout)
+            circ = self.qc.to_circ()
+            n_definitions.append(
+                len([name for name in circ.gateDic if name.startswith("_")]))
+        self.assertEqual(n_definitions[0], n_definitions[1])
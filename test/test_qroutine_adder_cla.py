@@ -0,0 +1,139 @@
+import itertools
+from test.common_circuit import CircuitTestCase
+
+import numpy as np
+from parameterized import parameterized
+from qat.external.utils.qroutines import adder, adder_cla, resources
+from qat.external.utils.qroutines.hamming_weight_compute import fpc
+from qat.external.utils.simulation import bitsliced, reversible
+
+
+class AdderCLATestCase(CircuitTestCase):
+    def _run(self, routine, a_l, b_l, little_endian):
+        """Run routine on all the pairs (a, b), returns a, b and the planes"""
+        circ = reversible.routine_to_circ(routine)
+        a, b = np.meshgrid(np.arange(2**a_l, dtype=np.uint64),
+                           np.arange(2**b_l, dtype=np.uint64))
+        a, b = a.ravel(), b.ravel()
+        planes = bitsliced.simulate_circuit(
+            circ, {
+                tuple(range(a_l)): a,
+                tuple(range(a_l, a_l + b_l)): b
+            }, little_endian)
+        # The ancillae are restored
+        np.testing.assert_array_equal(
+            bitsliced.get_ints(planes, range(a_l + b_l + 1, circ.nbqbits),
+                               len(a), True), 0)
+        return a, b, planes
+
+    def _get(self, planes, qubits, little_endian, size):
+        return bitsliced.get_ints(planes, qubits, size, little_endian)
+
+    @parameterized.expand(
+        [(a_l, b_l) for b_l in range(1, 7) for a_l in range(1, b_l + 1)])
+    def test_adder(self, a_l, b_l):
+        for little_endian, overflow in itertools.product((True, False),
+                                                         (True, False)):
+            with self.subTest(little_endian=little_endian, overflow=overflow):
+                a, b, planes = self._run(
+                    adder_cla.adder(a_l, b_l, overflow, little_endian), a_l,
+                    b_l, little_endian)
+                np.testing.assert_array_equal(
+                    self._get(planes, range(a_l), little_endian, len(a)), a)
+                total = a + b
+                if not overflow:
+                    total %= np.uint64(2**b_l)
+                out_qubits = list(range(a_l, a_l + b_l))
+                if overflow:
+                    # The carry out is the most significant bit
+                    out_qubits = (out_qubits + [a_l + b_l] if little_endian
+                                  else [a_l + b_l] + out_qubits)
+                np.testing.assert_array_equal(
+                    self._get(planes, out_qubits, little_endian, len(a)),
+                    total)
+
+    @parameterized.expand([(a_l, b_l) for a_l in range(1, 6)
+                           for b_l in range(1, 6)])
+    def test_comparator(self, a_l, b_l):
+        for little_endian in (True, False):
+            with self.subTest(little_endian=little_endian):
+                a, b, planes = self._run(
+                    adder_cla.comparator(a_l, b_l, little_endian), a_l, b_l,
+                    little_endian)
+                np.testing.assert_array_equal(
+                    self._get(planes, range(a_l), little_endian, len(a)), a)
+                np.testing.assert_array_equal(
+                    self._get(planes, range(a_l, a_l + b_l), little_endian,
+                              len(a)), b)
+                np.testing.assert_array_equal(
+                    self._get(planes, [a_l + b_l], True, len(a)),
+                    (a < b).astype(np.uint64))
+
+    @parameterized.expand([(n, ) for n in range(1, 7)])
+    def test_subtractor(self, n):
+        """Same results as the ripple subtractor"""
+        for overflow in (True, False):
+            with self.subTest(overflow=overflow):
+                _, _, planes = self._run(
+                    adder_cla.subtractor(n, n, overflow, True), n, n, True)
+                _, _, expected = self._run(
+                    adder.subtractor(n, n, overflow, True), n, n, True)
+                size = 2**(2 * n)
+                qubits = range(2 * n + int(overflow))
+                np.testing.assert_array_equal(
+                    self._get(planes, qubits, True, size),
+                    self._get(expected, qubits, True, size))
+
+    def test_a_longer_than_b(self):
+        with self.assertRaises(ValueError):
+            reversible.routine_to_circ(adder_cla.adder(3, 2, False, True))
+
+    @parameterized.expand([(n, ) for n in (8, 16, 32)])
+    def test_depth(self, n):
+        cla = adder_cla.get_adder_resources(n, n, True)
+        ripple = adder.get_adder_resources(n, n, True)
+        self.assertLess(cla['depth'], ripple['depth'])
+        circ = reversible.routine_to_circ(adder_cla.adder(n, n, True, True))
+        self.assertLessEqual(resources.get_circuit_depth(circ), cla['depth'])
+
+    def test_resources(self):
+        for a_l, b_l, overflow in itertools.product(range(1, 6), range(1, 6),
+                                                    (True, False)):
+            circ_args = (a_l, b_l, overflow, True)
+            if a_l <= b_l:
+                with self.subTest(a_l=a_l, b_l=b_l, overflow=overflow):
+                    self.assertResources(
+                        adder_cla.adder(*circ_args),
+                        adder_cla.get_adder_resources(a_l, b_l, overflow),
+                        True)
+                    self.assertResources(
+                        adder_cla.subtractor(*circ_args),
+                        adder_cla.get_subtractor_resources(
+                            a_l, b_l, overflow), True)
+            with self.subTest(a_l=a_l, b_l=b_l):
+                self.assertResources(
+                    adder_cla.comparator(a_l, b_l, True),
+                    adder_cla.get_comparator_resources(a_l, b_l), True)
+
+    def test_fpc(self):
+        n = 8
+        pattern = fpc.get_qroutine_for_qubits_weight_get_pattern(n, 'cla')
+        routine = fpc.get_qroutine_for_qubits_weight(pattern['n_lines'],
+                                                     pattern['n_couts'],
+                                                     pattern)
+        circ = reversible.routine_to_circ(routine)
+        values = np.arange(2**n, dtype=np.uint64)
+        planes = bitsliced.simulate_circuit(circ, {tuple(range(n)): values},
+                                            True)
+        results = fpc.get_to_measure_qubits(
+            tuple(range(n)), list(range(n, n + pattern['n_couts'])), pattern)
+        weights = np.array([bin(i).count("1") for i in range(2**n)],
+                           dtype=np.uint64)
+        np.testing.assert_array_equal(
+            bitsliced.get_ints(planes, results, len(values), True), weights)
+        self.assertResources(
+            routine, fpc.get_qroutine_for_qubits_weight_resources(pattern))
+
+    def test_unknown_adder(self):
+        with self.assertRaises(ValueError):
+            fpc.get_qroutine_for_qubits_weight_get_pattern(8, 'kogge')
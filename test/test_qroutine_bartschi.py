@@ -17,11 +17,11 @@ class BartschiTestCase(CircuitTestCase):
         bartschi_logger.setLevel(cls.logger.level)
         bartschi_logger.handlers = cls.logger.handlers
 
-    def _generate_program(self, n, k):
+    def _generate_program(self, n, k, method='linear'):
         self.pr = Program()
         qr = self.pr.qalloc(n)
         # pr.apply(dicke_scs(nbqbits), qr)
-        self.pr.apply(bartschi.generate(n, k), qr)
+        self.pr.apply(bartschi.get_dicke(n, k, method), qr)
 
     def _analyse_res_extensive(self, n, k):
         circ = self.pr.to_circ()
@@ -65,6 +65,34 @@ class BartschiTestCase(CircuitTestCase):
                 state = res[0].state.state
                 self.assertEqual(state, 0)
 
+    def test_small_log_depth(self):
+        for (n, k) in itertools.product(range(2, 10), range(1, 8)):
+            if k >= n:
+                continue
+            with self.subTest(n=n, k=k):
+                self._generate_program(n, k, 'log')
+                self._analyse_res_extensive(n, k)
+
+    def test_small_log_depth_dagger(self):
+        for (n, k) in itertools.product(range(4, 10), range(1, 4)):
+            with self.subTest(n=n, k=k):
+                self._generate_program(n, k, 'log')
+                self.pr.apply(
+                    bartschi.generate_log_depth(n, k).dag(),
+                    self.pr.registers[0])
+                res = self.qpu.submit(self.pr.to_circ().to_job())
+                self.assertEqual(len(res), 1)
+                self.assertEqual(res[0].state.state, 0)
+
+    def test_log_depth_shallower(self):
+        for n, k in [(32, 2), (64, 4)]:
+            with self.subTest(n=n, k=k):
+                depths = [
+                    bartschi.get_dicke_resources(n, k, method)['depth']
+                    for method in ('linear', 'log')
+                ]
+                self.assertLess(2 * depths[1], depths[0])
+
     # TODO quite useless, just bigger
     @unittest.skipUnless(CircuitTestCase.SLOW_TEST_ON,
                          CircuitTestCase.SLOW_TEST_ON_REASON)
@@ -0,0 +1,120 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+from parameterized import parameterized
+
+from qat.external.utils.qroutines import cache
+from qat.external.utils.qroutines import sorting_network as sn
+from qat.external.utils.qroutines.hamming_weight_compute import fpc
+from qat.external.utils.qroutines.linalg import matrix, rref
+from qat.external.utils.simulation import bitsliced
+
+
+class CacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self._cache_dir = cache.get_cache_dir()
+        cache.set_cache_dir(None)
+        cache.clear()
+
+    def tearDown(self):
+        cache.set_cache_dir(self._cache_dir)
+        cache.clear()
+
+    def test_lru_eviction(self):
+        lru = cache.LRUCache(2)
+        lru.put('a', 1)
+        lru.put('b', 2)
+        self.assertEqual(lru.get('a'), 1)
+        lru.put('c', 3)
+        # b is the least recently used
+        self.assertNotIn('b', lru)
+        self.assertEqual(len(lru), 2)
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual((lru.hits, lru.misses), (1, 1))
+        with self.assertRaises(ValueError):
+            cache.LRUCache(0)
+
+    @parameterized.expand([
+        ("sorter", sn.get_pattern_sorter, (8, ), (8, 'bitonic')),
+        ("fpc", fpc.get_qroutine_for_qubits_weight_get_pattern, (8, ),
+         (8, 'ripple')),
+        ("matrix", matrix.move_columns_end_data, (3, 6), (3, 6, 'bitonic')),
+    ])
+    def test_memoize(self, name, get_pattern, args, full_args):
+        pattern = get_pattern(*args)
+        self.assertIs(get_pattern(*args), pattern)
+        self.assertIs(get_pattern(*full_args), pattern)
+        self.assertEqual(get_pattern.uncached(*args), pattern)
+        self.assertIsNot(get_pattern(*args[:-1], args[-1] + 1), pattern)
+
+    def test_disk(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache.set_cache_dir(tmp_dir)
+            pattern = sn.get_pattern_sorter(16, 'oddeven')
+            circ = cache.get_circuit(rref.get_row_addition, 3, 4, 1)
+            # Only the two entries, no temporary file left behind
+            fnames = sorted(os.listdir(tmp_dir))
+            self.assertEqual(len(fnames), 2)
+            self.assertTrue(
+                fnames[0].startswith(
+                    "qat.external.utils.qroutines.linalg.rref.get_row_addition-"
+                ))
+            self.assertTrue(fnames[0].endswith(".circ"))
+            self.assertTrue(fnames[1].endswith(".pkl"))
+
+            # A new process only finds the files
+            cache.clear()
+            self.assertEqual(sn.get_pattern_sorter(16, 'oddeven'), pattern)
+            loaded = cache.get_circuit(rref.get_row_addition, 3, 4, 1)
+            self.assertEqual(cache.PATTERNS.misses, 1)
+            self.assertEqual(loaded.nbqbits, circ.nbqbits)
+            self.assertEqual(len(loaded.ops), len(circ.ops))
+            values = np.arange(2**12, dtype=np.uint64)
+            qubits = tuple(range(12))
+            np.testing.assert_array_equal(
+                bitsliced.get_ints(
+                    bitsliced.simulate_circuit(loaded, {qubits: values},
+                                               True), qubits, len(values),
+                    True),
+                bitsliced.get_ints(
+                    bitsliced.simulate_circuit(circ, {qubits: values}, True),
+                    qubits, len(values), True))
+
+            self.assertEqual(sorted(os.listdir(tmp_dir)), fnames)
+
+            cache.clear(disk=True)
+            self.assertEqual(os.listdir(tmp_dir), [])
+
+    def test_disk_other_version(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache.set_cache_dir(tmp_dir)
+            sn.get_pattern_sorter(8)
+            cache.clear()
+            cache._get_fingerprint.cache_clear()
+            try:
+                with mock.patch.object(cache, "_VERSION", "other"):
+                    sn.get_pattern_sorter(8)
+            finally:
+                cache._get_fingerprint.cache_clear()
+            # The entry of the other version is not loaded
+            self.assertEqual(len(os.listdir(tmp_dir)), 2)
+
+    def test_disk_failed_dump(self):
+        def dump(path):
+            with open(path, "w") as f:
+                f.write("partial")
+            raise IOError("disk full")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with self.assertRaises(IOError):
+                cache._write(os.path.join(tmp_dir, "entry.circ"), dump)
+            self.assertEqual(os.listdir(tmp_dir), [])
+
+    def test_circuit(self):
+        circ = cache.get_circuit(rref.get_row_swap, 3, 3, 0)
+        self.assertIs(cache.get_circuit(rref.get_row_swap, 3, 3, 0), circ)
+        self.assertIsNot(cache.get_circuit(rref.get_row_swap, 3, 3, 1), circ)
+        self.assertEqual(len(cache.CIRCUITS), 2)
@@ -0,0 +1,43 @@
+from test.common_circuit import CircuitTestCase
+
+import numpy as np
+from parameterized import parameterized
+
+from qat.external.utils.qroutines.hamming_weight_compute import csa, fpc
+from qat.external.utils.simulation import bitsliced, reversible
+
+
+class CarrySaveTestCase(CircuitTestCase):
+    @parameterized.expand([(n, adder_name) for n in range(1, 14)
+                           for adder_name in ('ripple', 'cla')])
+    def test_weight_exhaustive(self, n, adder_name):
+        pattern = csa.get_qroutine_for_qubits_weight_get_pattern(n, adder_name)
+        self.assertEqual(pattern['n_lines'], n)
+        routine = csa.get_qroutine_for_qubits_weight(pattern['n_lines'],
+                                                     pattern['n_couts'],
+                                                     pattern)
+        circ = reversible.routine_to_circ(routine)
+        values = np.arange(2**n, dtype=np.uint64)
+        a_qbs = tuple(range(n))
+        planes = bitsliced.simulate_circuit(circ, {a_qbs: values}, True)
+        cout_qbs = list(range(n, n + pattern['n_couts']))
+        result_qbs = fpc.get_to_measure_qubits(a_qbs, cout_qbs, pattern)
+        self.assertEqual(len(result_qbs), n.bit_length())
+        weights = np.array([bin(i).count("1") for i in range(2**n)],
+                           dtype=np.uint64)
+        np.testing.assert_array_equal(
+            bitsliced.get_ints(planes, result_qbs, len(values), True),
+            weights)
+
+        self.assertResources(
+            routine, csa.get_qroutine_for_qubits_weight_resources(pattern),
+            adder_name == 'cla')
+
+    @parameterized.expand([(64, ), (1024, )])
+    def test_lower_depth_than_fpc(self, n):
+        csa_res = csa.get_qroutine_for_qubits_weight_resources(
+            csa.get_qroutine_for_qubits_weight_get_pattern(n))
+        fpc_res = fpc.get_qroutine_for_qubits_weight_resources(
+            fpc.get_qroutine_for_qubits_weight_get_pattern_unpadded(n))
+        self.assertLess(csa_res['depth'], fpc_res['depth'])
+        self.assertLessEqual(csa_res['qubits'], fpc_res['qubits'])
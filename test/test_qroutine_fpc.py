@@ -1,15 +1,57 @@
+import operator
 import unittest
-from math import factorial
+from math import comb
 from test.common_circuit import CircuitTestCase
 
 from parameterized import parameterized
 from qat.lang.AQASM import H, Program
 
 from qat.external.utils.qroutines import qregs_init as qregs
-from qat.external.utils.qroutines.hamming_weight_compute import fpc
+from qat.external.utils.qroutines.hamming_weight_compute import csa, fpc
 
 DEBUG = False
 
+_PADDED = fpc.get_qroutine_for_qubits_weight_get_pattern
+_UNPADDED = fpc.get_qroutine_for_qubits_weight_get_pattern_unpadded
+_CSA = csa.get_qroutine_for_qubits_weight_get_pattern
+
+
+def _apply_weight_check(program, a, flag, weight_int, nwr_dict):
+    """FPC_WCHE, then its inverse without the flag to reset the couts"""
+    cout = program.qalloc(nwr_dict['n_couts'])
+    program.apply(
+        fpc.get_qroutine_for_qubits_weight_check(len(a), len(cout), weight_int,
+                                                 nwr_dict, True), a, cout,
+        flag)
+    program.apply(
+        fpc.get_qroutine_for_qubits_weight_check(len(a), len(cout), weight_int,
+                                                 nwr_dict, False).dag(), a,
+        cout)
+
+
+def _apply_weight_check_clean(program, a, flag, weight_int, nwr_dict):
+    program.apply(
+        fpc.get_qroutine_for_qubits_weight_check_clean(len(a), weight_int,
+                                                       nwr_dict), a, flag)
+
+
+def _get_apply_threshold_check(at_most):
+    def apply_check(program, a, flag, weight_int, nwr_dict):
+        program.apply(
+            fpc.get_qroutine_for_qubits_weight_threshold_check(
+                len(a), weight_int, nwr_dict, at_most), a, flag)
+
+    return apply_check
+
+
+# The checks, with the condition on the weight setting the flag
+_CHECKS = {
+    "eq": (_apply_weight_check, operator.eq),
+    "clean": (_apply_weight_check_clean, operator.eq),
+    "le": (_get_apply_threshold_check(True), operator.le),
+    "ge": (_get_apply_threshold_check(False), operator.ge),
+}
+
 
 class PopulationCountTestCase(CircuitTestCase):
     @classmethod
@@ -69,53 +111,81 @@ class PopulationCountTestCase(CircuitTestCase):
             self.assertEqual(state.lsb_int, exp_w)
 
     @parameterized.expand([
-        ("0on2", 0, 2),
-        ("1on2", 1, 2),
-        ("2on2", 2, 2),
-        ("0on4", 0, 4),
-        ("2on4", 2, 4),
-        ("3on4", 3, 4),
-        ("3on8", 1, 8),
-        ("3on8", 2, 8),
-        ("3on8", 3, 8),
-        ("3on8", 4, 8),
+        (f"{check}_{weight_int}on{n_bits}_{get_pattern.__name__}", check,
+         weight_int, n_bits, get_pattern)
+        for check, weight_int, n_bits, get_pattern in [
+            ("eq", 0, 2, _PADDED),
+            ("eq", 1, 2, _PADDED),
+            ("eq", 2, 2, _PADDED),
+            ("eq", 0, 4, _PADDED),
+            ("eq", 2, 4, _PADDED),
+            ("eq", 3, 4, _PADDED),
+            ("eq", 1, 8, _PADDED),
+            ("eq", 2, 8, _PADDED),
+            ("eq", 3, 8, _PADDED),
+            ("eq", 4, 8, _PADDED),
+            ("eq", 0, 3, _UNPADDED),
+            ("eq", 2, 3, _UNPADDED),
+            ("eq", 1, 5, _UNPADDED),
+            ("eq", 3, 6, _UNPADDED),
+            ("eq", 4, 7, _UNPADDED),
+            ("eq", 0, 3, _CSA),
+            ("eq", 2, 5, _CSA),
+            ("eq", 3, 6, _CSA),
+            ("eq", 4, 7, _CSA),
+            ("clean", 2, 4, _PADDED),
+            ("clean", 1, 5, _UNPADDED),
+            ("clean", 3, 6, _CSA),
+            ("le", 2, 4, _PADDED),
+            ("ge", 2, 4, _PADDED),
+            ("le", 1, 5, _UNPADDED),
+            ("ge", 4, 6, _CSA),
+        ]
     ])
     @unittest.skipIf(DEBUG, "already working")
-    def test_fpc_hadamards_weight_check(self, name, weight_int, n_bits):
-        nwr_dict = fpc.get_qroutine_for_qubits_weight_get_pattern(n_bits)
+    def test_fpc_hadamards_weight_check(self, name, check, weight_int, n_bits,
+                                        get_pattern):
+        """Apply the check to the superposition of all the inputs: the flag
+        must be set exactly on the ones satisfying the check"""
+        nwr_dict = get_pattern(n_bits)
+        self.assertEqual(nwr_dict['n_lines'], n_bits)
+        apply_check, predicate = _CHECKS[check]
 
         program = Program()
-        a = program.qalloc(nwr_dict['n_lines'])
-        cout = program.qalloc(nwr_dict['n_couts'])
-        eq = program.qalloc(1)
-        self.logger.debug("a %s", a)
-        self.logger.debug("cout %s", cout)
+        a = program.qalloc(n_bits)
+        flag = program.qalloc(1)
         for qb in a:
             program.apply(H, qb)
-        qfun = fpc.get_qroutine_for_qubits_weight_check(
-            len(a), len(cout), weight_int, nwr_dict, True)
-        program.apply(qfun, a, cout, eq)
-        qfun = fpc.get_qroutine_for_qubits_weight_check(len(a),
-                                                        len(cout),
-                                                        weight_int,
-                                                        nwr_dict,
-                                                        False)
-        program.apply(qfun.dag(), a, cout)
-        res = self.qpu.submit(program.to_circ().to_job(qubits=[a, eq]))
-        self.logger.debug("res %s", res)
+        apply_check(program, a, flag, weight_int, nwr_dict)
+        circ = program.to_circ()
+        res = self.qpu.submit(circ.to_job())
 
-        counts = len(res)
-        self.assertEqual(counts, 2**len(a))
+        self.assertEqual(len(res), 2**n_bits)
         total_actives = 0
         for sample in res:
-            state = sample.state
-            bitstring = state.bitstring
-            if bitstring[-1] == '1':
-                total_actives += 1
-                # + 1 bcz we have the eq qbits, should be faster than slicing
-                self.assertEqual(bitstring.count("1"), weight_int + 1)
-            else:
-                self.assertNotEqual(bitstring.count("1"), weight_int)
-        exp_actives = factorial(n_bits) / factorial(weight_int) / factorial(
-            n_bits - weight_int)
+            # The couts and the ancillae are back to 0
+            self.assertEqual(sample.state.int % 2**(circ.nbqbits - n_bits - 1),
+                             0)
+            bitstring = sample.state.bitstring[:n_bits + 1]
+            expected = predicate(bitstring[:-1].count("1"), weight_int)
+            self.assertEqual(bitstring[-1] == '1', expected)
+            total_actives += int(expected)
+        exp_actives = sum(
+            comb(n_bits, w) for w in range(n_bits + 1)
+            if predicate(w, weight_int))
         self.assertEqual(total_actives, exp_actives)
+
+    @parameterized.expand([
+        (2, 1, 0),
+        (3, 1, 3),
+        (5, 3, 7),
+        (8, 7, 0),
+        (1025, 1023, 2047),
+    ])
+    def test_fpc_unpadded_pattern(self, n, n_couts, saved_qubits):
+        nwr_dict = fpc.get_qroutine_for_qubits_weight_get_pattern_unpadded(n)
+        self.assertEqual(nwr_dict['n_couts'], n_couts)
+        self.assertEqual(nwr_dict['saved_qubits'], saved_qubits)
+        self.assertEqual(len(nwr_dict['results']), n.bit_length())
+        for shape in nwr_dict['adders_shape']:
+            self.assertLessEqual(shape[0], shape[1])
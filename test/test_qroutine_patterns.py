@@ -0,0 +1,80 @@
+import pickle
+import unittest
+
+from parameterized import parameterized
+
+from qat.external.utils.qroutines import patterns
+from qat.external.utils.qroutines import sorting_network as sn
+from qat.external.utils.qroutines.hamming_weight_compute import csa, fpc
+from qat.external.utils.qroutines.linalg import matrix
+
+GET_PATTERNS = [
+    ("fpc", fpc.get_qroutine_for_qubits_weight_get_pattern, 13),
+    ("fpc_unpadded", fpc.get_qroutine_for_qubits_weight_get_pattern_unpadded,
+     13),
+    ("csa", csa.get_qroutine_for_qubits_weight_get_pattern, 13),
+    ("sorter", sn.get_pattern_sorter, 10),
+    ("bitonic", sn.get_pattern_bitonic_sorter, 8),
+]
+
+
+class PatternsTestCase(unittest.TestCase):
+    @parameterized.expand(GET_PATTERNS)
+    def test_hashable(self, name, get_pattern, n):
+        # Skip the cache, which would return the same object
+        get_pattern = getattr(get_pattern, 'uncached', get_pattern)
+        pattern = get_pattern(n)
+        other = get_pattern(n)
+        self.assertIsNot(pattern, other)
+        self.assertEqual(pattern, other)
+        self.assertEqual(hash(pattern), hash(other))
+        self.assertEqual(len({pattern, other}), 1)
+        self.assertNotEqual(pattern, get_pattern(2 * n))
+
+    @parameterized.expand(GET_PATTERNS)
+    def test_pickle(self, name, get_pattern, n):
+        pattern = get_pattern(n)
+        loaded = pickle.loads(pickle.dumps(pattern))
+        self.assertIs(type(loaded), type(pattern))
+        self.assertEqual(loaded, pattern)
+
+    def test_dict_access(self):
+        pattern = fpc.get_qroutine_for_qubits_weight_get_pattern(8)
+        self.assertEqual(pattern['n_lines'], pattern.n_lines)
+        self.assertEqual(pattern.get('n_couts'), 7)
+        self.assertIsNone(pattern.get('missing'))
+        self.assertIn('results', pattern)
+        self.assertNotIn('missing', pattern)
+        with self.assertRaises(KeyError):
+            pattern['missing']
+        with self.assertRaises(KeyError):
+            pattern['_fields']
+        # The methods of the tuples are not keys
+        with self.assertRaises(KeyError):
+            pattern['count']
+        self.assertIsNone(pattern.get('index'))
+        self.assertNotIn('count', pattern)
+        with self.assertRaises(AttributeError):
+            pattern.n_lines = 4
+
+    def test_move_columns_network_fields(self):
+        data = matrix.move_columns_end_data(4, 6)
+        self.assertIsInstance(data, patterns.MoveColumnsPattern)
+        self.assertEqual(data['n_comps'], data.network.n_comps)
+        self.assertEqual(data.layers, data.network.layers)
+        self.assertEqual(data['n_cols_orig'], 6)
+        self.assertIn('n_comps', data)
+        self.assertIn('n_cols_orig', data)
+        self.assertNotIn('missing', data)
+        with self.assertRaises(KeyError):
+            data['count']
+
+    @parameterized.expand([(fpc.get_qroutine_for_qubits_weight_get_pattern, ),
+                           (csa.get_qroutine_for_qubits_weight_get_pattern, )])
+    def test_get_qubits(self, get_pattern):
+        pattern = get_pattern(5)
+        a_qs = ["a{0}".format(i) for i in range(pattern.n_lines)]
+        cout_qs = ["c{0}".format(i) for i in range(pattern.n_couts)]
+        qubits = pattern.get_qubits(a_qs, cout_qs,
+                                    range(pattern.n_lines + pattern.n_couts))
+        self.assertEqual(qubits, a_qs + cout_qs)
@@ -0,0 +1,164 @@
+import itertools
+from test.common_circuit import CircuitTestCase
+
+from parameterized import parameterized
+from qat.external.utils.qroutines import adder, resources
+from qat.external.utils.qroutines import sorting_network as sn
+from qat.external.utils.qroutines.hamming_weight_compute import fpc
+from qat.external.utils.qroutines.hamming_weight_generate import bartschi
+from qat.external.utils.qroutines.linalg import matrix as qmatrix
+from qat.external.utils.qroutines.linalg import rref
+
+
+class ResourcesTestCase(CircuitTestCase):
+    def test_gate_key(self):
+        self.assertEqual(resources.get_gate_key(0, "X"), "X")
+        self.assertEqual(resources.get_gate_key(2, "X"), "CCNOT")
+        self.assertEqual(resources.get_gate_key(4, "X"), "C4X")
+        self.assertEqual(resources.get_gate_key(1, "SWAP"), "CSWAP")
+        self.assertEqual(resources.get_gate_key(2, "RY"), "CCRY")
+
+    def test_t_count(self):
+        self.assertEqual(
+            resources.get_t_count({
+                "X": 3,
+                "CCNOT": 2,
+                "C4X": 1,
+                "CRY": 5
+            }), 2 * 7 + 5 * 7)
+
+    def test_adder(self):
+        for a_l, b_l, overflow in itertools.product(range(1, 6), range(1, 6),
+                                                    (True, False)):
+            with self.subTest(a_l=a_l, b_l=b_l, overflow=overflow):
+                self.assertResources(
+                    adder.adder(a_l, b_l, overflow, True),
+                    adder.get_adder_resources(a_l, b_l, overflow))
+                self.assertResources(
+                    adder.subtractor(a_l, b_l, overflow, True),
+                    adder.get_subtractor_resources(a_l, b_l, overflow))
+            with self.subTest(a_l=a_l, b_l=b_l):
+                self.assertResources(adder.comparator(a_l, b_l, True),
+                                     adder.get_comparator_resources(a_l, b_l))
+
+    def test_adder_const(self):
+        for n, overflow in itertools.product(range(1, 6), (True, False)):
+            for value in range(2**n):
+                with self.subTest(n=n, value=value, overflow=overflow):
+                    self.assertResources(
+                        adder.adder_const(n, value, overflow, True),
+                        adder.get_adder_const_resources(n, value, overflow))
+
+    def test_comparator_const(self):
+        for n in range(1, 6):
+            for value in range(2**n + 1):
+                with self.subTest(n=n, value=value):
+                    self.assertResources(
+                        adder.comparator_const(n, value, True),
+                        adder.get_comparator_const_resources(n, value))
+
+    @parameterized.expand([(n, ) for n in range(2, 18)])
+    def test_sorter(self, n):
+        self.assertResources(sn.build_gate_sorter(sn.get_pattern_sorter(n)),
+                             sn.get_pattern_sorter_resources(n))
+
+    @parameterized.expand([(n, network) for n in (3, 6, 8)
+                           for network in ('oddeven', 'optimal')])
+    def test_other_sorters(self, n, network):
+        self.assertResources(
+            sn.build_gate_sorter(sn.get_pattern_sorter(n, network)),
+            sn.get_pattern_sorter_resources(n, network))
+
+    @parameterized.expand([
+        (2, 5),
+        (3, 6),
+    ])
+    def test_move_columns_end(self, nrows, ncols):
+        data = qmatrix.move_columns_end_data(nrows, ncols)
+        self.assertResources(qmatrix.move_columns_end_gate(data),
+                             qmatrix.move_columns_end_resources(nrows, ncols))
+        self.assertResources(
+            qmatrix.move_columns_end_gate_clean(data),
+            qmatrix.move_columns_end_clean_resources(nrows, ncols))
+
+    @parameterized.expand([
+        (2, 2),
+        (3, 6),
+        (5, 7),
+    ])
+    def test_rref(self, nrows, ncols):
+        self.assertResources(rref.get_rref(nrows, ncols),
+                             rref.get_rref_resources(nrows, ncols))
+        self.assertResources(rref.get_rref_fanout(nrows, ncols),
+                             rref.get_rref_fanout_resources(nrows, ncols),
+                             True)
+        self.assertResources(rref.get_rref_packed(nrows, ncols),
+                             rref.get_rref_packed_resources(nrows, ncols))
+        self.assertResources(
+            rref.gate_same_ops_for_vector_packed(nrows, ncols),
+            rref.get_same_ops_for_vector_packed_resources(nrows, ncols))
+        self.assertResources(
+            rref.gate_same_ops_for_vector(nrows, ncols),
+            rref.get_same_ops_for_vector_resources(nrows, ncols))
+
+    @parameterized.expand([(n, padded) for n in (2, 3, 5, 8, 16)
+                           for padded in (True, False)])
+    def test_fpc(self, n, padded):
+        if padded:
+            pattern = fpc.get_qroutine_for_qubits_weight_get_pattern(n)
+        else:
+            pattern = fpc.get_qroutine_for_qubits_weight_get_pattern_unpadded(
+                n)
+        self.assertResources(
+            fpc.get_qroutine_for_qubits_weight(pattern['n_lines'],
+                                               pattern['n_couts'], pattern),
+            fpc.get_qroutine_for_qubits_weight_resources(pattern))
+        for weight, compute_eq in itertools.product((0, n // 2),
+                                                    (True, False)):
+            with self.subTest(weight=weight, compute_eq=compute_eq):
+                self.assertResources(
+                    fpc.get_qroutine_for_qubits_weight_check(
+                        pattern['n_lines'], pattern['n_couts'], weight,
+                        pattern, compute_eq),
+                    fpc.get_qroutine_for_qubits_weight_check_resources(
+                        weight, pattern, compute_eq))
+        for at_most in (True, False):
+            with self.subTest(threshold=True, at_most=at_most):
+                self.assertResources(
+                    fpc.get_qroutine_for_qubits_weight_threshold_check(
+                        pattern['n_lines'], n // 2, pattern, at_most),
+                    fpc.
+                    get_qroutine_for_qubits_weight_threshold_check_resources(
+                        n // 2, pattern, at_most))
+        with self.subTest(clean=True):
+            self.assertResources(
+                fpc.get_qroutine_for_qubits_weight_check_clean(
+                    pattern['n_lines'], n // 2, pattern),
+                fpc.get_qroutine_for_qubits_weight_check_clean_resources(
+                    n // 2, pattern))
+
+    @parameterized.expand([
+        (1, 1),
+        (4, 2),
+        (5, 1),
+        (6, 4),
+        (9, 3),
+        (16, 5),
+        (33, 4),
+    ])
+    def test_dicke(self, n, k):
+        self.assertResources(bartschi.generate(n, k),
+                             bartschi.generate_resources(n, k))
+        self.assertResources(bartschi.generate_log_depth(n, k),
+                             bartschi.generate_log_depth_resources(n, k))
+
+    def test_cryptographic_sizes(self):
+        # No circuit is built, so this must be fast
+        res = rref.get_rref_resources(1000, 2000)
+        self.assertEqual(res['gates']['CNOT'], 999 * 1000 + 999 * 1000 // 2)
+        packed = rref.get_rref_packed_resources(1000, 2000)
+        self.assertLess(packed['qubits'] + packed['ancillae'],
+                        res['qubits'] + res['ancillae'] - 400000)
+        res = qmatrix.move_columns_end_resources(1000, 2000)
+        self.assertEqual(res['qubits'] - res['gates']['CSWAP'] // 1001,
+                         1001 * 2048)
@@ -3,10 +3,13 @@ from test.common_circuit import CircuitTestCase
 
 import numpy as np
 from parameterized import parameterized
+from qat.external.utils.bits import conversion
+from qat.external.utils.classical import gf2
+from qat.external.utils.qroutines import resources
 from qat.external.utils.qroutines.linalg import matrix as qmatrix
 from qat.external.utils.qroutines.linalg import rref
+from qat.external.utils.simulation import bitsliced, reversible
 from qat.lang.AQASM.program import Program
-from sympy import Matrix
 
 from qat.core.util import statistics
 
@@ -52,7 +55,7 @@ class RrefTestCase(CircuitTestCase):
         sample = res[0]
         mat_rref = qmatrix.build_matrix_from_sample(sample, self.qbit_range,
                                                     matrix.shape)
-        mat_rref_sim = Matrix(matrix).rref(pivots=False)
+        mat_rref_sim, _ = gf2.rref(matrix)
         # The rrefs are expected to be different
         if should_fail:
             with self.assertRaises(AssertionError):
@@ -76,6 +79,14 @@ class RrefTestCase(CircuitTestCase):
         if test_u:
             u = rref.build_u_matrix_from_sample(sample, self.nsquare)
             np.testing.assert_array_equal(u @ matrix % 2, mat_rref)
+            np.testing.assert_array_equal(
+                rref.build_u_matrices_from_samples(res, self.nsquare),
+                [u] * len(res))
+
+        np.testing.assert_array_equal(
+            qmatrix.build_matrices_from_samples(res, self.qbit_range,
+                                                matrix.shape),
+            [mat_rref] * len(res))
 
     @parameterized.expand([
         ("3x3", np.array([[0, 1, 1], [1, 0, 1], [0, 0, 1]])),
@@ -132,3 +143,158 @@ class RrefTestCase(CircuitTestCase):
                          CircuitTestCase.SLOW_TEST_ON_REASON)
     def test_equals_not_iden_slow(self, name, matrix):
         self._common_test(matrix, True, False, False)
+
+    @parameterized.expand([(2, 2), (3, 4), (4, 4), (5, 7), (6, 6)])
+    def test_fanout(self, nrows, ncols):
+        """Same matrix and ancillae of the RREF, the clean ancillae are reset
+        """
+        rng = np.random.default_rng(nrows * ncols)
+        values = rng.integers(0, 2**(nrows * ncols), 256, dtype=np.uint64)
+        # Some singular matrices, with all zero columns
+        values[:64] &= rng.integers(0, 2**(nrows * ncols), 64,
+                                    dtype=np.uint64)
+        inputs = {tuple(range(nrows * ncols)): values}
+        n_args = nrows * ncols + sum(rref.get_required_ancillae(nrows, ncols))
+        expected = bitsliced.simulate_circuit(
+            reversible.routine_to_circ(rref.get_rref(nrows, ncols)), inputs,
+            True)
+        planes = bitsliced.simulate_circuit(
+            reversible.routine_to_circ(rref.get_rref_fanout(nrows, ncols)),
+            inputs, True)
+        np.testing.assert_array_equal(planes[:n_args], expected[:n_args])
+        self.assertFalse(planes[n_args:].any())
+
+    @parameterized.expand([(3, 256), (4, 200)])
+    def test_fanout_depth(self, nrows, ncols):
+        depths = [
+            resources.get_circuit_depth(
+                reversible.routine_to_circ(get_rref(nrows, ncols)))
+            for get_rref in (rref.get_rref, rref.get_rref_fanout)
+        ]
+        self.assertLess(depths[1], depths[0])
+
+    @parameterized.expand([(2, 2), (3, 4), (4, 6), (5, 5)])
+    def test_packed(self, nrows, ncols):
+        """Same matrix and add ancillae of the RREF, the packed swaps give the
+        same U, which is applied to a vector"""
+        swap_n, add_n = rref.get_required_ancillae(nrows, ncols)
+        packed_n = sum(rref.get_required_ancillae_packed(nrows, ncols))
+        size = nrows * ncols
+        circ = reversible.routine_to_circ(rref.get_rref(nrows, ncols))
+        circ_packed = reversible.routine_to_circ(
+            rref.get_rref_packed(nrows, ncols))
+        circ_vec = reversible.routine_to_circ(
+            rref.gate_same_ops_for_vector_packed(nrows, ncols))
+        rng = np.random.default_rng(size)
+        for _ in range(50):
+            matrix = rng.integers(0, 2, (nrows, ncols))
+            # Make some matrices singular
+            matrix[:, rng.integers(ncols)] = 0
+            bits = list(matrix.ravel())
+            res = reversible.simulate_circuit(
+                circ, bits + [0] * (circ.nbqbits - size))
+            res_packed = reversible.simulate_circuit(
+                circ_packed, bits + [0] * (circ_packed.nbqbits - size))
+            self.assertEqual(res_packed[:size], res[:size])
+            ancillae = res_packed[size:size + packed_n]
+            swaps = rref.unpack_swap_bits(ancillae[:packed_n - add_n], nrows,
+                                          ncols)
+            self.assertEqual(swaps, res[size:size + swap_n])
+            self.assertEqual(ancillae[packed_n - add_n:],
+                             res[size + swap_n:size + swap_n + add_n])
+            self.assertFalse(any(res_packed[size + packed_n:]))
+
+            u = rref.build_u_matrix_from_bitstrings(
+                swaps, ancillae[packed_n - add_n:], nrows)
+            vector = list(rng.integers(0, 2, nrows))
+            res_vec = reversible.simulate_circuit(
+                circ_vec, vector + ancillae +
+                [0] * (circ_vec.nbqbits - nrows - packed_n))
+            np.testing.assert_array_equal(res_vec[:nrows], u @ vector % 2)
+            self.assertEqual(res_vec[nrows:nrows + packed_n], ancillae)
+            self.assertFalse(any(res_vec[nrows + packed_n:]))
+
+    def test_same_ops_for_vector(self):
+        """The operations of each pivot are applied in order"""
+        nrows, ncols = 4, 6
+        swap_n, add_n = rref.get_required_ancillae(nrows, ncols)
+        circ = reversible.routine_to_circ(rref.get_rref(nrows, ncols))
+        circ_vec = reversible.routine_to_circ(
+            rref.gate_same_ops_for_vector(nrows, ncols))
+        rng = np.random.default_rng(0)
+        for _ in range(50):
+            matrix = rng.integers(0, 2, (nrows, ncols))
+            res = reversible.simulate_circuit(
+                circ,
+                list(matrix.ravel()) + [0] * (circ.nbqbits - nrows * ncols))
+            ancillae = res[nrows * ncols:nrows * ncols + swap_n + add_n]
+            u = rref.build_u_matrix_from_bitstrings(ancillae[:swap_n],
+                                                    ancillae[swap_n:], nrows)
+            vector = list(rng.integers(0, 2, nrows))
+            res_vec = reversible.simulate_circuit(
+                circ_vec, vector + ancillae +
+                [0] * (circ_vec.nbqbits - nrows - swap_n - add_n))
+            np.testing.assert_array_equal(res_vec[:nrows], u @ vector % 2)
+
+    @parameterized.expand([(3, 3), (4, 6), (5, 8)])
+    def test_batch_decoding(self, nrows, ncols):
+        """The batch decoding gives the matrices and U of each sample"""
+        swap_n, add_n = rref.get_required_ancillae(nrows, ncols)
+        size = nrows * ncols
+        circ = reversible.routine_to_circ(rref.get_rref(nrows, ncols))
+        rng = np.random.default_rng(size)
+        matrices = rng.integers(0, 2, (40, nrows, ncols))
+        bits = np.array([
+            reversible.simulate_circuit(
+                circ,
+                list(matrix.ravel()) + [0] * (circ.nbqbits - size))
+            for matrix in matrices
+        ])
+        bitstrings = [''.join(str(b) for b in row) for row in bits]
+        np.testing.assert_array_equal(
+            conversion.get_bitarrays_from_bitstrings(bitstrings), bits)
+
+        mats_rref = qmatrix.build_matrices_from_bits(bits, range(size),
+                                                     (nrows, ncols))
+        swaps = bits[:, size:size + swap_n]
+        adds = bits[:, size + swap_n:size + swap_n + add_n]
+        us = rref.build_u_matrices_from_bits(swaps, adds, nrows)
+        self.assertEqual(us.shape, (len(matrices), nrows, nrows))
+        for matrix, mat_rref, u, sample_swaps, sample_adds in zip(
+                matrices, mats_rref, us, swaps, adds):
+            np.testing.assert_array_equal(
+                u,
+                rref.build_u_matrix_from_bitstrings(sample_swaps, sample_adds,
+                                                    nrows))
+            np.testing.assert_array_equal(u @ matrix % 2, mat_rref)
+
+    def test_batch_decoding_wide(self):
+        """The rows of U span several packed words"""
+        nsquare = 70
+        swap_n, add_n = rref.get_required_ancillae(nsquare, nsquare)
+        rng = np.random.default_rng(0)
+        # Sparse operations, so that U is not dense
+        swaps = (rng.random((3, swap_n)) < 0.02).astype(np.uint8)
+        adds = (rng.random((3, add_n)) < 0.02).astype(np.uint8)
+        us = rref.build_u_matrices_from_bits(swaps, adds, nsquare)
+        for u, sample_swaps, sample_adds in zip(us, swaps, adds):
+            np.testing.assert_array_equal(
+                u,
+                rref.build_u_matrix_from_bitstrings(sample_swaps, sample_adds,
+                                                    nsquare))
+
+    @parameterized.expand([(2, 2), (4, 6), (6, 5)])
+    def test_unpack_swap_bits_batch(self, nrows, ncols):
+        lengths = rref.get_packed_swap_lengths(nrows, ncols)
+        rng = np.random.default_rng(nrows * ncols)
+        packed = []
+        for _ in range(30):
+            row = []
+            for i, length in enumerate(lengths):
+                n_added = rng.integers(nrows - i)
+                row += [(n_added >> b) & 1 for b in range(length)]
+            packed.append(row)
+        unpacked = rref.unpack_swap_bits_batch(packed, nrows, ncols)
+        self.assertEqual(
+            unpacked.tolist(),
+            [rref.unpack_swap_bits(row, nrows, ncols) for row in packed])
@@ -1,8 +1,12 @@
 from test.common_circuit import CircuitTestCase
 
+import numpy as np
 from parameterized import parameterized
+from qat.external.utils.qroutines import resources
 from qat.external.utils.qroutines import sorting_network as sn
 from qat.external.utils.qroutines import qregs_init as qregs
+from qat.external.utils.qroutines.linalg import matrix as qmatrix
+from qat.external.utils.simulation import bitsliced, reversible
 from qat.lang.AQASM.program import Program
 
 import unittest
@@ -163,3 +167,141 @@ class SortingNetworkTestCase(CircuitTestCase):
     def test_sorter_qlm(self, string):
         self._test_sorter_common(string)
 
+    @parameterized.expand([
+        (sn.get_pattern_bitonic_sorter, 8),
+        (sn.get_pattern_merger, 16),
+        (sn.get_pattern_sorter, 6),
+        (sn.get_pattern_sorter, 16),
+    ])
+    def test_layers(self, get_pattern, n):
+        pattern = get_pattern(n)
+        self.assertEqual(pattern['depth'], len(pattern['layers']))
+        self.assertEqual(sorted(sum(pattern['layers'], ())),
+                         sorted(pattern['swaps_pattern']))
+        for layer in pattern['layers']:
+            lines = [line for swap in layer for line in swap[1:]]
+            self.assertEqual(len(lines), len(set(lines)))
+        # Comparators sharing a line keep their relative order
+        position = {swap: i for i, swap in enumerate(pattern['swaps_pattern'])}
+        last = {}
+        for layer in pattern['layers']:
+            for swap in layer:
+                for line in swap[1:]:
+                    self.assertGreater(position[swap], last.get(line, -1))
+                    last[line] = position[swap]
+
+    @parameterized.expand([
+        (2, ),
+        (4, ),
+        (8, ),
+        (16, ),
+        (32, ),
+    ])
+    def test_sorter_depth(self, n):
+        steps = int(np.log2(n))
+        pattern = sn.get_pattern_sorter(n)
+        self.assertEqual(pattern['depth'], steps * (steps + 1) // 2)
+        circ = reversible.routine_to_circ(sn.build_gate_sorter(pattern))
+        self.assertLessEqual(resources.get_circuit_depth(circ),
+                             4 * pattern['depth'])
+
+    def test_sorter_exhaustive(self):
+        n = 16
+        self._assert_sorts_all(sn.get_pattern_sorter(n), n)
+
+    def _assert_sorts_all(self, pattern, n):
+        circ = reversible.routine_to_circ(sn.build_gate_sorter(pattern))
+        values = np.arange(2**n, dtype=np.uint64)
+        planes = bitsliced.simulate_circuit(circ, {tuple(range(n)): values},
+                                            True)
+        weights = np.array([bin(i).count("1") for i in range(2**n)],
+                           dtype=np.uint64)
+        # The ones are moved to the last lines
+        np.testing.assert_array_equal(
+            bitsliced.get_ints(planes, range(n), len(values), False),
+            2**weights - np.uint64(1))
+
+    @parameterized.expand([(n, ) for n in range(1, 17)])
+    def test_oddeven_sorter(self, n):
+        pattern = sn.get_pattern_sorter(n, 'oddeven')
+        self.assertEqual(pattern['n_lines'], n)
+        self._assert_sorts_all(pattern, n)
+        self.assertLessEqual(pattern['n_comps'],
+                             sn.get_pattern_sorter(n)['n_comps'])
+
+    @parameterized.expand([(n, ) for n in range(1, 9)])
+    def test_optimal_sorter(self, n):
+        pattern = sn.get_pattern_sorter(n, 'optimal')
+        self._assert_sorts_all(pattern, n)
+        self.assertLessEqual(pattern['n_comps'],
+                             sn.get_pattern_sorter(n, 'oddeven')['n_comps'])
+
+    def test_unknown_network(self):
+        with self.assertRaises(ValueError):
+            sn.get_pattern_sorter(4, 'bubble')
+        with self.assertRaises(ValueError):
+            sn.get_pattern_sorter(9, 'optimal')
+
+    def test_move_columns_end_oddeven(self):
+        nrows, ncols = 2, 6
+        matrix = np.array([[1, 0, 1, 1, 0, 0], [0, 1, 1, 0, 1, 0]])
+        data = qmatrix.move_columns_end_data(nrows, ncols, 'oddeven')
+        self.assertEqual(data['n_cols'], ncols)
+        self.assertLess(data['n_comps'],
+                        qmatrix.move_columns_end_data(nrows, ncols)['n_comps'])
+        circ = reversible.routine_to_circ(qmatrix.move_columns_end_gate(data))
+        selected = [1, 4]
+        bits = matrix.flatten().tolist() + [0] * (ncols + data['n_comps'])
+        for col in selected:
+            bits[nrows * ncols + col] = 1
+        res = reversible.simulate_circuit(circ, bits)
+        moved = np.array(res[:nrows * ncols]).reshape(nrows, ncols)
+        self.assertEqual(sorted(map(tuple, moved[:, -2:].T)),
+                         sorted(map(tuple, matrix[:, selected].T)))
+        self.assertEqual(res[nrows * ncols:nrows * ncols + ncols],
+                         [0] * (ncols - 2) + [1, 1])
+
+    @parameterized.expand([
+        ('bitonic', [0, 2, 5]),
+        ('oddeven', [1, 4]),
+        ('oddeven', []),
+    ])
+    def test_move_columns_end_clean(self, network, selected):
+        nrows, ncols = 2, 6
+        matrix = np.array([[1, 0, 1, 1, 0, 0], [0, 1, 1, 0, 1, 0]])
+        data = qmatrix.move_columns_end_data(nrows, ncols, network)
+        n_cols = data['n_cols']
+        padded = np.zeros((nrows, n_cols), dtype=int)
+        padded[:, :ncols] = matrix
+        comb = [0] * n_cols
+        for col in selected:
+            comb[col] = 1
+        state = padded.flatten().tolist() + comb
+        dirty = reversible.simulate_circuit(
+            reversible.routine_to_circ(qmatrix.move_columns_end_gate(data)),
+            state)
+        circ = reversible.routine_to_circ(
+            qmatrix.move_columns_end_gate_clean(data))
+        # Only the comparator qubits are ancillae
+        self.assertEqual(circ.nbqbits, len(state) + data['n_comps'])
+        clean = reversible.simulate_circuit(circ, state)
+        # Same columns moved, the selection is kept and the ancillae are clean
+        self.assertEqual(clean[:nrows * n_cols], dirty[:nrows * n_cols])
+        self.assertEqual(clean[nrows * n_cols:len(state)], comb)
+        self.assertFalse(any(clean[len(state):]))
+
+    def test_sort_permute(self):
+        n, width = 5, 3
+        pattern = sn.get_pattern_sorter(n, 'oddeven')
+        circ = reversible.routine_to_circ(
+            sn.build_gate_sort_permute(pattern, width))
+        keys = [1, 0, 1, 0, 0]
+        groups = [[1, 0, 0], [0, 1, 0], [1, 1, 0], [0, 0, 1], [0, 1, 1]]
+        state = keys + sum(groups, [])
+        res = reversible.simulate_circuit(circ, state)
+        self.assertEqual(res[:n], keys)
+        self.assertFalse(any(res[len(state):]))
+        # The groups of the lines set to 1 are moved to the end
+        res_groups = [res[n + i * width:n + (i + 1) * width] for i in range(n)]
+        self.assertCountEqual(res_groups[3:], [groups[0], groups[2]])
+        self.assertCountEqual(res_groups[:3], [groups[1], groups[3], groups[4]])
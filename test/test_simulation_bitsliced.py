@@ -0,0 +1,181 @@
+import itertools
+import unittest
+from test.common_circuit import CircuitTestCase
+
+import numpy as np
+from parameterized import parameterized
+from qat.external.utils.qroutines import adder
+from qat.external.utils.qroutines.hamming_weight_compute import fpc
+from qat.external.utils.simulation import bitsliced, reversible
+
+
+class BitslicedSimulationTestCase(CircuitTestCase):
+    def _all_pairs(self, a_bits, b_bits):
+        values = np.arange(2**(a_bits + b_bits), dtype=np.uint64)
+        return values & np.uint64(2**a_bits - 1), values >> np.uint64(a_bits)
+
+    def test_pack_unpack(self):
+        values = np.arange(130, dtype=np.uint64) * np.uint64(7)
+        planes = bitsliced.new_planes(12, len(values))
+        bitsliced.set_ints(planes, range(12), values, False)
+        np.testing.assert_array_equal(
+            bitsliced.get_ints(planes, range(12), len(values), False), values)
+
+    def test_set_bits(self):
+        bits = np.random.default_rng(0).integers(0, 2, (130, 5))
+        planes = bitsliced.new_planes(7, len(bits))
+        bitsliced.set_bits(planes, [6, 0, 2, 3, 4], bits)
+        values = bitsliced.get_ints(planes, [0, 2, 3, 4, 6], len(bits), True)
+        np.testing.assert_array_equal(
+            values, bits[:, [1, 2, 3, 4, 0]] @ (1 << np.arange(5)))
+
+    def test_same_result_as_reversible(self):
+        circ = reversible.routine_to_circ(adder.subtractor(3, 3, True, False))
+        a_values, b_values = self._all_pairs(3, 3)
+        planes = bitsliced.simulate_circuit(circ, {
+            (0, 1, 2): a_values,
+            (3, 4, 5): b_values
+        }, False)
+        for i, (a_int, b_int) in enumerate(zip(a_values, b_values)):
+            state = [0] * 6
+            reversible.set_int(state, range(3), int(a_int), False)
+            reversible.set_int(state, range(3, 6), int(b_int), False)
+            bits = reversible.simulate_circuit(circ, state)
+            self.assertEqual(
+                bitsliced.get_ints(planes, range(circ.nbqbits), len(a_values),
+                                   False)[i],
+                reversible.get_int(bits, range(circ.nbqbits), False))
+
+    def _test_adder_exhaustive(self, a_bits, b_bits):
+        a_values, b_values = self._all_pairs(a_bits, b_bits)
+        batch_size = len(a_values)
+        for little_endian, overflow in itertools.product((True, False),
+                                                         (True, False)):
+            with self.subTest(little_endian=little_endian, overflow=overflow):
+                circ = reversible.routine_to_circ(
+                    adder.adder(a_bits, b_bits, overflow, little_endian))
+                a_qbs = tuple(range(a_bits))
+                b_qbs = tuple(range(a_bits, a_bits + b_bits))
+                planes = bitsliced.simulate_circuit(circ, {
+                    a_qbs: a_values,
+                    b_qbs: b_values
+                }, little_endian)
+                out_qbs = b_qbs
+                if overflow:
+                    cout = (a_bits + b_bits, )
+                    out_qbs = b_qbs + cout if little_endian else cout + b_qbs
+                expected = (a_values + b_values) % np.uint64(
+                    2**len(out_qbs))
+                np.testing.assert_array_equal(
+                    bitsliced.get_ints(planes, out_qbs, batch_size,
+                                       little_endian), expected)
+                np.testing.assert_array_equal(
+                    bitsliced.get_ints(planes, a_qbs, batch_size,
+                                       little_endian), a_values)
+                ancillae = range(len(a_qbs + out_qbs), circ.nbqbits)
+                self.assertFalse(planes[list(ancillae)].any())
+
+    @parameterized.expand([
+        (1, 1),
+        (5, 5),
+        (8, 8),
+        (3, 6),
+    ])
+    def test_adder_exhaustive(self, a_bits, b_bits):
+        self._test_adder_exhaustive(a_bits, b_bits)
+
+    @unittest.skipUnless(CircuitTestCase.SLOW_TEST_ON,
+                         CircuitTestCase.SLOW_TEST_ON_REASON)
+    def test_adder_exhaustive_slow(self):
+        self._test_adder_exhaustive(12, 12)
+
+    @parameterized.expand([
+        (4, ),
+        (8, ),
+    ])
+    def test_comparator_exhaustive(self, bits):
+        a_values, b_values = self._all_pairs(bits, bits)
+        for little_endian in (True, False):
+            with self.subTest(little_endian=little_endian):
+                circ = reversible.routine_to_circ(
+                    adder.comparator(bits, bits, little_endian))
+                planes = bitsliced.simulate_circuit(
+                    circ, {
+                        tuple(range(bits)): a_values,
+                        tuple(range(bits, 2 * bits)): b_values
+                    }, little_endian)
+                np.testing.assert_array_equal(
+                    bitsliced.get_ints(planes, [2 * bits], len(a_values),
+                                       True), a_values < b_values)
+
+    @parameterized.expand([(bits, ) for bits in range(1, 7)])
+    def test_comparator_const_exhaustive(self, bits):
+        values = np.arange(2**bits, dtype=np.uint64)
+        for const, little_endian in itertools.product(range(2**bits + 1),
+                                                      (True, False)):
+            with self.subTest(const=const, little_endian=little_endian):
+                circ = reversible.routine_to_circ(
+                    adder.comparator_const(bits, const, little_endian))
+                planes = bitsliced.simulate_circuit(
+                    circ, {tuple(range(bits)): values}, little_endian)
+                np.testing.assert_array_equal(
+                    bitsliced.get_ints(planes, [bits], len(values), True),
+                    values < const)
+                # x and the ancillae are restored
+                np.testing.assert_array_equal(
+                    bitsliced.get_ints(planes, range(bits), len(values),
+                                       little_endian), values)
+                np.testing.assert_array_equal(
+                    bitsliced.get_ints(planes, range(bits + 1, circ.nbqbits),
+                                       len(values), True), 0)
+
+    @parameterized.expand([(bits, ) for bits in range(1, 7)])
+    def test_adder_const_exhaustive(self, bits):
+        values = np.arange(2**bits, dtype=np.uint64)
+        for const, little_endian, overflow in itertools.product(
+                range(-1, 2**bits), (True, False), (True, False)):
+            if overflow and const < 0:
+                continue
+            with self.subTest(const=const,
+                              little_endian=little_endian,
+                              overflow=overflow):
+                circ = reversible.routine_to_circ(
+                    adder.adder_const(bits, const, overflow, little_endian))
+                planes = bitsliced.simulate_circuit(
+                    circ, {tuple(range(bits)): values}, little_endian)
+                out_qubits = list(range(bits))
+                expected = values.astype(np.int64) + const
+                if overflow:
+                    out_qubits = (out_qubits + [bits] if little_endian else
+                                  [bits] + out_qubits)
+                else:
+                    expected %= 2**bits
+                np.testing.assert_array_equal(
+                    bitsliced.get_ints(planes, out_qubits, len(values),
+                                       little_endian), expected)
+                np.testing.assert_array_equal(
+                    bitsliced.get_ints(planes,
+                                       range(len(out_qubits), circ.nbqbits),
+                                       len(values), True), 0)
+
+    @parameterized.expand([
+        ("padded", 16, fpc.get_qroutine_for_qubits_weight_get_pattern),
+        ("unpadded", 13,
+         fpc.get_qroutine_for_qubits_weight_get_pattern_unpadded),
+    ])
+    def test_fpc_exhaustive(self, _, n, get_pattern):
+        pattern = get_pattern(n)
+        circ = reversible.routine_to_circ(
+            fpc.get_qroutine_for_qubits_weight(pattern['n_lines'],
+                                               pattern['n_couts'], pattern))
+        values = np.arange(2**n, dtype=np.uint64)
+        a_qbs = tuple(range(pattern['n_lines']))
+        planes = bitsliced.simulate_circuit(circ, {a_qbs: values}, True)
+        cout_qbs = list(range(pattern['n_lines'],
+                              pattern['n_lines'] + pattern['n_couts']))
+        result_qbs = fpc.get_to_measure_qubits(a_qbs, cout_qbs, pattern)
+        weights = np.array([bin(i).count("1") for i in range(2**n)],
+                           dtype=np.uint64)
+        np.testing.assert_array_equal(
+            bitsliced.get_ints(planes, result_qbs, len(values), True),
+            weights)
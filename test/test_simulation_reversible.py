@@ -0,0 +1,136 @@
+import itertools
+from test.common_circuit import CircuitTestCase
+
+import numpy as np
+from parameterized import parameterized
+from qat.external.utils.qroutines import adder
+from qat.external.utils.qroutines import qregs_init as qregs
+from qat.external.utils.qroutines import sorting_network as sn
+from qat.external.utils.qroutines.linalg import matrix as qmatrix
+from qat.external.utils.qroutines.linalg import rref
+from qat.external.utils.simulation import reversible
+from qat.lang.AQASM import H, Program
+
+
+class ReversibleSimulationTestCase(CircuitTestCase):
+    def test_parse_gate_name(self):
+        self.assertEqual(reversible.parse_gate_name("X"), (0, False, "X"))
+        self.assertEqual(reversible.parse_gate_name("CNOT"), (1, False, "X"))
+        self.assertEqual(reversible.parse_gate_name("C-C-X"), (2, False, "X"))
+        self.assertEqual(reversible.parse_gate_name("C-CCNOT"),
+                         (3, False, "X"))
+        self.assertEqual(reversible.parse_gate_name("D-C-RY"),
+                         (1, True, "RY"))
+
+    def test_not_reversible(self):
+        program = Program()
+        qbits = program.qalloc(2)
+        program.apply(H, qbits[0])
+        with self.assertRaises(ValueError):
+            self.simulate_program_reversible(program)
+
+    @parameterized.expand([
+        (1, ),
+        (2, ),
+        (3, ),
+        (4, ),
+    ])
+    def test_adder_exhaustive(self, bits):
+        for little_endian, overflow in itertools.product((True, False),
+                                                         (True, False)):
+            with self.subTest(little_endian=little_endian, overflow=overflow):
+                circ = reversible.routine_to_circ(
+                    adder.adder(bits, bits, overflow, little_endian))
+                a_qbs = list(range(bits))
+                b_qbs = list(range(bits, 2 * bits))
+                out_qbs = list(b_qbs)
+                if overflow:
+                    out_qbs = (out_qbs + [2 * bits]
+                               if little_endian else [2 * bits] + out_qbs)
+                for a_int, b_int in itertools.product(range(2**bits),
+                                                      repeat=2):
+                    state = [0] * (2 * bits)
+                    reversible.set_int(state, a_qbs, a_int, little_endian)
+                    reversible.set_int(state, b_qbs, b_int, little_endian)
+                    res = reversible.simulate_circuit(circ, state)
+                    expected = a_int + b_int
+                    if not overflow:
+                        expected %= 2**bits
+                    self.assertEqual(
+                        reversible.get_int(res, out_qbs, little_endian),
+                        expected)
+                    self.assertEqual(
+                        reversible.get_int(res, a_qbs, little_endian), a_int)
+                    # ancillae must be restored
+                    self.assertFalse(any(res[len(state) + overflow:]))
+
+    @parameterized.expand([
+        (2, ),
+        (3, ),
+        (4, ),
+    ])
+    def test_comparator_exhaustive(self, bits):
+        circ = reversible.routine_to_circ(adder.comparator(bits, bits, True))
+        a_qbs = list(range(bits))
+        b_qbs = list(range(bits, 2 * bits))
+        for a_int, b_int in itertools.product(range(2**bits), repeat=2):
+            state = [0] * (2 * bits + 1)
+            reversible.set_int(state, a_qbs, a_int, True)
+            reversible.set_int(state, b_qbs, b_int, True)
+            res = reversible.simulate_circuit(circ, state)
+            self.assertEqual(res[2 * bits], int(a_int < b_int))
+            self.assertEqual(res[:2 * bits], state[:2 * bits])
+
+    @parameterized.expand([
+        ("1011", ),
+        ("0110", ),
+        ("0001", ),
+    ])
+    def test_same_result_as_qpu(self, string):
+        pattern = sn.get_pattern_sorter(len(string))
+        program = Program()
+        qbits = program.qalloc(pattern['n_lines'])
+        comps = program.qalloc(pattern['n_comps'])
+        program.apply(qregs.initialize_qureg_given_bitstring(string, False),
+                      qbits)
+        program.apply(sn.build_gate_sorter(pattern), qbits, comps)
+
+        res = self.simulate_program(program)
+        self.assertEqual(len(res), 1)
+        bits = self.simulate_program_reversible(program)
+        self.assertEqual(''.join(str(b) for b in bits),
+                         res[0].state.bitstring)
+
+    def test_rref_6x12(self):
+        nrows, ncols = 6, 12
+        swap_anc_n, add_anc_n = rref.get_required_ancillae(nrows, ncols)
+        circ = reversible.routine_to_circ(rref.get_rref(nrows, ncols))
+        self.assertEqual(circ.nbqbits,
+                         nrows * ncols + swap_anc_n + add_anc_n)
+        rng = np.random.default_rng(0)
+        tested = 0
+        while tested < 5:
+            matrix = rng.integers(0, 2, (nrows, ncols), dtype=np.uint8)
+            if round(np.linalg.det(matrix[:, :nrows])) % 2 == 0:
+                # the determinant is even, i.e. 0 over GF(2)
+                continue
+            tested += 1
+            state = matrix.flatten().tolist()
+            res = reversible.simulate_circuit(circ, state)
+            mat_rref = np.array(res[:nrows * ncols],
+                                dtype=np.uint8).reshape(nrows, ncols)
+            swaps = res[nrows * ncols:nrows * ncols + swap_anc_n]
+            adds = res[nrows * ncols + swap_anc_n:]
+            u = rref.build_u_matrix_from_bitstrings(swaps, adds, nrows)
+            np.testing.assert_array_equal(mat_rref[:, :nrows],
+                                          np.eye(nrows))
+            np.testing.assert_array_equal(u @ matrix % 2, mat_rref)
+
+    def test_matrix_init(self):
+        matrix = np.array([[1, 0, 1], [0, 1, 1]])
+        program = Program()
+        qbits = program.qalloc(matrix.size)
+        program.apply(qmatrix.initialize_qureg_to_binary_matrix(matrix),
+                      qbits)
+        bits = self.simulate_program_reversible(program)
+        self.assertEqual(bits, matrix.flatten().tolist())
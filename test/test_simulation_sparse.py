@@ -0,0 +1,122 @@
+import itertools
+from math import comb
+from test.common_circuit import CircuitTestCase
+
+import numpy as np
+from parameterized import parameterized
+from qat.external.utils.qroutines.hamming_weight_generate import bartschi
+from qat.external.utils.qroutines.linalg import matrix as qmatrix
+from qat.external.utils.simulation import reversible, sparse
+from qat.lang.AQASM import CNOT, H, Program, RY
+
+
+class SparseSimulationTestCase(CircuitTestCase):
+    def test_interference(self):
+        program = Program()
+        qbits = program.qalloc(2)
+        program.apply(H, qbits[0])
+        program.apply(CNOT, qbits[0], qbits[1])
+        state = sparse.simulate_circuit(program.to_circ())
+        self.assertEqual(len(state), 2)
+        program.apply(CNOT, qbits[0], qbits[1])
+        program.apply(H, qbits[0])
+        state = sparse.simulate_circuit(program.to_circ())
+        self.assertEqual(len(state), 1)
+        self.assertEqual(state.to_dict().keys(), {"00"})
+
+    def test_same_result_as_qpu(self):
+        program = Program()
+        qbits = program.qalloc(3)
+        program.apply(RY(0.3), qbits[0])
+        program.apply(H, qbits[1])
+        program.apply(RY(1.1).ctrl(2), qbits[0], qbits[1], qbits[2])
+        program.apply(RY(0.7).dag(), qbits[2])
+        amplitudes = sparse.simulate_circuit(program.to_circ()).to_dict()
+        res = self.simulate_program(program)
+        self.assertEqual(len(res), len(amplitudes))
+        for sample in res:
+            self.assertAlmostEqual(abs(sample.amplitude -
+                                       amplitudes[sample.state.bitstring]),
+                                   0)
+
+    @parameterized.expand([
+        (4, 2),
+        (8, 3),
+        (9, 6),
+        (16, 4),
+    ])
+    def test_dicke(self, n, k):
+        circ = reversible.routine_to_circ(bartschi.generate(n, k))
+        state = sparse.simulate_circuit(circ)
+        self.assertEqual(len(state), comb(n, k))
+        for bitstring, amplitude in state.to_dict().items():
+            self.assertEqual(bitstring.count("1"), k)
+            self.assertAlmostEqual(abs(amplitude)**2, 1 / len(state))
+
+    @parameterized.expand([
+        (16, 4),
+        (21, 5),
+        (40, 3),
+    ])
+    def test_dicke_log_depth(self, n, k):
+        circ = reversible.routine_to_circ(bartschi.generate_log_depth(n, k))
+        state = sparse.simulate_circuit(circ)
+        self.assertEqual(len(state), comb(n, k))
+        for bitstring, amplitude in state.to_dict().items():
+            self.assertEqual(bitstring.count("1"), k)
+            self.assertAlmostEqual(abs(amplitude)**2, 1 / len(state))
+
+    def test_dicke_dag(self):
+        program = Program()
+        qbits = program.qalloc(10)
+        program.apply(bartschi.generate(10, 4), qbits)
+        program.apply(bartschi.generate(10, 4).dag(), qbits)
+        state = sparse.simulate_circuit(program.to_circ())
+        self.assertEqual(state.to_dict().keys(), {"0" * 10})
+
+    def test_many_qubits(self):
+        # Only the support matters, not the number of qubits
+        program = Program()
+        qbits = program.qalloc(130)
+        program.apply(bartschi.generate(12, 3), qbits[60:72])
+        for i in range(60, 72):
+            program.apply(CNOT, qbits[i], qbits[i + 58])
+        state = sparse.simulate_circuit(program.to_circ())
+        self.assertEqual(len(state), comb(12, 3))
+        np.testing.assert_array_equal(state.get_ints(range(60, 72), True),
+                                      state.get_ints(range(118, 130), True))
+
+    def test_move_columns_end(self):
+        nrows, ncols, k = 2, 6, 2
+        matrix = np.array([[1, 0, 1, 1, 0, 0], [0, 1, 1, 0, 1, 0]])
+        data = qmatrix.move_columns_end_data(nrows, ncols)
+        programs = []
+        for dicke in (True, False):
+            program = Program()
+            mat = program.qalloc(nrows * ncols)
+            comb_qbs = program.qalloc(ncols)
+            comp = program.qalloc(data['n_comps'])
+            program.apply(qmatrix.initialize_qureg_to_binary_matrix(matrix),
+                          mat)
+            if dicke:
+                program.apply(bartschi.generate(ncols, k), comb_qbs)
+            program.apply(qmatrix.move_columns_end_gate(data), mat, comb_qbs,
+                          comp)
+            programs.append(program)
+        state = sparse.simulate_circuit(programs[0].to_circ())
+        self.assertEqual(len(state), comb(ncols, k))
+        probs = state.get_probabilities(range(nrows * ncols), False)
+        self.assertAlmostEqual(sum(probs.values()), 1)
+
+        # Each column choice gives the matrix of the classical simulation
+        expected = {}
+        for cols in itertools.combinations(range(ncols), k):
+            bits = [0] * (nrows * ncols + ncols)
+            for col in cols:
+                bits[nrows * ncols + col] = 1
+            res = self.simulate_program_reversible(programs[1], bits=bits)
+            value = reversible.get_int(res, list(range(nrows * ncols)), False)
+            expected[value] = expected.get(value, 0) + 1 / len(state)
+        self.assertEqual(probs.keys(), expected.keys())
+        for value, prob in expected.items():
+            self.assertAlmostEqual(probs[value], prob)
@@ -0,0 +1,73 @@
+import unittest
+
+from parameterized import parameterized
+from qat.external.utils.qroutines import resources
+from qat.external.utils.qroutines import sorting_network as sn
+from qat.external.utils.qroutines.hamming_weight_compute import csa, fpc
+from qat.external.utils.qroutines.linalg import rref
+from qat.external.utils.simulation import reversible
+from qat.external.utils.stream import emitters
+
+
+class EmittersTestCase(unittest.TestCase):
+    def assertSameOps(self, routine, ops):
+        circ = reversible.routine_to_circ(routine)
+        self.assertEqual(list(ops), reversible.get_ops(circ))
+
+    @parameterized.expand([(1, 3), (3, 4), (4, 4), (3, 9)])
+    def test_rref(self, nrows, ncols):
+        self.assertSameOps(rref.get_rref(nrows, ncols),
+                           emitters.get_rref_ops(nrows, ncols))
+
+    def test_rref_qubits(self):
+        nrows, ncols = 3, 5
+        nbqbits = reversible.get_routine_arity(rref.get_rref(nrows, ncols))
+        qubits = [2 * qb + 1 for qb in range(nbqbits)]
+        for op, shifted in zip(emitters.get_rref_ops(nrows, ncols),
+                               emitters.get_rref_ops(nrows, ncols, qubits)):
+            self.assertEqual(shifted.ctrls,
+                             tuple(qubits[qb] for qb in op.ctrls))
+            self.assertEqual(shifted.targets,
+                             tuple(qubits[qb] for qb in op.targets))
+
+    def test_rref_more_rows(self):
+        with self.assertRaises(ValueError):
+            next(emitters.get_rref_ops(5, 3))
+
+    @parameterized.expand([(8, 'bitonic'), (6, 'oddeven'), (5, 'optimal')])
+    def test_sorter(self, n, network):
+        pattern = sn.get_pattern_sorter(n, network)
+        self.assertSameOps(sn.build_gate_sorter(pattern),
+                           emitters.get_sorter_ops(pattern))
+
+    @parameterized.expand([
+        ('ripple', fpc.get_qroutine_for_qubits_weight_get_pattern(16)),
+        ('cla', fpc.get_qroutine_for_qubits_weight_get_pattern(8, 'cla')),
+        ('unpadded',
+         fpc.get_qroutine_for_qubits_weight_get_pattern_unpadded(11)),
+    ])
+    def test_weight(self, _, pattern):
+        routine = fpc.get_qroutine_for_qubits_weight(pattern.n_lines,
+                                                     pattern.n_couts, pattern)
+        self.assertSameOps(routine, emitters.get_weight_ops(pattern))
+        self.assertEqual(
+            pattern.n_lines + pattern.n_couts +
+            emitters.get_weight_ancillae(pattern),
+            reversible.routine_to_circ(routine).nbqbits)
+
+    def test_weight_carry_save(self):
+        pattern = csa.get_qroutine_for_qubits_weight_get_pattern(8)
+        with self.assertRaises(ValueError):
+            next(emitters.get_weight_ops(pattern))
+        with self.assertRaises(ValueError):
+            emitters.get_weight_ancillae(pattern)
+
+    def test_large_rref(self):
+        """The gates are counted without building the routine"""
+        nrows, ncols = 40, 100
+        expected = rref.get_rref_resources(nrows, ncols)
+        res = resources.get_ops_resources(
+            emitters.get_rref_ops(nrows, ncols), expected['qubits'],
+            expected['qubits'] + expected['ancillae'])
+        self.assertEqual(dict(res['gates']), dict(expected['gates']))
+        self.assertGreaterEqual(expected['depth'], res['depth'])
@@ -0,0 +1,75 @@
+import io
+import unittest
+
+from qat.external.utils.qroutines import resources
+from qat.external.utils.qroutines.linalg import rref
+from qat.external.utils.simulation import reversible
+from qat.external.utils.stream import emitters, sinks
+from qat.lang.AQASM import RY, SWAP, Program, S, T
+
+Op = reversible.Op
+
+
+class SinksTestCase(unittest.TestCase):
+    def _get_ops(self):
+        program = Program()
+        qbits = program.qalloc(4)
+        program.apply(RY(0.25).ctrl(2), qbits[3], qbits[0], qbits[1])
+        program.apply(T.dag(), qbits[2])
+        program.apply(S.dag().ctrl(), qbits[2], qbits[3])
+        program.apply(SWAP.ctrl(), qbits[0], qbits[1], qbits[2])
+        program.apply(RY(0.5).dag(), qbits[1])
+        return reversible.get_ops(program.to_circ())
+
+    def test_schedule(self):
+        ops = list(emitters.get_rref_ops(3, 5))
+        nbqbits = 15 + sum(rref.get_required_ancillae(3, 5))
+        layers = list(sinks.schedule(ops, nbqbits))
+        self.assertEqual([op for _, op in layers], ops)
+        self.assertEqual(
+            max(layer for layer, _ in layers) + 1,
+            resources.get_ops_resources(ops, nbqbits, nbqbits)['depth'])
+        # The gates of a layer act on different qubits
+        by_layer = {}
+        for layer, op in layers:
+            qubits = by_layer.setdefault(layer, set())
+            self.assertFalse(qubits & set(op.ctrls + op.targets))
+            qubits.update(op.ctrls + op.targets)
+
+    def test_binary(self):
+        ops = self._get_ops() + list(emitters.get_rref_ops(4, 6))
+        file = io.BytesIO()
+        self.assertEqual(sinks.write_binary(iter(ops), file), len(ops))
+        file.seek(0)
+        self.assertEqual(list(sinks.read_binary(file)), ops)
+
+    def test_binary_errors(self):
+        with self.assertRaises(ValueError):
+            list(sinks.read_binary(io.BytesIO(b"QASM")))
+        file = io.BytesIO()
+        sinks.write_binary(self._get_ops(), file)
+        with self.assertRaises(ValueError):
+            list(sinks.read_binary(io.BytesIO(file.getvalue()[:-1])))
+        with self.assertRaises(ValueError):
+            sinks.write_binary([Op("U", (), (), (0, ))], io.BytesIO())
+
+    def test_qasm(self):
+        file = io.StringIO()
+        self.assertEqual(
+            sinks.write_qasm(
+                self._get_ops() + [Op("X", (), (0, 1, 2), (3, ))], file, 4),
+            6)
+        self.assertEqual(
+            file.getvalue().splitlines(), [
+                'OPENQASM 3.0;',
+                'include "stdgates.inc";',
+                'qubit[4] q;',
+                'ctrl(2) @ ry(0.25) q[3], q[0], q[1];',
+                'tdg q[2];',
+                'ctrl @ sdg q[2], q[3];',
+                'cswap q[0], q[1], q[2];',
+                'ry(-0.5) q[1];',
+                'ctrl(3) @ x q[0], q[1], q[2], q[3];',
+            ])
+        with self.assertRaises(ValueError):
+            sinks.write_qasm([Op("ISWAP", (), (), (0, 1))], io.StringIO(), 2)
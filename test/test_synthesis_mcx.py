@@ -0,0 +1,138 @@
+import itertools
+from test.common_circuit import CircuitTestCase
+
+from parameterized import parameterized
+from qat.external.utils.qroutines import resources
+from qat.external.utils.qroutines.hamming_weight_compute import fpc
+from qat.external.utils.simulation import reversible
+from qat.external.utils.synthesis.mctrls import mcx
+from qat.lang.AQASM import CCNOT, X
+from qat.lang.AQASM.program import Program
+
+GATES = [
+    ("vchain", mcx.mcx_vchain, mcx.mcx_vchain_resources),
+    ("log", mcx.mcx_log_depth, mcx.mcx_log_depth_resources),
+    ("dirty", mcx.mcx_dirty, mcx.mcx_dirty_resources),
+    ("one_ancilla", mcx.mcx_one_ancilla, mcx.mcx_one_ancilla_resources),
+]
+
+
+class MCXTestCase(CircuitTestCase):
+    @parameterized.expand([(name, gate, get_resources, nctrls)
+                           for name, gate, get_resources in GATES
+                           for nctrls in (0, 1, 2, 3, 4, 7)])
+    def test_exhaustive(self, name, gate, get_resources, nctrls):
+        """The target is flipped iff all the controls are 1, the other wires,
+        dirty ones included, are restored and the ancillae are clean"""
+        arity = reversible.get_routine_arity(gate(nctrls))
+        circ = reversible.routine_to_circ(gate(nctrls))
+        for bits in itertools.product([0, 1], repeat=arity):
+            res = reversible.simulate_circuit(circ, bits)
+            expected = list(bits)
+            expected[nctrls] ^= int(all(bits[:nctrls]))
+            self.assertEqual(res[:arity], expected)
+            self.assertFalse(any(res[arity:]))
+
+        estimated = get_resources(nctrls)
+        actual = resources.get_circuit_resources(circ, arity)
+        self.assertEqual(estimated['qubits'], actual['qubits'])
+        self.assertEqual(estimated['ancillae'], actual['ancillae'])
+        self.assertEqual(estimated['gates'], actual['gates'])
+        self.assertEqual(estimated['t_count'], actual['t_count'])
+        self.assertGreaterEqual(estimated['depth'], actual['depth'])
+
+    def test_counts(self):
+        nctrls = 16
+        self.assertEqual(mcx.mcx_vchain_resources(nctrls)['gates']['CCNOT'],
+                         29)
+        self.assertEqual(mcx.mcx_dirty_resources(nctrls)['t_count'],
+                         7 * 4 * 14)
+        self.assertEqual(mcx.mcx_log_depth_resources(nctrls)['depth'], 7)
+        self.assertEqual(mcx.mcx_vchain_resources(nctrls)['depth'], 29)
+        self.assertEqual(mcx.mcx_one_ancilla_resources(nctrls)['ancillae'], 1)
+
+    @parameterized.expand(['native', 'vchain', 'log', 'one_ancilla'])
+    def test_link(self, method):
+        nctrls = 5
+        program = Program()
+        qbits = program.qalloc(nctrls + 1)
+        program.apply(mcx.get_mcx_gate(nctrls), qbits)
+        circ = program.to_circ(link=[mcx.get_link(method)])
+        estimated = mcx.get_mcx_resources(nctrls, method)
+        actual = resources.get_circuit_resources(circ, nctrls + 1)
+        self.assertEqual(estimated['gates'], actual['gates'])
+        self.assertEqual(estimated['ancillae'], actual['ancillae'])
+        self.assertEqual(
+            reversible.simulate_circuit(circ, [1] * nctrls + [0])[:nctrls + 1],
+            [1] * (nctrls + 1))
+
+    def test_default_lowering(self):
+        program = Program()
+        qbits = program.qalloc(5)
+        program.apply(mcx.get_mcx_gate(4), qbits)
+        circ = program.to_circ()
+        self.assertEqual([name for name, _, _ in circ.iterate_simple()],
+                         ["C-C-C-C-X"])
+        self.assertIs(mcx.get_mcx_gate(0), X)
+
+    def test_link_weight_check(self):
+        """The wide gate of the weight check is lowered, with the same
+        result"""
+        pattern = fpc.get_qroutine_for_qubits_weight_get_pattern(6)
+        n = pattern.n_lines
+        gate = fpc.get_qroutine_for_qubits_weight_check_clean(n, 3, pattern)
+        native = reversible.routine_to_circ(gate)
+        linked = reversible.routine_to_circ(gate, link=[mcx.x])
+        self.assertTrue(
+            all(len(op.ctrls) <= 2 for op in reversible.get_ops(linked)))
+        for bits in itertools.product([0, 1], repeat=n):
+            state = list(bits) + [0]
+            self.assertEqual(
+                reversible.simulate_circuit(native, state)[:n + 1],
+                reversible.simulate_circuit(linked, state)[:n + 1])
+
+    def test_ccnot(self):
+        """The Clifford+T CCNOT has the same action on the basis states"""
+        for bits in itertools.product([0, 1], repeat=3):
+            program = Program()
+            qbits = program.qalloc(3)
+            for qbit, bit in zip(qbits, bits):
+                if bit:
+                    program.apply(X, qbit)
+            program.apply(CCNOT, qbits)
+            circ = program.to_circ(link=[mcx.ccnot])
+            self.assertEqual(
+                {name
+                 for name, _, _ in circ.iterate_simple()} - {"X"},
+                {"H", "T", "D-T", "CNOT"})
+            res = self.qpu.submit(circ.to_job())
+            expected = list(bits)
+            expected[2] ^= bits[0] & bits[1]
+            self.assertEqual(len(res), 1)
+            self.assertEqual(res[0].state.bitstring,
+                             ''.join(str(b) for b in expected))
+
+    @parameterized.expand([
+        (10, None, None, 'log'),
+        (10, 1, None, 'one_ancilla'),
+        (10, None, 30, 'log'),
+        (2, 0, None, 'native'),
+        (10, 0, None, 'dirty', 8),
+        (10, None, None, 'log', 8),
+    ])
+    def test_cheapest_method(self,
+                             nctrls,
+                             max_ancillae,
+                             max_depth,
+                             method,
+                             borrowable=0):
+        self.assertEqual(
+            mcx.get_cheapest_method(nctrls, max_ancillae, max_depth,
+                                    borrowable), method)
+
+    def test_no_method(self):
+        with self.assertRaises(ValueError):
+            mcx.get_cheapest_method(10, max_ancillae=0)
+        # Not enough wires to borrow
+        with self.assertRaises(ValueError):
+            mcx.get_cheapest_method(10, max_ancillae=0, borrowable=7)
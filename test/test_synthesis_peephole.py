@@ -0,0 +1,138 @@
+import itertools
+from test.common_circuit import CircuitTestCase
+
+from parameterized import parameterized
+from qat.external.utils.qroutines import adder, qregs_init
+from qat.external.utils.qroutines.hamming_weight_compute import fpc
+from qat.external.utils.qroutines.linalg import rref
+from qat.external.utils.simulation import reversible
+from qat.external.utils.synthesis import peephole
+from qat.lang.AQASM import CNOT, RZ, SWAP, H, T, X
+from qat.lang.AQASM.program import Program
+from qat.lang.AQASM.routines import QRoutine
+
+Op = reversible.Op
+
+
+def _x(*qubits):
+    return Op("X", (), tuple(qubits[:-1]), (qubits[-1], ))
+
+
+class PeepholeTestCase(CircuitTestCase):
+    def test_cancel_adjacent(self):
+        ops, removed = peephole.optimize_ops(
+            [_x(0), _x(0), _x(1, 2, 3), _x(2, 1, 3)])
+        self.assertEqual(ops, [])
+        self.assertEqual(removed, {"X": 2, "CCNOT": 2})
+
+    def test_x_through_target(self):
+        """An X moves through the gates targeting its qubit, but not through
+        the ones controlled by it"""
+        ops, _ = peephole.optimize_ops([_x(1), _x(0, 1), _x(1)])
+        self.assertEqual(ops, [_x(0, 1)])
+        ops, removed = peephole.optimize_ops([_x(0), _x(0, 1), _x(0)])
+        self.assertEqual(len(ops), 3)
+        self.assertEqual(removed, {})
+
+    def test_cnot_fans(self):
+        fan_1 = [_x(0, target) for target in (1, 2, 3)]
+        fan_2 = [_x(0, target) for target in (3, 2, 4)]
+        ops, removed = peephole.optimize_ops(fan_1 + fan_2)
+        self.assertEqual(ops, [_x(0, 1), _x(0, 4)])
+        self.assertEqual(removed, {"CNOT": 4})
+
+    def test_diagonal(self):
+        ops, removed = peephole.optimize_ops([
+            Op("T", (), (), (0, )),
+            Op("RZ", (0.3, ), (), (0, )),
+            _x(0, 1),
+            Op("D-T", (), (), (0, )),
+            Op("RZ", (0.4, ), (), (0, )),
+            Op("RZ", (-0.7, ), (), (0, )),
+        ])
+        self.assertEqual(ops, [_x(0, 1)])
+        self.assertEqual(removed, {"T": 1, "D-T": 1, "RZ": 3})
+
+    def test_merge_rotations(self):
+        ops, removed = peephole.optimize_ops(
+            [Op("RZ", (0.3, ), (1, ), (0, )),
+             Op("RZ", (0.4, ), (1, ), (0, ))])
+        self.assertEqual(len(ops), 1)
+        self.assertAlmostEqual(ops[0].params[0], 0.7)
+        self.assertEqual(removed, {"CRZ": 1})
+
+    def test_blocked(self):
+        """H does not commute with X"""
+        ops, _ = peephole.optimize_ops(
+            [_x(0), Op("H", (), (), (0, )),
+             _x(0)])
+        self.assertEqual(len(ops), 3)
+
+    def test_window(self):
+        cnots = [_x(ctrl, 0) for ctrl in (1, 2, 3)]
+        ops = [_x(0)] + cnots + [_x(0)]
+        self.assertEqual(peephole.optimize_ops(ops, 3)[0], ops)
+        self.assertEqual(peephole.optimize_ops(ops, 4)[0], cnots)
+
+    def test_init_before_subtractor(self):
+        """The X of the initialisation cancel the first ones of the
+        subtractor"""
+        a_l = 3
+        routine = QRoutine()
+        a_qs = routine.new_wires(a_l)
+        b_qs = routine.new_wires(a_l)
+        routine.apply(qregs_init.initialize_qureg_given_int(5, a_l, False),
+                      a_qs)
+        routine.apply(adder.subtractor(a_l, a_l, False, False), a_qs, b_qs)
+        circ = reversible.routine_to_circ(routine)
+        optimized, removed = peephole.optimize_circuit(circ)
+        _, removed_sub = peephole.optimize_routine(
+            adder.subtractor(a_l, a_l, False, False))
+        self.assertEqual(removed["X"], removed_sub["X"] + 4)
+        for b_int in range(2**a_l):
+            bits = [0] * a_l + [b_int >> i & 1 for i in range(a_l)]
+            self.assertEqual(reversible.simulate_circuit(optimized, bits),
+                             reversible.simulate_circuit(circ, bits))
+
+    @parameterized.expand([
+        ("subtractor", adder.subtractor(3, 3, True, False)),
+        ("row_swap", rref.get_row_swap(3, 4, 0)),
+        ("rref", rref.get_rref(3, 4)),
+        ("weight_check",
+         fpc.get_qroutine_for_qubits_weight_check_clean(
+             8, 3, fpc.get_qroutine_for_qubits_weight_get_pattern(8))),
+    ])
+    def test_same_result(self, name, routine):
+        circ = reversible.routine_to_circ(routine)
+        optimized, removed = peephole.optimize_routine(routine)
+        self.assertEqual(optimized.nbqbits, circ.nbqbits)
+        self.assertEqual(
+            len(reversible.get_ops(optimized)) + sum(removed.values()),
+            len(reversible.get_ops(circ)))
+        arity = reversible.get_routine_arity(routine)
+        for bits in itertools.islice(itertools.product([0, 1], repeat=arity),
+                                     0, None, max(1, 2**arity // 256)):
+            self.assertEqual(reversible.simulate_circuit(optimized, bits),
+                             reversible.simulate_circuit(circ, bits))
+
+    def test_circuit_roundtrip(self):
+        program = Program()
+        qbits = program.qalloc(3)
+        program.apply(H, qbits[0])
+        program.apply(T.dag(), qbits[1])
+        program.apply(RZ(0.5).ctrl(), qbits[0], qbits[2])
+        program.apply(SWAP.ctrl(), qbits[2], qbits[0], qbits[1])
+        program.apply(CNOT, qbits[0], qbits[1])
+        circ = program.to_circ()
+        optimized, removed = peephole.optimize_circuit(circ)
+        self.assertEqual(removed, {})
+        self.assertEqual(reversible.get_ops(optimized),
+                         reversible.get_ops(circ))
+
+    def test_measure(self):
+        program = Program()
+        qbits = program.qalloc(1)
+        program.apply(X, qbits[0])
+        program.measure(qbits[0])
+        with self.assertRaises(ValueError):
+            peephole.optimize_circuit(program.to_circ())